@@ -0,0 +1,7 @@
+"""
+Shared helpers for the Python ops scripts in ``scripts/``.
+
+The scripts are run directly (``python3 scripts/<name>.py``), which puts ``scripts/`` on
+``sys.path``, so they import these modules as ``amr_ops.<module>``. Modules with optional
+dependencies import them lazily and explain what to install when they are missing.
+"""
@@ -0,0 +1,289 @@
+"""
+Adaptive (AIMD) concurrency control for S3 calls, per operation type.
+
+Each operation type (LIST, GET, PUT, COPY, DELETE) gets its own limit. A limit grows by
+``increase`` once a full limit's worth of requests has succeeded (one "round trip" of
+additive increase) and is multiplied by ``decrease`` when S3 answers SlowDown / 503 /
+429, at most once per cooldown so a burst of throttles from the same window counts once.
+Growth pauses while the smoothed latency is more than ``latency_ratio`` × the best
+latency seen, which catches queueing before S3 starts throttling.
+
+Throttled calls are retried here with jittered backoff, so the botocore client should
+be created with retries disabled (``client_config_retries()``); otherwise botocore hides
+the throttles and the controller never sees them. The controller therefore also takes
+over botocore's retries of other transient failures (5xx, request timeouts, connection
+errors), with the same backoff; only throttles shrink the limit.
+
+``AdaptiveClient`` wraps a boto3 client; ``AsyncS3`` takes the controller directly.
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Iterator
+
+from botocore.exceptions import ConnectionError as BotoConnectionError
+from botocore.exceptions import HTTPClientError
+
+OP_FOR_METHOD = {
+    "list_objects_v2": "LIST",
+    "get_object": "GET",
+    "head_object": "GET",
+    "put_object": "PUT",
+    "copy_object": "COPY",
+    "upload_part_copy": "COPY",
+    "create_multipart_upload": "COPY",
+    "complete_multipart_upload": "COPY",
+    "abort_multipart_upload": "COPY",
+    "delete_objects": "DELETE",
+    "delete_object": "DELETE",
+}
+
+THROTTLE_CODES = {
+    "SlowDown",
+    "Throttling",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+    "TooManyRequests",
+    "TooManyRequestsException",
+    "ServiceUnavailable",
+    "RequestThrottled",
+}
+
+TRANSIENT_CODES = {"InternalError", "RequestTimeout", "RequestTimeoutException", "PriorRequestNotComplete"}
+
+
+def _error_code_and_status(exc: BaseException) -> tuple[str | None, int | None]:
+    response = getattr(exc, "response", None) or {}
+    error = response.get("Error") or {}
+    return error.get("Code"), (response.get("ResponseMetadata") or {}).get("HTTPStatusCode")
+
+
+def is_throttle(exc: BaseException) -> bool:
+    code, status = _error_code_and_status(exc)
+    return code in THROTTLE_CODES or status in (429, 503)
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Failures botocore's standard mode retries: throttles, 5xx, timeouts and dropped connections."""
+    if isinstance(exc, (BotoConnectionError, HTTPClientError)) or is_throttle(exc):
+        return True
+    code, status = _error_code_and_status(exc)
+    return code in TRANSIENT_CODES or (status is not None and status >= 500)
+
+
+def client_config_retries() -> dict:
+    """botocore ``retries`` setting for clients driven by an :class:`AdaptiveController`, which retries itself."""
+    return {"total_max_attempts": 1, "mode": "standard"}
+
+
+class AimdLimiter:
+    """One adaptive concurrency limit, usable from threads and from asyncio tasks."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        initial: int,
+        maximum: int,
+        minimum: int = 1,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        latency_ratio: float = 3.0,
+    ) -> None:
+        self.name = name
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = float(max(self.minimum, min(initial, self.maximum)))
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_ratio = latency_ratio
+        self.inflight = 0
+        self.requests = 0
+        self.throttles = 0
+        self.latency_ewma: float | None = None
+        self.latency_floor: float | None = None
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._async_waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    @property
+    def capacity(self) -> int:
+        return max(self.minimum, int(self.limit))
+
+    def _wake(self) -> None:
+        """Wake as many waiters as there are free slots (called with the lock held)."""
+        free = self.capacity - self.inflight
+        if free <= 0:
+            return
+        self._cond.notify(free)
+        while free > 0 and self._async_waiters:
+            loop, fut = self._async_waiters.pop(0)
+            loop.call_soon_threadsafe(lambda f=fut: f.done() or f.set_result(None))
+            free -= 1
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.inflight >= self.capacity:
+                self._cond.wait()
+            self.inflight += 1
+
+    async def acquire_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self.inflight < self.capacity:
+                    self.inflight += 1
+                    return
+                fut = loop.create_future()
+                self._async_waiters.append((loop, fut))
+            await fut
+
+    def release(self, latency: float | None, *, throttled: bool = False) -> None:
+        with self._cond:
+            self.inflight -= 1
+            self.requests += 1
+            now = time.monotonic()
+            if throttled:
+                self.throttles += 1
+                cooldown = max(0.05, self.latency_ewma or 0.0)
+                if now - self._last_decrease >= cooldown:
+                    self.limit = max(float(self.minimum), self.limit * self.decrease)
+                    self._last_decrease = now
+                    self._successes = 0
+            elif latency is not None:
+                self.latency_ewma = (
+                    latency if self.latency_ewma is None else 0.9 * self.latency_ewma + 0.1 * latency
+                )
+                self.latency_floor = (
+                    latency if self.latency_floor is None else min(self.latency_floor, latency)
+                )
+                self._successes += 1
+                congested = self.latency_ewma > self.latency_ratio * self.latency_floor
+                if self._successes >= self.capacity and not congested:
+                    self.limit = min(float(self.maximum), self.limit + self.increase)
+                    self._successes = 0
+            self._wake()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "limit": self.capacity,
+                "inflight": self.inflight,
+                "requests": self.requests,
+                "throttles": self.throttles,
+                "latency_ms": round((self.latency_ewma or 0.0) * 1000, 1),
+            }
+
+
+class AdaptiveController:
+    """Per-operation :class:`AimdLimiter`s plus retry of throttles and other transient errors."""
+
+    def __init__(
+        self,
+        maxima: dict[str, int],
+        *,
+        initial: int = 8,
+        max_retries: int = 10,
+        base_backoff: float = 0.05,
+        max_backoff: float = 5.0,
+    ) -> None:
+        self.limiters = {
+            op: AimdLimiter(op, initial=min(initial, maximum), maximum=maximum)
+            for op, maximum in maxima.items()
+        }
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+    def limiter(self, op: str) -> AimdLimiter | None:
+        return self.limiters.get(op)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2**attempt)))
+
+    @contextmanager
+    def slot(self, op: str) -> Iterator[None]:
+        """Hold one ``op`` slot around a blocking call and feed the outcome back."""
+        limiter = self.limiters.get(op)
+        if limiter is None:
+            yield
+            return
+        limiter.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException as exc:
+            limiter.release(None, throttled=is_throttle(exc))
+            raise
+        limiter.release(time.monotonic() - start)
+
+    @asynccontextmanager
+    async def slot_async(self, op: str) -> AsyncIterator[None]:
+        limiter = self.limiters.get(op)
+        if limiter is None:
+            yield
+            return
+        await limiter.acquire_async()
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException as exc:
+            limiter.release(None, throttled=is_throttle(exc))
+            raise
+        limiter.release(time.monotonic() - start)
+
+    def call(self, op: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        attempt = 0
+        while True:
+            try:
+                with self.slot(op):
+                    return fn(*args, **kwargs)
+            except Exception as exc:
+                if not is_transient(exc) or attempt >= self.max_retries:
+                    raise
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    async def call_async(self, op: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        attempt = 0
+        while True:
+            try:
+                async with self.slot_async(op):
+                    return await fn(*args, **kwargs)
+            except Exception as exc:
+                if not is_transient(exc) or attempt >= self.max_retries:
+                    raise
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        return {op: limiter.snapshot() for op, limiter in self.limiters.items()}
+
+    def describe(self) -> str:
+        return ", ".join(
+            f"{op} {s['limit']} ({s['throttles']} throttled)" for op, s in self.snapshot().items()
+        )
+
+
+class AdaptiveClient:
+    """boto3 client proxy that routes S3 operations through an :class:`AdaptiveController`."""
+
+    def __init__(self, client, controller: AdaptiveController) -> None:
+        self._client = client
+        self._controller = controller
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        op = OP_FOR_METHOD.get(name)
+        if op is None or not callable(attr):
+            return attr
+
+        def _call(*args, **kwargs):
+            return self._controller.call(op, attr, *args, **kwargs)
+
+        return _call
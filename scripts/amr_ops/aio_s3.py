@@ -0,0 +1,378 @@
+"""
+asyncio S3 layer shared by the ops scripts (``--engine asyncio``).
+
+``AsyncS3`` wraps one aiobotocore client, so every request shares a single aiohttp
+connection pool, and bounds in-flight requests with a semaphore sized to that pool.
+Thousands of metadata.json GETs can be outstanding at once without a thread each.
+
+The scripts themselves are synchronous, so ``S3Engine`` runs an event loop on one
+background thread and exposes blocking helpers (``iter_pages``, ``get_json_many``,
+``put_json_many``, ``download_many``) that fan out on that loop. Async code (the
+reclassify session workers) can ``submit`` coroutines to the same loop and use
+``engine.s3`` directly, and ``blocking_client()`` lets existing boto3-style helpers
+(listing loops) issue their calls through the same pool.
+
+Pass an ``amr_ops.adaptive.AdaptiveController`` to gate each request by its per-operation
+AIMD limit (and retry throttles) on top of the pool-wide budget, and an
+``amr_ops.metrics.Metrics`` to record per-operation counts, in-flight requests and latency.
+
+Requires aiobotocore (``pip install -r scripts/requirements-s3-async.txt``). The endpoint
+is resolved like boto3, so ``AWS_ENDPOINT_URL_S3`` points it at a local stand-in such as
+``scripts/amr_ops/s3_standin.py``.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Iterator, TypeVar
+
+from amr_ops.adaptive import OP_FOR_METHOD
+from amr_ops.metrics import method_op
+
+T = TypeVar("T")
+
+JSON_CONTENT_TYPE = "application/json; charset=utf-8"
+
+
+def _require_aiobotocore():
+    try:
+        from aiobotocore.config import AioConfig
+        from aiobotocore.session import get_session
+    except ImportError:
+        raise SystemExit(
+            "--engine asyncio needs aiobotocore: pip install -r scripts/requirements-s3-async.txt"
+        ) from None
+    return get_session, AioConfig
+
+
+def is_missing(exc: BaseException) -> bool:
+    """True for NoSuchKey / 404 responses."""
+    response = getattr(exc, "response", None) or {}
+    code = str((response.get("Error") or {}).get("Code") or "")
+    return code in ("NoSuchKey", "404", "NotFound")
+
+
+class AsyncS3:
+    """One aiobotocore S3 client with a bounded number of in-flight requests."""
+
+    def __init__(
+        self,
+        *,
+        region: str | None = None,
+        max_connections: int = 256,
+        retries: dict | None = None,
+        controller=None,
+        metrics=None,
+    ) -> None:
+        self.region = region
+        self.max_connections = max(1, max_connections)
+        self.retries = retries or {"max_attempts": 10}
+        self.controller = controller
+        self.metrics = metrics
+        self._ctx = None
+        self.client = None
+        self._slots: asyncio.Semaphore | None = None
+
+    async def __aenter__(self) -> "AsyncS3":
+        get_session, AioConfig = _require_aiobotocore()
+        config = AioConfig(
+            max_pool_connections=self.max_connections,
+            retries=self.retries,
+        )
+        self._ctx = get_session().create_client("s3", region_name=self.region, config=config)
+        self.client = await self._ctx.__aenter__()
+        self._slots = asyncio.Semaphore(self.max_connections)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self._ctx is not None:
+            await self._ctx.__aexit__(*exc)
+            self._ctx = None
+            self.client = None
+
+    async def _guarded(self, method: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run ``fn`` under the pool budget and, if configured, the adaptive limit."""
+
+        async def _run() -> T:
+            async with self._slots:
+                if self.metrics is None:
+                    return await fn()
+                with self.metrics.timer(method_op(method)):
+                    return await fn()
+
+        if self.controller is None:
+            return await _run()
+        return await self.controller.call_async(OP_FOR_METHOD.get(method, method), _run)
+
+    async def call(self, method: str, **kwargs) -> dict:
+        """Invoke one client operation inside the in-flight budget."""
+        return await self._guarded(method, lambda: getattr(self.client, method)(**kwargs))
+
+    async def list_pages(
+        self,
+        bucket: str,
+        prefix: str,
+        *,
+        delimiter: str | None = None,
+        page_size: int | None = None,
+        start_after: str | None = None,
+    ) -> AsyncIterator[dict]:
+        """Yield raw ListObjectsV2 responses for ``prefix``."""
+        token = None
+        while True:
+            kwargs: dict[str, Any] = {"Bucket": bucket, "Prefix": prefix}
+            if delimiter:
+                kwargs["Delimiter"] = delimiter
+            if page_size:
+                kwargs["MaxKeys"] = page_size
+            if token:
+                kwargs["ContinuationToken"] = token
+            elif start_after:
+                kwargs["StartAfter"] = start_after
+            resp = await self.call("list_objects_v2", **kwargs)
+            yield resp
+            if not resp.get("IsTruncated"):
+                return
+            token = resp.get("NextContinuationToken")
+
+    async def iter_objects(self, bucket: str, prefix: str) -> AsyncIterator[dict]:
+        async for page in self.list_pages(bucket, prefix):
+            for obj in page.get("Contents") or []:
+                yield obj
+
+    async def get_bytes(self, bucket: str, key: str) -> bytes | None:
+        """Object body, or None when the key does not exist."""
+
+        async def _get() -> bytes:
+            resp = await self.client.get_object(Bucket=bucket, Key=key)
+            async with resp["Body"] as stream:
+                return await stream.read()
+
+        try:
+            return await self._guarded("get_object", _get)
+        except Exception as exc:
+            if is_missing(exc):
+                return None
+            raise
+
+    async def get_conditional(
+        self, bucket: str, key: str, *, if_none_match: str | None = None
+    ) -> tuple[bytes | None, str | None]:
+        """
+        ``(body, etag)``. With ``if_none_match`` an unchanged object returns
+        ``(None, if_none_match)``; a missing key returns ``(None, None)``.
+        """
+
+        async def _get() -> tuple[bytes, str | None]:
+            kwargs: dict[str, Any] = {"Bucket": bucket, "Key": key}
+            if if_none_match:
+                kwargs["IfNoneMatch"] = if_none_match
+            resp = await self.client.get_object(**kwargs)
+            async with resp["Body"] as stream:
+                return await stream.read(), resp.get("ETag")
+
+        try:
+            return await self._guarded("get_object", _get)
+        except Exception as exc:
+            if is_missing(exc):
+                return None, None
+            status = ((getattr(exc, "response", None) or {}).get("ResponseMetadata") or {}).get(
+                "HTTPStatusCode"
+            )
+            if if_none_match and status == 304:
+                return None, if_none_match
+            raise
+
+    async def get_json(self, bucket: str, key: str) -> Any | None:
+        body = await self.get_bytes(bucket, key)
+        return None if body is None else json.loads(body)
+
+    async def put_bytes(
+        self, bucket: str, key: str, body: bytes, content_type: str = "binary/octet-stream"
+    ) -> None:
+        await self.call("put_object", Bucket=bucket, Key=key, Body=body, ContentType=content_type)
+
+    async def put_json(self, bucket: str, key: str, data: Any) -> None:
+        body = json.dumps(data, indent=2).encode("utf-8")
+        await self.put_bytes(bucket, key, body, JSON_CONTENT_TYPE)
+
+    async def copy(
+        self,
+        bucket: str,
+        src: str,
+        dst: str,
+        *,
+        size: int | None = None,
+        multipart_threshold: int | None = None,
+        part_size: int = 64 * 1024 * 1024,
+    ) -> None:
+        """CopyObject, or parallel UploadPartCopy parts when ``size`` ≥ ``multipart_threshold``."""
+        if size is None or multipart_threshold is None or size < multipart_threshold:
+            await self.call(
+                "copy_object", Bucket=bucket, CopySource={"Bucket": bucket, "Key": src}, Key=dst
+            )
+            return
+        head = await self.call("head_object", Bucket=bucket, Key=src)
+        create: dict[str, Any] = {"Bucket": bucket, "Key": dst, "Metadata": head.get("Metadata") or {}}
+        for field in ("ContentType", "ContentEncoding", "ContentDisposition", "CacheControl"):
+            if head.get(field):
+                create[field] = head[field]
+        upload_id = (await self.call("create_multipart_upload", **create))["UploadId"]
+
+        async def _part(number: int, first: int) -> dict:
+            last = min(first + part_size, size) - 1
+            resp = await self.call(
+                "upload_part_copy",
+                Bucket=bucket,
+                Key=dst,
+                UploadId=upload_id,
+                PartNumber=number,
+                CopySource={"Bucket": bucket, "Key": src},
+                CopySourceRange=f"bytes={first}-{last}",
+            )
+            return {"ETag": resp["CopyPartResult"]["ETag"], "PartNumber": number}
+
+        try:
+            parts = await asyncio.gather(
+                *(_part(i + 1, first) for i, first in enumerate(range(0, size, part_size)))
+            )
+            await self.call(
+                "complete_multipart_upload",
+                Bucket=bucket,
+                Key=dst,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": list(parts)},
+            )
+        except BaseException:
+            # A failed part or completion aborts the upload, so no orphaned parts stay billed.
+            with contextlib.suppress(Exception):
+                await self.call("abort_multipart_upload", Bucket=bucket, Key=dst, UploadId=upload_id)
+            raise
+
+    async def delete_batch(self, bucket: str, keys: list[str]) -> None:
+        """DeleteObjects in chunks of 1000, all chunks in parallel."""
+        await asyncio.gather(
+            *(
+                self.call(
+                    "delete_objects",
+                    Bucket=bucket,
+                    Delete={"Objects": [{"Key": k} for k in keys[i : i + 1000]], "Quiet": True},
+                )
+                for i in range(0, len(keys), 1000)
+            )
+        )
+
+    async def download(self, bucket: str, key: str, path: str) -> None:
+        """
+        Stream one object to ``path`` (written to a temp name, then renamed). File opens,
+        writes and the rename run in worker threads so disk latency never stalls the loop.
+        """
+        tmp = f"{path}.part"
+
+        async def _download() -> None:
+            resp = await self.client.get_object(Bucket=bucket, Key=key)
+            async with resp["Body"] as stream:
+                fh = await asyncio.to_thread(open, tmp, "wb")
+                try:
+                    while chunk := await stream.read(1024 * 1024):
+                        await asyncio.to_thread(fh.write, chunk)
+                finally:
+                    await asyncio.to_thread(fh.close)
+
+        await self._guarded("get_object", _download)
+        await asyncio.to_thread(os.replace, tmp, path)
+
+
+class BlockingClient:
+    """boto3-style ``client.<operation>(**kwargs)`` calls executed on an engine's loop."""
+
+    def __init__(self, engine: "S3Engine") -> None:
+        self._engine = engine
+
+    def __getattr__(self, method: str) -> Callable[..., dict]:
+        def _call(**kwargs) -> dict:
+            return self._engine.run(self._engine.s3.call(method, **kwargs))
+
+        return _call
+
+
+class S3Engine:
+    """
+    Blocking facade over :class:`AsyncS3`: one event loop on a background thread and one
+    connection pool for the whole process.
+    """
+
+    def __init__(
+        self,
+        *,
+        region: str | None = None,
+        max_connections: int = 256,
+        retries: dict | None = None,
+        controller=None,
+        metrics=None,
+    ) -> None:
+        self.s3 = AsyncS3(
+            region=region,
+            max_connections=max_connections,
+            retries=retries,
+            controller=controller,
+            metrics=metrics,
+        )
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="s3-engine", daemon=True)
+        self._thread.start()
+        self.run(self.s3.__aenter__())
+
+    def submit(self, coro: Awaitable[T]) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable[T]) -> T:
+        return self.submit(coro).result()
+
+    def close(self) -> None:
+        self.run(self.s3.__aexit__(None, None, None))
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+    def __enter__(self) -> "S3Engine":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def blocking_client(self) -> BlockingClient:
+        return BlockingClient(self)
+
+    def iter_pages(self, bucket: str, prefix: str, **kwargs) -> Iterator[dict]:
+        """Blocking iterator over ListObjectsV2 pages (one page fetched at a time)."""
+        pages = self.s3.list_pages(bucket, prefix, **kwargs)
+        while True:
+            try:
+                yield self.run(pages.__anext__())
+            except StopAsyncIteration:
+                return
+
+    def map(self, fn: Callable[[T], Awaitable[Any]], items: Iterable[T]) -> list[Any]:
+        """Run ``fn`` over ``items`` concurrently; results (or raised exceptions) in input order."""
+
+        async def _all() -> list[Any]:
+            return await asyncio.gather(*(fn(item) for item in items), return_exceptions=True)
+
+        return self.run(_all())
+
+    def get_json_many(self, bucket: str, keys: Iterable[str]) -> list[Any]:
+        """Parsed JSON per key, None for missing keys, or the exception for failures."""
+        return self.map(lambda key: self.s3.get_json(bucket, key), keys)
+
+    def put_json_many(self, bucket: str, items: Iterable[tuple[str, Any]]) -> list[Any]:
+        """Write ``(key, data)`` pairs; None per success or the exception for failures."""
+        return self.map(lambda item: self.s3.put_json(bucket, item[0], item[1]), items)
+
+    def download_many(self, bucket: str, pairs: Iterable[tuple[str, str]]) -> list[Any]:
+        """Download ``(key, local_path)`` pairs; None per success or the exception."""
+        return self.map(lambda pair: self.s3.download(bucket, pair[0], pair[1]), pairs)
@@ -0,0 +1,126 @@
+"""
+Persistent reverse-geocode cache keyed by a quantized coordinate cell.
+
+Captures cluster on the same streets and yards, so coordinates are snapped to a
+lat/lon grid (``precision`` decimal places; 3 ≈ 110 m) and each cell is geocoded once.
+Results, including "no label", are kept in SQLite per geocoder ``source`` and survive
+between runs; an in-memory map dedups cells within a run. Failed lookups are not cached.
+
+Batch geocoders (``amr_ops.offline_geocode``) go through :meth:`GeocodeCache.prefetch`,
+which resolves every uncached cell of a batch in one call and stores the answers in one
+transaction; the per-session :meth:`GeocodeCache.lookup` then hits the memo.
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Sequence
+
+Place = tuple[str | None, str | None, str | None]  # (area, city, state)
+
+
+def cell_for(lat: float, lon: float, precision: int) -> tuple[float, float]:
+    """Centre of the grid cell containing ``(lat, lon)``."""
+    return round(lat, precision), round(lon, precision)
+
+
+def cell_key(lat: float, lon: float, precision: int) -> str:
+    clat, clon = cell_for(lat, lon, precision)
+    return f"{clat:.{precision}f},{clon:.{precision}f}"
+
+
+class GeocodeCache:
+    """Cell → (area, city, state) memo backed by an optional SQLite file."""
+
+    def __init__(self, path: str | Path | None, *, precision: int = 3, source: str = "nominatim") -> None:
+        self.precision = precision
+        self.source = source
+        self.hits = 0
+        self.misses = 0
+        self._memo: dict[str, Place] = {}
+        self._prefetched: set[str] = set()  # fetched by prefetch(), not yet looked up
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        if path:
+            path = Path(path).expanduser()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS geocode ("
+                " source TEXT NOT NULL, cell TEXT NOT NULL,"
+                " area TEXT, city TEXT, state TEXT, fetched_at REAL NOT NULL,"
+                " PRIMARY KEY (source, cell))"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> Place | None:
+        with self._lock:
+            place = self._memo.get(key)
+            if place is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT area, city, state FROM geocode WHERE source = ? AND cell = ?",
+                    (self.source, key),
+                ).fetchone()
+                if row is not None:
+                    place = self._memo[key] = (row[0], row[1], row[2])
+            return place
+
+    def put(self, key: str, place: Place) -> None:
+        self.put_many([(key, place)])
+
+    def put_many(self, entries: Sequence[tuple[str, Place]]) -> None:
+        with self._lock:
+            self._memo.update(entries)
+            if self._db is not None:
+                now = time.time()
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO geocode (source, cell, area, city, state, fetched_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    [(self.source, key, *place, now) for key, place in entries],
+                )
+                self._db.commit()
+
+    def lookup(self, lat: float, lon: float, geocode: Callable[[float, float], Place]) -> Place:
+        """Cached place for the cell of ``(lat, lon)``; calls ``geocode`` on the cell centre on a miss."""
+        key = cell_key(lat, lon, self.precision)
+        place = self.get(key)
+        if place is not None:
+            if key in self._prefetched:
+                self._prefetched.discard(key)
+                self.misses += 1
+            else:
+                self.hits += 1
+            return place
+        self.misses += 1
+        place = geocode(*cell_for(lat, lon, self.precision))
+        self.put(key, place)
+        return place
+
+    def prefetch(
+        self,
+        coords: Iterable[tuple[float, float]],
+        geocode_many: Callable[[list[float], list[float]], list[Place]],
+    ) -> int:
+        """Resolve the uncached cells among ``coords`` with one ``geocode_many(lats, lons)`` call."""
+        todo: dict[str, tuple[float, float]] = {}
+        for lat, lon in coords:
+            key = cell_key(lat, lon, self.precision)
+            if key not in todo and self.get(key) is None:
+                todo[key] = cell_for(lat, lon, self.precision)
+        if not todo:
+            return 0
+        centres = list(todo.values())
+        places = geocode_many([lat for lat, _ in centres], [lon for _, lon in centres])
+        self.put_many(list(zip(todo, places)))
+        self._prefetched.update(todo)
+        return len(todo)
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def describe(self) -> str:
+        return f"{self.misses} cells geocoded, {self.hits} served from cache ({len(self._memo)} cells this run)"
@@ -0,0 +1,254 @@
+"""
+ListObjectsV2 answered from a local S3 Inventory snapshot instead of S3.
+
+``--inventory PATH`` accepts what an S3 Inventory delivery looks like once copied
+locally:
+
+* a ``manifest.json`` (its ``fileFormat``, ``fileSchema`` and ``files`` are honoured;
+  data files are looked up as ``data/<name>`` next to the manifest or one level up, as
+  in the ``<config>/<date>/manifest.json`` + ``<config>/data/`` delivery layout);
+* a directory holding one or more deliveries (the newest ``manifest.json`` wins);
+* a single data file: ``.csv`` / ``.csv.gz`` without a header in the default column
+  order ``Bucket, Key, Size, LastModifiedDate, ETag``, or ``.parquet``.
+
+Data files are read as a stream (gzip CSV row by row, Parquet one record batch at a
+time) and only rows of ``bucket`` under one of ``prefixes`` are kept, so memory grows
+with the folders a job touches rather than with the bucket. CSV keys are URL-decoded;
+non-latest versions and delete markers of versioned inventories are skipped.
+
+``InventoryListing.list_objects_v2`` takes the boto3 keyword arguments (``Prefix``,
+``Delimiter``, ``MaxKeys``, ``StartAfter``, ``ContinuationToken``) and returns
+ListObjectsV2-shaped pages with quoted ETags and ``datetime`` LastModified, so it can be
+passed anywhere a listing client goes (``amr_ops.listing.list_pages`` included). The
+snapshot is as old as the inventory: keys created since are not seen, and deleted keys
+surface as failed GETs/COPYs.
+
+Parquet needs pyarrow (``pip install -r scripts/requirements-inventory.txt``); ORC is not
+supported.
+"""
+from __future__ import annotations
+
+import bisect
+import csv
+import gzip
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterable, Iterator, NamedTuple
+from urllib.parse import unquote_plus
+
+DEFAULT_CSV_SCHEMA = ("Bucket", "Key", "Size", "LastModifiedDate", "ETag")
+
+# Parquet column names for the CSV schema fields read here.
+_PARQUET_COLUMNS = {
+    "Bucket": "bucket",
+    "Key": "key",
+    "Size": "size",
+    "LastModifiedDate": "last_modified_date",
+    "ETag": "e_tag",
+    "IsLatest": "is_latest",
+    "IsDeleteMarker": "is_delete_marker",
+}
+
+
+class InventoryObject(NamedTuple):
+    bucket: str
+    key: str
+    size: int
+    etag: str | None
+    last_modified: datetime | None
+
+
+class InventorySource(NamedTuple):
+    file_format: str  # "CSV" or "Parquet"
+    schema: tuple[str, ...]
+    files: list[Path]
+    source_bucket: str | None
+
+
+def _resolve_data_file(manifest: Path, key: str) -> Path:
+    name = key.rsplit("/", 1)[-1]
+    base = manifest.parent
+    for candidate in (base / "data" / name, base / name, base.parent / "data" / name, base.parent / name):
+        if candidate.is_file():
+            return candidate
+    raise SystemExit(f"inventory data file {name} (from {manifest}) not found next to the manifest or in data/")
+
+
+def _from_manifest(manifest: Path) -> InventorySource:
+    doc = json.loads(manifest.read_text(encoding="utf-8"))
+    file_format = str(doc.get("fileFormat") or "CSV")
+    if file_format.upper() not in ("CSV", "PARQUET"):
+        raise SystemExit(f"{manifest}: {file_format} inventories are not supported (use CSV or Parquet)")
+    schema = tuple(f.strip() for f in str(doc.get("fileSchema") or "").split(",") if f.strip())
+    files = [_resolve_data_file(manifest, f["key"]) for f in doc.get("files") or []]
+    return InventorySource(
+        "Parquet" if file_format.upper() == "PARQUET" else "CSV",
+        schema or DEFAULT_CSV_SCHEMA,
+        files,
+        doc.get("sourceBucket"),
+    )
+
+
+def inventory_source(path: str | Path) -> InventorySource:
+    """Format, schema and data files of a manifest, delivery directory or single data file."""
+    path = Path(path).expanduser()
+    if path.is_dir():
+        manifests = sorted(path.rglob("manifest.json"))
+        if not manifests:
+            raise SystemExit(f"no manifest.json under {path}")
+        return _from_manifest(manifests[-1])
+    if not path.is_file():
+        raise SystemExit(f"inventory not found: {path}")
+    if path.name.endswith(".json"):
+        return _from_manifest(path)
+    if path.suffix.lower() == ".parquet":
+        return InventorySource("Parquet", DEFAULT_CSV_SCHEMA, [path], None)
+    return InventorySource("CSV", DEFAULT_CSV_SCHEMA, [path], None)
+
+
+def _parse_time(value: Any) -> datetime | None:
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _successor(prefix: str) -> str:
+    """Smallest string above every string starting with ``prefix``."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _truthy(value: Any) -> bool:
+    return value is True or str(value).strip().lower() == "true"
+
+
+def _csv_rows(path: Path, schema: tuple[str, ...]) -> Iterator[dict[str, Any]]:
+    opener = gzip.open if path.name.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="") as f:
+        for row in csv.reader(f):
+            if row:
+                record = dict(zip(schema, row))
+                record["Key"] = unquote_plus(record.get("Key") or "")
+                yield record
+
+
+def _parquet_rows(path: Path, schema: tuple[str, ...]) -> Iterator[dict[str, Any]]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit(
+            "Parquet inventories need pyarrow: pip install -r scripts/requirements-inventory.txt"
+        ) from None
+    parquet = pq.ParquetFile(path)
+    available = set(parquet.schema_arrow.names)
+    fields = {field: column for field, column in _PARQUET_COLUMNS.items() if column in available}
+    for batch in parquet.iter_batches(columns=list(fields.values())):
+        columns = {field: batch.column(column).to_pylist() for field, column in fields.items()}
+        for i in range(batch.num_rows):
+            yield {field: values[i] for field, values in columns.items()}
+
+
+def iter_objects(
+    path: str | Path, *, bucket: str | None = None, prefixes: Iterable[str] = ("",)
+) -> Iterator[InventoryObject]:
+    """Stream current objects of ``bucket`` under any of ``prefixes`` (inventory order, not key order)."""
+    source = inventory_source(path)
+    wanted = tuple(prefixes) or ("",)
+    read = _parquet_rows if source.file_format == "Parquet" else _csv_rows
+    for data_file in source.files:
+        for row in read(data_file, source.schema):
+            key = row.get("Key") or ""
+            if not key.startswith(wanted):
+                continue
+            row_bucket = row.get("Bucket") or source.source_bucket or ""
+            if bucket and row_bucket and row_bucket != bucket:
+                continue
+            if "IsLatest" in row and not _truthy(row["IsLatest"]):
+                continue
+            if _truthy(row.get("IsDeleteMarker")):
+                continue
+            etag = str(row.get("ETag") or "").strip('"') or None
+            yield InventoryObject(
+                row_bucket, key, int(row.get("Size") or 0), etag, _parse_time(row.get("LastModifiedDate"))
+            )
+
+
+class InventoryListing:
+    """Sorted in-memory key index of one bucket's inventory rows, served as ListObjectsV2."""
+
+    def __init__(self, path: str | Path, *, bucket: str, prefixes: Iterable[str] = ("",)) -> None:
+        self.path = Path(path).expanduser()
+        self.bucket = bucket
+        self.prefixes = tuple(dict.fromkeys(prefixes)) or ("",)
+        objects: dict[str, tuple[int, str | None, datetime | None]] = {}
+        for obj in iter_objects(self.path, bucket=bucket, prefixes=self.prefixes):
+            objects[obj.key] = (obj.size, obj.etag, obj.last_modified)
+        self.keys = sorted(objects)
+        self.objects = objects
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _covered(self, prefix: str) -> bool:
+        return any(prefix.startswith(p) for p in self.prefixes)
+
+    def list_objects_v2(self, **kwargs) -> dict[str, Any]:
+        bucket = kwargs.get("Bucket")
+        if bucket != self.bucket:
+            raise ValueError(f"inventory covers s3://{self.bucket}, not s3://{bucket}")
+        prefix = kwargs.get("Prefix") or ""
+        if not self._covered(prefix):
+            raise ValueError(f"inventory was loaded for {', '.join(self.prefixes)}; {prefix!r} is outside it")
+        delimiter = kwargs.get("Delimiter") or ""
+        max_keys = int(kwargs.get("MaxKeys") or 1000)
+        after = kwargs.get("ContinuationToken") or kwargs.get("StartAfter") or ""
+        if after:
+            i = bisect.bisect_right(self.keys, max(after, prefix))
+            if delimiter and after.endswith(delimiter):
+                # Resuming after a common prefix: none of its keys are listed again.
+                i = bisect.bisect_left(self.keys, _successor(after), i)
+        else:
+            i = bisect.bisect_left(self.keys, prefix)
+        contents: list[dict[str, Any]] = []
+        common: list[dict[str, str]] = []
+        last = ""
+        while i < len(self.keys) and len(contents) + len(common) < max_keys:
+            key = self.keys[i]
+            if not key.startswith(prefix):
+                break
+            cut = key.find(delimiter, len(prefix)) if delimiter else -1
+            if cut >= 0:
+                group = key[: cut + len(delimiter)]
+                common.append({"Prefix": group})
+                last = group
+                i = bisect.bisect_left(self.keys, _successor(group), i)
+                continue
+            size, etag, modified = self.objects[key]
+            item: dict[str, Any] = {"Key": key, "Size": size, "LastModified": modified}
+            if etag:
+                item["ETag"] = f'"{etag}"'
+            contents.append(item)
+            last = key
+            i += 1
+        truncated = i < len(self.keys) and self.keys[i].startswith(prefix)
+        resp: dict[str, Any] = {
+            "Name": bucket,
+            "Prefix": prefix,
+            "KeyCount": len(contents) + len(common),
+            "MaxKeys": max_keys,
+            "IsTruncated": truncated,
+            "Contents": contents,
+            "CommonPrefixes": common,
+        }
+        if truncated:
+            resp["NextContinuationToken"] = last
+        return resp
+
+    def describe(self) -> str:
+        where = repr(self.prefixes[0]) if len(self.prefixes) == 1 else f"{len(self.prefixes)} prefixes"
+        return f"inventory {self.path.name}: {len(self.keys)} objects under {where}"
@@ -0,0 +1,147 @@
+"""
+Key-range sharded ListObjectsV2, listed concurrently and merged back into key order.
+
+One ListObjectsV2 chain is serial: every page needs the previous page's continuation
+token, so listing a folder takes (objects / 1000) round trips no matter how many
+workers are free. ``list_pages`` splits the key space under a prefix into ``shards``
+contiguous ranges at session-id characters (session ids are UUIDs, so the default
+boundaries are hex digits: ``<prefix>1``, ``<prefix>2``, …, two characters deep once
+there are more than 16 shards) and walks every range on its own thread with its own
+token chain. Range *i* starts with ``StartAfter=<prefix><boundary i>`` and stops at the
+first key or common prefix past the next boundary, so the ranges cover every key
+exactly once, including keys outside the alphabet (they land in the first or last
+range, which only costs balance). S3 has no end bound, so the page that crosses a
+boundary is read in full and trimmed: about one extra page per range, which pays off
+once a prefix holds well over ``shards`` × 1000 objects.
+
+Pages are yielded in key order: the first range's pages stream as they arrive, later
+ranges are buffered until every range before them is done, at most ``buffer_pages``
+(default ``BUFFER_PAGES``) pages per range; a range that is that far ahead waits for
+the consumer, so memory stays at a few pages per range. Each yielded page is a
+ListObjectsV2-shaped dict with ``Contents`` and ``CommonPrefixes``, so callers that
+walked raw responses keep working. ``client`` is anything with a boto3-style
+``list_objects_v2(**kwargs)``: a boto3 client or ``S3Engine.blocking_client()``.
+With ``shards=1`` this is the plain serial paginator on the calling thread.
+"""
+from __future__ import annotations
+
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterator
+
+SESSION_ID_ALPHABET = "0123456789abcdef"
+# Pages each range may read ahead of the consumer.
+BUFFER_PAGES = 4
+
+_DONE = object()
+
+
+def shard_boundaries(shards: int, alphabet: str = SESSION_ID_ALPHABET) -> list[str]:
+    """``shards - 1`` ascending split points drawn evenly from the alphabet's key space."""
+    chars = sorted(set(alphabet))
+    if shards <= 1 or not chars:
+        return []
+    depth = 1
+    while len(chars) ** depth < shards:
+        depth += 1
+    space = ["".join(p) for p in itertools.product(chars, repeat=depth)]
+    return [space[len(space) * i // shards] for i in range(1, shards)]
+
+
+def _range_pages(
+    client,
+    bucket: str,
+    prefix: str,
+    lower: str | None,
+    upper: str | None,
+    *,
+    delimiter: str | None,
+    page_size: int | None,
+    stop: threading.Event | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Pages of keys and common prefixes in ``(lower, upper]`` (either bound open when None)."""
+    token = None
+    while stop is None or not stop.is_set():
+        kwargs: dict[str, Any] = {"Bucket": bucket, "Prefix": prefix}
+        if delimiter:
+            kwargs["Delimiter"] = delimiter
+        if page_size:
+            kwargs["MaxKeys"] = page_size
+        if token:
+            kwargs["ContinuationToken"] = token
+        elif lower:
+            kwargs["StartAfter"] = lower
+        resp = client.list_objects_v2(**kwargs)
+        contents = resp.get("Contents") or []
+        prefixes = resp.get("CommonPrefixes") or []
+        past = False
+        if upper is not None:
+            kept = [obj for obj in contents if (obj.get("Key") or "") <= upper]
+            kept_prefixes = [cp for cp in prefixes if (cp.get("Prefix") or "") <= upper]
+            past = len(kept) < len(contents) or len(kept_prefixes) < len(prefixes)
+            contents, prefixes = kept, kept_prefixes
+        if contents or prefixes:
+            yield {"Contents": contents, "CommonPrefixes": prefixes}
+        if past or not resp.get("IsTruncated"):
+            return
+        token = resp.get("NextContinuationToken")
+
+
+def list_pages(
+    client,
+    bucket: str,
+    prefix: str,
+    *,
+    shards: int = 1,
+    delimiter: str | None = None,
+    page_size: int | None = None,
+    alphabet: str = SESSION_ID_ALPHABET,
+    buffer_pages: int = BUFFER_PAGES,
+) -> Iterator[dict[str, Any]]:
+    """ListObjectsV2 pages under ``prefix`` in key order, ``shards`` key ranges listed at once."""
+    if delimiter:
+        # A boundary containing the delimiter would split a common prefix across two ranges.
+        alphabet = alphabet.replace(delimiter, "")
+    bounds = [f"{prefix}{b}" for b in shard_boundaries(shards, alphabet)]
+    if not bounds:
+        yield from _range_pages(client, bucket, prefix, None, None, delimiter=delimiter, page_size=page_size)
+        return
+    lowers = [None, *bounds]
+    uppers = [*bounds, None]
+    stop = threading.Event()
+    queues: list[queue.Queue] = [queue.Queue(maxsize=max(1, buffer_pages)) for _ in lowers]
+
+    def put(i: int, item: Any) -> None:
+        # A full queue waits for the consumer, or gives up once it has stopped reading.
+        while not stop.is_set():
+            try:
+                queues[i].put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def walk(i: int) -> None:
+        try:
+            for page in _range_pages(
+                client, bucket, prefix, lowers[i], uppers[i], delimiter=delimiter, page_size=page_size, stop=stop
+            ):
+                put(i, page)
+        except Exception as exc:
+            put(i, exc)
+        finally:
+            put(i, _DONE)
+
+    pool = ThreadPoolExecutor(max_workers=len(lowers), thread_name_prefix="list-shard")
+    try:
+        for i in range(len(lowers)):
+            pool.submit(walk, i)
+        for q in queues:
+            while (item := q.get()) is not _DONE:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,200 @@
+"""
+On-disk metadata.json cache keyed by S3 key and ETag, shared by the ops scripts.
+
+Repeat dry runs read the same metadata.json objects again and again. Entries are stored
+one file per S3 key (``<dir>/<sha256[:2]>/<sha256>``: a JSON header line with key and
+ETag, then the raw body) and evicted least-recently-used once the directory exceeds
+``max_bytes``. Recency is kept in file mtimes, so it survives between runs.
+
+When the caller already knows the object's ETag (flat listings, relabel's key listing),
+a matching entry is served without any request. Otherwise the cached ETag is sent as
+``If-None-Match`` and a 304 reuses the cached body, so only changed objects are
+transferred. Bodies are parsed on every read, so callers may mutate what they get back.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+
+def _norm_etag(etag: str | None) -> str | None:
+    return etag.strip().strip('"') if etag else None
+
+
+def _error_code(exc: BaseException) -> str:
+    response = getattr(exc, "response", None) or {}
+    return str((response.get("Error") or {}).get("Code") or "")
+
+
+def is_not_modified(exc: BaseException) -> bool:
+    response = getattr(exc, "response", None) or {}
+    status = (response.get("ResponseMetadata") or {}).get("HTTPStatusCode")
+    return status == 304 or _error_code(exc) in ("304", "NotModified")
+
+
+def is_missing(exc: BaseException) -> bool:
+    return _error_code(exc) in ("NoSuchKey", "404", "NotFound")
+
+
+class MetadataCache:
+    """Size-bounded LRU of S3 object bodies, validated by ETag."""
+
+    def __init__(self, directory: str | os.PathLike, *, max_bytes: int = 512 * 1024 * 1024) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max(0, max_bytes)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._total = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        found = []
+        for path in self.directory.glob("*/*"):
+            if path.suffix == ".tmp":
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            found.append((st.st_mtime, path.name, st.st_size))
+        for _mtime, name, size in sorted(found):
+            self._entries[name] = size
+            self._total += size
+        self._evict()
+
+    def _evict(self) -> None:
+        evict: list[str] = []
+        with self._lock:
+            while self._total > self.max_bytes and self._entries:
+                old, size = self._entries.popitem(last=False)
+                self._total -= size
+                evict.append(old)
+        for old in evict:
+            try:
+                self._path(old).unlink()
+            except OSError:
+                pass
+
+    def _path(self, name: str) -> Path:
+        return self.directory / name[:2] / name
+
+    @staticmethod
+    def _name(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str) -> tuple[str, bytes] | None:
+        """``(etag, body)`` of the cached entry for ``key``, whatever its ETag."""
+        name = self._name(key)
+        try:
+            raw = self._path(name).read_bytes()
+        except OSError:
+            return None
+        header, _, body = raw.partition(b"\n")
+        try:
+            meta = json.loads(header)
+        except ValueError:
+            return None
+        if meta.get("key") != key:
+            return None
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+        try:
+            os.utime(self._path(name))
+        except OSError:
+            pass
+        return meta.get("etag") or "", body
+
+    def get(self, key: str, etag: str) -> bytes | None:
+        """Cached body when the entry's ETag matches ``etag``."""
+        entry = self.lookup(key)
+        if entry is None or entry[0] != _norm_etag(etag):
+            return None
+        return entry[1]
+
+    def put(self, key: str, etag: str | None, body: bytes) -> None:
+        if not etag:
+            return
+        name = self._name(key)
+        path = self._path(name)
+        header = json.dumps({"key": key, "etag": _norm_etag(etag)}).encode("utf-8")
+        data = header + b"\n" + body
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_name(f"{name}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._total += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+        self._evict()
+
+    def discard(self, key: str) -> None:
+        name = self._name(key)
+        with self._lock:
+            self._total -= self._entries.pop(name, 0)
+        try:
+            self._path(name).unlink()
+        except OSError:
+            pass
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def read_json(self, s3, bucket: str, key: str, etag: str | None = None) -> Any | None:
+        """Parsed object (None when missing) via a boto3-style client, using the cache."""
+        if etag:
+            body = self.get(key, etag)
+            if body is not None:
+                self._count("hits")
+                return json.loads(body)
+        cached = self.lookup(key)
+        kwargs: dict[str, Any] = {"Bucket": bucket, "Key": key}
+        if cached and cached[0]:
+            kwargs["IfNoneMatch"] = f'"{cached[0]}"'
+        try:
+            resp = s3.get_object(**kwargs)
+        except Exception as exc:
+            if cached and is_not_modified(exc):
+                self._count("revalidated")
+                return json.loads(cached[1])
+            if is_missing(exc):
+                self.discard(key)
+                return None
+            raise
+        body = resp["Body"].read()
+        self._count("misses")
+        self.put(key, resp.get("ETag"), body)
+        return json.loads(body)
+
+    async def read_json_async(self, aio, bucket: str, key: str, etag: str | None = None) -> Any | None:
+        """:meth:`read_json` through an ``amr_ops.aio_s3.AsyncS3``."""
+        if etag:
+            body = self.get(key, etag)
+            if body is not None:
+                self._count("hits")
+                return json.loads(body)
+        cached = self.lookup(key)
+        known = f'"{cached[0]}"' if cached and cached[0] else None
+        body, new_etag = await aio.get_conditional(bucket, key, if_none_match=known)
+        if body is None:
+            if new_etag is None:
+                self.discard(key)
+                return None
+            self._count("revalidated")
+            return json.loads(cached[1])
+        self._count("misses")
+        self.put(key, new_etag, body)
+        return json.loads(body)
+
+    def describe(self) -> str:
+        return (
+            f"{self.hits} hits, {self.revalidated} revalidated (304), {self.misses} fetched; "
+            f"{len(self._entries)} entries, {self._total / 1024 / 1024:.1f} MB"
+        )
@@ -0,0 +1,285 @@
+"""
+Live throughput / latency metrics for long-running ops scripts.
+
+``Metrics`` keeps per-operation counters (requests, errors, throttles), in-flight gauges
+and cumulative latency histograms (LIST, GET, HEAD, PUT, COPY, DELETE from S3, plus
+anything the script times itself, e.g. GEOCODE or INDEX), and per-result session
+counts. ``MetricsReporter`` snapshots them every ``interval`` seconds on a background
+thread: one JSON object per line (sessions/sec over the last interval and overall, ETA
+when the total is known, p50/p99 per operation) and, optionally, a Prometheus textfile
+for node_exporter's textfile collector (written atomically).
+
+``MeteredClient`` wraps a boto3 client; ``AsyncS3`` takes ``metrics`` directly. Wrap
+the metered client in ``AdaptiveClient`` (not the other way round) so every attempt,
+including throttled ones, is observed.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, TextIO
+
+from amr_ops.adaptive import OP_FOR_METHOD, is_throttle
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is +Inf.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Same operation names as the S3 stand-in / benchmark report (HEAD kept apart from GET).
+_METHOD_OPS = {**OP_FOR_METHOD, "head_object": "HEAD"}
+
+
+class _OpStats:
+    __slots__ = ("requests", "errors", "throttles", "inflight", "total_seconds", "max_seconds", "buckets")
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.throttles = 0
+        self.inflight = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def quantile(self, q: float) -> float | None:
+        """Estimate from the histogram (linear within the bucket, capped at the largest sample)."""
+        if not self.requests:
+            return None
+        rank = q * self.requests
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            if count and seen + count >= rank:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+                return min(self.max_seconds, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+        return self.max_seconds
+
+
+class Metrics:
+    """Thread-safe counters and histograms for one script run."""
+
+    def __init__(self, job: str, *, total: int | None = None) -> None:
+        self.job = job
+        self.total = total
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._ops: dict[str, _OpStats] = {}
+        self.results: dict[str, int] = {}
+        self.done = 0
+        self.limits: Callable[[], dict[str, Any]] | None = None
+
+    def _op(self, op: str) -> _OpStats:
+        stats = self._ops.get(op)
+        if stats is None:
+            stats = self._ops[op] = _OpStats()
+        return stats
+
+    def start(self, op: str) -> float:
+        with self._lock:
+            self._op(op).inflight += 1
+        return time.perf_counter()
+
+    def finish(self, op: str, started: float, error: BaseException | None = None) -> None:
+        seconds = time.perf_counter() - started
+        with self._lock:
+            stats = self._op(op)
+            stats.inflight -= 1
+            stats.requests += 1
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.buckets[bisect_left(BUCKETS, seconds)] += 1
+            if error is not None:
+                stats.errors += 1
+                if is_throttle(error):
+                    stats.throttles += 1
+
+    @contextmanager
+    def timer(self, op: str) -> Iterator[None]:
+        started = self.start(op)
+        try:
+            yield
+        except BaseException as exc:
+            self.finish(op, started, exc)
+            raise
+        self.finish(op, started)
+
+    def session_done(self, result: str) -> None:
+        with self._lock:
+            self.done += 1
+            self.results[result] = self.results.get(result, 0) + 1
+
+    def snapshot(self) -> dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            ops = {
+                op: {
+                    "requests": s.requests,
+                    "errors": s.errors,
+                    "throttles": s.throttles,
+                    "inflight": s.inflight,
+                    "mean_ms": round(s.total_seconds / s.requests * 1000, 2) if s.requests else None,
+                    "p50_ms": _ms(s.quantile(0.50)),
+                    "p99_ms": _ms(s.quantile(0.99)),
+                }
+                for op, s in sorted(self._ops.items())
+            }
+            done = self.done
+            results = dict(self.results)
+        elapsed = now - self.started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        snap: dict[str, Any] = {
+            "ts": round(now, 3),
+            "job": self.job,
+            "elapsed_s": round(elapsed, 1),
+            "sessions_done": done,
+            "sessions_total": self.total,
+            "sessions_per_s": round(rate, 2),
+            "eta_s": round((self.total - done) / rate, 1) if self.total and rate > 0 else None,
+            "results": results,
+            "inflight": sum(o["inflight"] for o in ops.values()),
+            "ops": ops,
+        }
+        if self.limits is not None:
+            snap["limits"] = self.limits()
+        return snap
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition of the current counters and histograms."""
+        labels = f'job="{self.job}"'
+        lines = [
+            "# HELP amr_ops_requests_total Requests issued, per operation.",
+            "# TYPE amr_ops_requests_total counter",
+        ]
+        with self._lock:
+            ops = {
+                op: (s.requests, s.errors, s.throttles, s.inflight, s.total_seconds, list(s.buckets))
+                for op, s in sorted(self._ops.items())
+            }
+            results = dict(self.results)
+            done = self.done
+        for op, (requests, *_rest) in ops.items():
+            lines.append(f'amr_ops_requests_total{{{labels},op="{op}"}} {requests}')
+        lines += ["# HELP amr_ops_request_errors_total Failed requests, per operation.",
+                  "# TYPE amr_ops_request_errors_total counter"]
+        for op, (_r, errors, *_rest) in ops.items():
+            lines.append(f'amr_ops_request_errors_total{{{labels},op="{op}"}} {errors}')
+        lines += ["# HELP amr_ops_request_throttles_total Throttled requests (SlowDown/503/429).",
+                  "# TYPE amr_ops_request_throttles_total counter"]
+        for op, (_r, _e, throttles, *_rest) in ops.items():
+            lines.append(f'amr_ops_request_throttles_total{{{labels},op="{op}"}} {throttles}')
+        lines += ["# HELP amr_ops_inflight Requests currently in flight.", "# TYPE amr_ops_inflight gauge"]
+        for op, (_r, _e, _t, inflight, *_rest) in ops.items():
+            lines.append(f'amr_ops_inflight{{{labels},op="{op}"}} {inflight}')
+        lines += ["# HELP amr_ops_request_duration_seconds Request latency.",
+                  "# TYPE amr_ops_request_duration_seconds histogram"]
+        for op, (requests, _e, _t, _i, total_seconds, buckets) in ops.items():
+            cumulative = 0
+            for bound, count in zip((*BUCKETS, "+Inf"), buckets):
+                cumulative += count
+                lines.append(
+                    f'amr_ops_request_duration_seconds_bucket{{{labels},op="{op}",le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'amr_ops_request_duration_seconds_sum{{{labels},op="{op}"}} {total_seconds:.6f}')
+            lines.append(f'amr_ops_request_duration_seconds_count{{{labels},op="{op}"}} {requests}')
+        lines += ["# HELP amr_ops_sessions_total Sessions finished, per result.",
+                  "# TYPE amr_ops_sessions_total counter"]
+        for result, count in sorted(results.items()):
+            lines.append(f'amr_ops_sessions_total{{{labels},result="{result}"}} {count}')
+        elapsed = max(time.time() - self.started, 1e-9)
+        lines += [
+            "# TYPE amr_ops_sessions_per_second gauge",
+            f"amr_ops_sessions_per_second{{{labels}}} {done / elapsed:.3f}",
+            "# TYPE amr_ops_start_time_seconds gauge",
+            f"amr_ops_start_time_seconds{{{labels}}} {self.started:.3f}",
+        ]
+        if self.total:
+            lines += ["# TYPE amr_ops_sessions_expected gauge", f"amr_ops_sessions_expected{{{labels}}} {self.total}"]
+        return "\n".join(lines) + "\n"
+
+
+def _ms(seconds: float | None) -> float | None:
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+class MeteredClient:
+    """boto3 client proxy that records every S3 call in a :class:`Metrics`."""
+
+    def __init__(self, client, metrics: Metrics) -> None:
+        self._client = client
+        self._metrics = metrics
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        op = _METHOD_OPS.get(name)
+        if op is None or not callable(attr):
+            return attr
+
+        def _call(*args, **kwargs):
+            with self._metrics.timer(op):
+                return attr(*args, **kwargs)
+
+        return _call
+
+
+def method_op(method: str) -> str:
+    return _METHOD_OPS.get(method, method)
+
+
+class MetricsReporter:
+    """Emit :class:`Metrics` snapshots periodically (JSON lines and/or Prometheus textfile)."""
+
+    def __init__(
+        self,
+        metrics: Metrics,
+        *,
+        jsonl: str | None = None,
+        textfile: str | None = None,
+        interval: float = 10.0,
+    ) -> None:
+        self.metrics = metrics
+        self.textfile = Path(textfile) if textfile else None
+        self.interval = max(0.5, interval)
+        self._out: TextIO | None = None
+        if jsonl == "-":
+            self._out = sys.stderr
+        elif jsonl:
+            self._out = open(jsonl, "a", encoding="utf-8")
+        self._last_done = 0
+        self._last_ts = metrics.started
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.emit()
+
+    def emit(self) -> None:
+        snap = self.metrics.snapshot()
+        window = snap["ts"] - self._last_ts
+        snap["window_sessions_per_s"] = (
+            round((snap["sessions_done"] - self._last_done) / window, 2) if window > 0 else None
+        )
+        self._last_done, self._last_ts = snap["sessions_done"], snap["ts"]
+        if self._out is not None:
+            self._out.write(json.dumps(snap) + "\n")
+            self._out.flush()
+        if self.textfile is not None:
+            tmp = self.textfile.with_name(f".{self.textfile.name}.tmp")
+            tmp.write_text(self.metrics.prometheus(), encoding="utf-8")
+            os.replace(tmp, self.textfile)
+
+    def close(self) -> None:
+        """Stop the timer and write a final snapshot."""
+        self._stop.set()
+        self._thread.join()
+        self.emit()
+        if self._out is not None and self._out is not sys.stderr:
+            self._out.close()
+
@@ -0,0 +1,248 @@
+"""
+Offline reverse geocoding from a local place dataset.
+
+Answers ``(area, city, state)`` for whole batches of coordinates without a network, so
+relabelling is no longer paced by Nominatim's one request per second. Datasets:
+
+* GeoJSON FeatureCollection (``.geojson`` / ``.json``) of Polygon / MultiPolygon and/or
+  Point features;
+* CSV (``.csv``) of centroids with ``latitude``/``longitude`` (or ``lat``/``lon``) columns.
+
+Fields are read from feature properties / CSV columns using the same fallbacks as the
+Nominatim parser: area from ``area``, ``suburb``, ``neighbourhood`` (or ``neighborhood``),
+``quarter``, ``hamlet``, ``city_district``; city from ``city``, ``town``, ``village``,
+``municipality``; state from ``state``. OSM-style exports with ``name`` plus ``place``
+(``neighbourhood``, ``city``, ``state``, …) work too.
+
+A point takes each field from the smallest polygon containing it that has that field
+(neighbourhood polygons inside city polygons inside state polygons), then fills
+whatever is still missing from the nearest centroid within ``max_meters``.
+Point-in-polygon tests are even-odd ray casts vectorized over every (point, edge) pair of
+the polygons whose bounding box holds the point; centroids use
+``amr_ops.spatial.PointIndex``.
+
+Requires numpy (``pip install -r scripts/requirements-geo-offline.txt``).
+"""
+from __future__ import annotations
+
+import csv
+import json
+from pathlib import Path
+from typing import Any, Iterable, Sequence
+
+from amr_ops.spatial import PointIndex, np
+
+Place = tuple[str | None, str | None, str | None]  # (area, city, state)
+
+AREA_KEYS = ("area", "suburb", "neighbourhood", "neighborhood", "quarter", "hamlet", "city_district")
+CITY_KEYS = ("city", "town", "village", "municipality")
+STATE_KEYS = ("state",)
+
+_PLACE_TYPE_FIELD = {
+    **{key: 0 for key in AREA_KEYS},
+    **{key: 1 for key in CITY_KEYS},
+    **{key: 2 for key in STATE_KEYS},
+}
+
+# (query points × polygon edges) crossing tests per chunk.
+_BLOCK = 1 << 22
+
+
+def _clean(value: Any) -> str | None:
+    if value is None:
+        return None
+    text = str(value).strip()
+    return text or None
+
+
+def place_fields(props: dict[str, Any]) -> Place:
+    """``(area, city, state)`` from GeoJSON properties or a CSV row."""
+    lowered = {str(k).lower(): v for k, v in props.items()}
+    fields: list[str | None] = [
+        next((v for k in keys if (v := _clean(lowered.get(k)))), None)
+        for keys in (AREA_KEYS, CITY_KEYS, STATE_KEYS)
+    ]
+    slot = _PLACE_TYPE_FIELD.get(str(lowered.get("place") or "").lower())
+    name = _clean(lowered.get("name"))
+    if slot is not None and name and fields[slot] is None:
+        fields[slot] = name
+    return fields[0], fields[1], fields[2]
+
+
+class PolygonIndex:
+    """Flat edge arrays for many polygons, tested against many points at once."""
+
+    def __init__(self, polygons: list[tuple[Place, list[np.ndarray]]]) -> None:
+        areas = []
+        for _place, rings in polygons:
+            ring_areas = [
+                float(np.sum(r[:, 0] * np.roll(r[:, 1], -1) - np.roll(r[:, 0], -1) * r[:, 1])) / 2.0 for r in rings
+            ]
+            areas.append(abs(sum(ring_areas)))
+        # Smallest first, so a neighbourhood wins over the city polygon around it.
+        order = sorted(range(len(polygons)), key=areas.__getitem__)
+        self.names = np.array([polygons[i][0] for i in order], dtype=object).reshape(-1, 3)
+        self.provides = np.not_equal(self.names, None)
+        starts, ends, bboxes, counts = [], [], [], []
+        for i in order:
+            rings = polygons[i][1]
+            # Even-odd over all rings handles holes and multipolygon parts alike.
+            starts.extend(rings)
+            ends.extend(np.roll(ring, -1, axis=0) for ring in rings)
+            points = np.concatenate(rings)
+            bboxes.append((*points.min(axis=0), *points.max(axis=0)))
+            counts.append(len(points))
+        self.bboxes = np.array(bboxes, dtype=np.float64).reshape(-1, 4)
+        self.edge_count = np.array(counts, dtype=np.int64)
+        self.edge_start = np.cumsum(self.edge_count) - self.edge_count
+        start_xy = np.concatenate(starts) if starts else np.empty((0, 2))
+        end_xy = np.concatenate(ends) if ends else np.empty((0, 2))
+        self.x1, self.y1 = start_xy[:, 0], start_xy[:, 1]
+        self.x2, self.y2 = end_xy[:, 0], end_xy[:, 1]
+
+    def __len__(self) -> int:
+        return len(self.bboxes)
+
+    def _candidates(self, xs: np.ndarray, ys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """``(point, polygon)`` pairs whose bounding boxes overlap."""
+        b = self.bboxes
+        pts, polys = [], []
+        step = max(1, _BLOCK // len(b))
+        for start in range(0, len(xs), step):
+            x = xs[start : start + step, None]
+            y = ys[start : start + step, None]
+            p, q = np.nonzero((b[:, 0] <= x) & (x <= b[:, 2]) & (b[:, 1] <= y) & (y <= b[:, 3]))
+            pts.append(p + start)
+            polys.append(q)
+        return np.concatenate(pts), np.concatenate(polys)
+
+    def _contains(self, xs: np.ndarray, ys: np.ndarray, polys: np.ndarray) -> np.ndarray:
+        """Even-odd ray cast for each ``(xs[i], ys[i])`` against ``polys[i]``."""
+        counts = self.edge_count[polys]
+        ends = np.cumsum(counts)
+        inside = np.zeros(len(polys), dtype=bool)
+        start = 0
+        while start < len(polys):
+            done = ends[start - 1] if start else 0
+            stop = max(start + 1, int(np.searchsorted(ends, done + _BLOCK, side="right")))
+            c = counts[start:stop]
+            pair = np.repeat(np.arange(stop - start), c)
+            edge = np.repeat(self.edge_start[polys[start:stop]] - (np.cumsum(c) - c), c) + np.arange(c.sum())
+            px, py = xs[start:stop][pair], ys[start:stop][pair]
+            x1, y1, x2, y2 = self.x1[edge], self.y1[edge], self.x2[edge], self.y2[edge]
+            straddles = (y1 > py) != (y2 > py)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cross_x = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+            crossings = np.bincount(pair, weights=straddles & (px < cross_x), minlength=stop - start)
+            inside[start:stop] = crossings.astype(np.int64) % 2 == 1
+            start = stop
+        return inside
+
+    def fill(self, xs: np.ndarray, ys: np.ndarray, fields: np.ndarray) -> None:
+        """Set each field of ``fields`` (n × 3, None = unset) from the smallest containing polygon."""
+        if not len(xs) or not len(self):
+            return
+        pts, polys = self._candidates(xs, ys)
+        inside = self._contains(xs[pts], ys[pts], polys)
+        pts, polys = pts[inside], polys[inside]
+        # Polygons are numbered smallest first, so the first hit per point wins.
+        order = np.lexsort((polys, pts))
+        pts, polys = pts[order], polys[order]
+        for slot in range(3):
+            has = self.provides[polys, slot]
+            p, q = pts[has], polys[has]
+            _unique, first = np.unique(p, return_index=True)
+            fields[p[first], slot] = self.names[q[first], slot]
+
+
+def _rings(geometry: dict[str, Any]) -> list[np.ndarray]:
+    kind = geometry.get("type")
+    coords = geometry.get("coordinates") or []
+    if kind == "Polygon":
+        polygons = [coords]
+    elif kind == "MultiPolygon":
+        polygons = coords
+    else:
+        return []
+    rings = []
+    for polygon in polygons:
+        for ring in polygon:
+            arr = np.asarray(ring, dtype=np.float64)[:, :2]
+            if len(arr) >= 3:
+                rings.append(arr)
+    return rings
+
+
+class OfflineGeocoder:
+    """Reverse geocoder over a local GeoJSON/CSV place dataset."""
+
+    def __init__(self, path: str | Path, *, max_meters: float = 10_000.0) -> None:
+        self.path = Path(path).expanduser()
+        self.max_meters = max_meters
+        polygons: list[tuple[Place, list[np.ndarray]]] = []
+        centroid_places: list[Place] = []
+        lats: list[float] = []
+        lons: list[float] = []
+        if self.path.suffix.lower() == ".csv":
+            records = self._csv_records()
+        else:
+            records = self._geojson_records()
+        for place, rings, point in records:
+            if not any(place):
+                continue
+            if rings:
+                polygons.append((place, rings))
+            elif point is not None:
+                centroid_places.append(place)
+                lats.append(point[0])
+                lons.append(point[1])
+        self.polygons = PolygonIndex(polygons)
+        self.centroid_places = centroid_places
+        self.centroids = PointIndex(lats, lons)
+        stat = self.path.stat()
+        # Geocode cache namespace: a changed dataset does not reuse old answers.
+        self.source = f"offline:{self.path.name}:{stat.st_size}:{int(stat.st_mtime)}"
+
+    def _geojson_records(self) -> Iterable[tuple[Place, list[np.ndarray], tuple[float, float] | None]]:
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        features = data.get("features") if isinstance(data, dict) else data
+        for feature in features or []:
+            geometry = feature.get("geometry") or {}
+            place = place_fields(feature.get("properties") or {})
+            if geometry.get("type") == "Point":
+                lon, lat = geometry["coordinates"][:2]
+                yield place, [], (float(lat), float(lon))
+            elif rings := _rings(geometry):
+                yield place, rings, None
+
+    def _csv_records(self) -> Iterable[tuple[Place, list[np.ndarray], tuple[float, float] | None]]:
+        with self.path.open(newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                lowered = {str(k).strip().lower(): v for k, v in row.items() if k}
+                lat = lowered.get("latitude") or lowered.get("lat")
+                lon = lowered.get("longitude") or lowered.get("lon") or lowered.get("lng")
+                try:
+                    point = (float(lat), float(lon))
+                except (TypeError, ValueError):
+                    continue
+                yield place_fields(lowered), [], point
+
+    def lookup_many(self, lats: Sequence[float] | np.ndarray, lons: Sequence[float] | np.ndarray) -> list[Place]:
+        """``(area, city, state)`` per coordinate; fields stay None when nothing matches."""
+        ys = np.asarray(lats, dtype=np.float64)
+        xs = np.asarray(lons, dtype=np.float64)
+        fields = np.full((len(xs), 3), None, dtype=object)
+        self.polygons.fill(xs, ys, fields)
+        missing = np.flatnonzero(np.any(np.equal(fields, None), axis=1))
+        if len(missing) and len(self.centroids):
+            nearest, _meters = self.centroids.nearest(ys[missing], xs[missing], self.max_meters)
+            for row, idx in zip(missing, nearest):
+                if idx < 0:
+                    continue
+                for slot, value in enumerate(self.centroid_places[idx]):
+                    if fields[row, slot] is None:
+                        fields[row, slot] = value
+        return [(row[0], row[1], row[2]) for row in fields]
+
+    def describe(self) -> str:
+        return f"{self.path.name}: {len(self.polygons)} polygons, {len(self.centroids)} centroids"
@@ -0,0 +1,103 @@
+"""
+Image normalization for evaluation exports, run in a process pool.
+
+Each image is decoded, rotated upright from its EXIF orientation, converted to RGB,
+downscaled so its longer side is at most ``max_side`` (never upscaled) and re-encoded
+as JPEG, so HEIC/HEIF captures come out as JPEG too. Decoding and resizing are
+CPU-bound and hold the GIL, so ``Preprocessor`` runs them in worker processes
+(``spawn``, which is safe alongside the caller's download threads) while the caller
+keeps downloading; jobs are submitted as images arrive and collected by key.
+
+Requires Pillow, plus pillow-heif for HEIC/HEIF
+(``pip install -r scripts/requirements-preprocess.txt``).
+"""
+from __future__ import annotations
+
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any
+
+try:
+    from PIL import Image, ImageOps
+except ImportError as exc:
+    raise ImportError("image preprocessing needs Pillow: pip install -r scripts/requirements-preprocess.txt") from exc
+
+try:
+    from pillow_heif import register_heif_opener
+except ImportError:
+    register_heif_opener = None
+else:
+    register_heif_opener()
+
+
+def normalize(data: bytes, max_side: int, quality: int) -> tuple[bytes, int, int]:
+    """Upright RGB JPEG no larger than ``max_side`` on its longer side, and its size."""
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if max_side > 0 and max(img.size) > max_side:
+            img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, "JPEG", quality=quality, optimize=True)
+        return out.getvalue(), img.width, img.height
+
+
+def preprocess_bytes(data: bytes, max_side: int, quality: int) -> dict[str, Any]:
+    started = time.perf_counter()
+    jpeg, width, height = normalize(data, max_side, quality)
+    return {"data": jpeg, "width": width, "height": height, "ms": (time.perf_counter() - started) * 1000}
+
+
+def preprocess_file(src: str, dst: str, max_side: int, quality: int) -> dict[str, Any]:
+    """Normalize ``src`` into ``dst``; an output newer than its source is only measured."""
+    if os.path.isfile(dst) and os.path.getmtime(dst) >= os.path.getmtime(src):
+        with Image.open(dst) as img:
+            return {"width": img.width, "height": img.height, "ms": None}
+    started = time.perf_counter()
+    with open(src, "rb") as f:
+        jpeg, width, height = normalize(f.read(), max_side, quality)
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    tmp = f"{dst}.partial"
+    with open(tmp, "wb") as f:
+        f.write(jpeg)
+    os.replace(tmp, dst)
+    return {"width": width, "height": height, "ms": (time.perf_counter() - started) * 1000}
+
+
+class Preprocessor:
+    """Process pool for :func:`preprocess_file` / :func:`preprocess_bytes` jobs keyed by S3 key."""
+
+    def __init__(self, *, workers: int | None = None, max_side: int = 1024, quality: int = 90) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.max_side = max_side
+        self.quality = quality
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self._jobs: dict[str, Future] = {}
+
+    def submit_file(self, key: str, src: str, dst: str) -> None:
+        self._jobs[key] = self._pool.submit(preprocess_file, src, dst, self.max_side, self.quality)
+
+    def submit_bytes(self, key: str, data: bytes) -> None:
+        self._jobs[key] = self._pool.submit(preprocess_bytes, data, self.max_side, self.quality)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._jobs
+
+    def result(self, key: str) -> dict[str, Any] | BaseException:
+        """Wait for ``key``'s job; its result dict, or the exception it raised."""
+        future = self._jobs.pop(key)
+        try:
+            return future.result()
+        except Exception as exc:
+            return exc
+
+    def close(self) -> None:
+        self._pool.shutdown(cancel_futures=True)
+
+    def describe(self) -> str:
+        heif = "with" if register_heif_opener is not None else "without"
+        return f"preprocessing to JPEG ≤{self.max_side}px on {self.workers} processes ({heif} HEIF support)"
@@ -0,0 +1,698 @@
+#!/usr/bin/env python3
+"""
+In-memory S3 stand-in for running the ops scripts offline.
+
+Implements the subset of the S3 REST API the scripts use: ListObjectsV2 (prefix,
+delimiter, continuation tokens), Get/Head/Put/Copy/DeleteObject, DeleteObjects,
+multipart uploads including UploadPartCopy, and CreateBucket. Signatures are not
+checked. Point boto3 / aiobotocore at it with an IP endpoint so requests use path-style
+addressing:
+
+  python3 scripts/amr_ops/s3_standin.py --port 9000 --bucket meter-reader-training-feedback
+  AWS_ENDPOINT_URL_S3=http://127.0.0.1:9000 AWS_ACCESS_KEY_ID=x AWS_SECRET_ACCESS_KEY=x \\
+    python3 scripts/reclassify_field_sessions_bulk.py --dry-run
+
+``--latency-ms``/``--jitter-ms`` delay every request and ``--throttle-rate`` answers that
+fraction of requests with 503 SlowDown, so concurrency and retry behaviour can be
+measured offline (``scripts/benchmark_s3_ops.py``). The server counts requests and
+records handling latency per operation (LIST, GET, HEAD, PUT, COPY, DELETE).
+
+Stdlib only, so it also runs where boto3 is not installed.
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import random
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from bisect import bisect_left
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, NamedTuple
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+S3_NS = "http://s3.amazonaws.com/doc/2006-03-01/"
+
+
+class StoredObject(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: float
+    content_type: str
+    metadata: dict[str, str]
+
+
+class SortedKeys:
+    """Sorted set of keys kept in bounded blocks, so inserts never shift the whole set."""
+
+    BLOCK = 1024
+
+    def __init__(self) -> None:
+        self._blocks: list[list[str]] = []
+        self._maxes: list[str] = []
+
+    def add(self, key: str) -> None:
+        if not self._blocks:
+            self._blocks, self._maxes = [[key]], [key]
+            return
+        i = min(bisect_left(self._maxes, key), len(self._blocks) - 1)
+        block = self._blocks[i]
+        j = bisect_left(block, key)
+        if j < len(block) and block[j] == key:
+            return
+        block.insert(j, key)
+        self._maxes[i] = block[-1]
+        if len(block) > 2 * self.BLOCK:
+            self._blocks[i : i + 1] = [block[: self.BLOCK], block[self.BLOCK :]]
+            self._maxes[i : i + 1] = [block[self.BLOCK - 1], block[-1]]
+
+    def discard(self, key: str) -> None:
+        i = bisect_left(self._maxes, key)
+        if i == len(self._blocks):
+            return
+        block = self._blocks[i]
+        j = bisect_left(block, key)
+        if j < len(block) and block[j] == key:
+            del block[j]
+            if block:
+                self._maxes[i] = block[-1]
+            else:
+                del self._blocks[i]
+                del self._maxes[i]
+
+    def iter_from(self, start: str) -> Iterator[str]:
+        """Keys ``>= start`` in order. Callers must hold the store lock while iterating."""
+        i = bisect_left(self._maxes, start)
+        if i == len(self._blocks):
+            return
+        block = self._blocks[i]
+        yield from block[bisect_left(block, start) :]
+        for block in self._blocks[i + 1 :]:
+            yield from block
+
+
+class S3Error(Exception):
+    def __init__(self, status: int, code: str, message: str = "", resource: str = "") -> None:
+        super().__init__(message or code)
+        self.status = status
+        self.code = code
+        self.resource = resource
+
+
+class Bucket:
+    def __init__(self) -> None:
+        self.objects: dict[str, StoredObject] = {}
+        self.keys = SortedKeys()
+        self.uploads: dict[str, dict] = {}
+
+
+class S3Store:
+    """Thread-safe in-memory buckets. Also used directly to seed data without HTTP."""
+
+    def __init__(self) -> None:
+        self.buckets: dict[str, Bucket] = {}
+        self.lock = threading.RLock()
+
+    def create_bucket(self, name: str) -> None:
+        with self.lock:
+            self.buckets.setdefault(name, Bucket())
+
+    def bucket(self, name: str) -> Bucket:
+        b = self.buckets.get(name)
+        if b is None:
+            raise S3Error(404, "NoSuchBucket", "The specified bucket does not exist", name)
+        return b
+
+    def put(
+        self,
+        bucket: str,
+        key: str,
+        body: bytes,
+        *,
+        content_type: str = "binary/octet-stream",
+        metadata: dict[str, str] | None = None,
+        etag: str | None = None,
+    ) -> StoredObject:
+        obj = StoredObject(
+            body,
+            etag or f'"{hashlib.md5(body).hexdigest()}"',
+            time.time(),
+            content_type,
+            dict(metadata or {}),
+        )
+        with self.lock:
+            b = self.bucket(bucket)
+            b.objects[key] = obj
+            b.keys.add(key)
+        return obj
+
+    def get(self, bucket: str, key: str) -> StoredObject:
+        with self.lock:
+            obj = self.bucket(bucket).objects.get(key)
+        if obj is None:
+            raise S3Error(404, "NoSuchKey", "The specified key does not exist.", key)
+        return obj
+
+    def delete(self, bucket: str, key: str) -> None:
+        with self.lock:
+            b = self.bucket(bucket)
+            if b.objects.pop(key, None) is not None:
+                b.keys.discard(key)
+
+    def list(
+        self,
+        bucket: str,
+        prefix: str,
+        *,
+        delimiter: str = "",
+        max_keys: int = 1000,
+        after: str = "",
+    ) -> tuple[list[tuple[str, StoredObject]], list[str], str | None]:
+        """One ListObjectsV2 page: (contents, common prefixes, next marker or None)."""
+        contents: list[tuple[str, StoredObject]] = []
+        prefixes: list[str] = []
+        last = ""
+        with self.lock:
+            b = self.bucket(bucket)
+            for key in b.keys.iter_from(max(prefix, after)):
+                if not key.startswith(prefix):
+                    break
+                if after and (key <= after or (after.endswith(delimiter or "\0") and key.startswith(after))):
+                    continue
+                common = ""
+                if delimiter:
+                    cut = key.find(delimiter, len(prefix))
+                    if cut >= 0:
+                        common = key[: cut + len(delimiter)]
+                        if prefixes and prefixes[-1] == common:
+                            continue
+                if len(contents) + len(prefixes) >= max_keys:
+                    return contents, prefixes, last
+                if common:
+                    prefixes.append(common)
+                    last = common
+                    continue
+                contents.append((key, b.objects[key]))
+                last = key
+        return contents, prefixes, None
+
+
+def _http_date(ts: float) -> str:
+    return formatdate(ts, usegmt=True)
+
+
+def _iso_date(ts: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(ts))
+
+
+def _tag(name: str, value) -> str:
+    return f"<{name}>{escape(str(value))}</{name}>"
+
+
+def _encode_token(marker: str) -> str:
+    return base64.urlsafe_b64encode(marker.encode("utf-8")).decode("ascii")
+
+
+def _decode_token(token: str) -> str:
+    return base64.urlsafe_b64decode(token.encode("ascii")).decode("utf-8")
+
+
+def _decode_aws_chunked(raw: bytes) -> bytes:
+    out = bytearray()
+    pos = 0
+    while pos < len(raw):
+        eol = raw.index(b"\r\n", pos)
+        size = int(raw[pos:eol].split(b";", 1)[0], 16)
+        pos = eol + 2
+        if size == 0:
+            break
+        out += raw[pos : pos + size]
+        pos += size + 2
+    return bytes(out)
+
+
+class S3RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without TCP_NODELAY every keep-alive
+    # response waits on the client's delayed ACK (~40 ms).
+    disable_nagle_algorithm = True
+    server: "S3StandInServer"
+    _op: str | None = None  # the request's operation until its stats are recorded
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002 - BaseHTTPRequestHandler API
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    # -- plumbing -------------------------------------------------------------------
+
+    def _route(self) -> tuple[str, str, dict[str, list[str]]]:
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query, keep_blank_values=True)
+        path = parts.path.lstrip("/")
+        bucket, _, key = path.partition("/")
+        return unquote(bucket), unquote(key), query
+
+    def _read_body(self) -> bytes:
+        if "chunked" in (self.headers.get("Transfer-Encoding") or "").lower():
+            raw = bytearray()
+            while True:
+                size = int(self.rfile.readline().split(b";", 1)[0].strip() or b"0", 16)
+                if size == 0:
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                raw += self.rfile.read(size)
+                self.rfile.readline()
+            body = bytes(raw)
+        else:
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        sha = self.headers.get("x-amz-content-sha256") or ""
+        if "aws-chunked" in (self.headers.get("Content-Encoding") or "") or sha.startswith("STREAMING-"):
+            body = _decode_aws_chunked(body)
+        return body
+
+    def _send(self, status: int, body: bytes = b"", headers: dict[str, str] | None = None) -> None:
+        if self._op is not None:
+            # Recorded before answering, so the stats include a request once its client has the response.
+            self.server.record(self._op, time.perf_counter() - self._started, self._error)
+            self._op = None
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("x-amz-request-id", uuid.uuid4().hex[:16])
+        if "Content-Length" not in (headers or {}):
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_xml(self, status: int, xml: str) -> None:
+        body = ('<?xml version="1.0" encoding="UTF-8"?>\n' + xml).encode("utf-8")
+        self._send(status, body, {"Content-Type": "application/xml"})
+
+    def _send_error(self, err: S3Error) -> None:
+        self._error = err.code
+        if self.command == "HEAD":
+            self._send(err.status)
+            return
+        self._send_xml(
+            err.status,
+            f"<Error>{_tag('Code', err.code)}{_tag('Message', err)}"
+            f"{_tag('Resource', err.resource)}{_tag('RequestId', uuid.uuid4().hex[:16])}</Error>",
+        )
+
+    def _operation(self, key: str, query: dict[str, list[str]]) -> str:
+        if self.command == "GET" and not key:
+            return "LIST"
+        if self.command in ("GET", "HEAD"):
+            return self.command
+        if self.command == "PUT" and (self.headers.get("x-amz-copy-source") or "partNumber" in query):
+            return "COPY"
+        if self.command == "POST" and "delete" not in query:
+            return "COPY"
+        if self.command in ("POST", "DELETE"):
+            return "DELETE"
+        return self.command
+
+    def _dispatch(self, handler) -> None:
+        bucket, key, query = self._route()
+        self._op, self._started, self._error = self._operation(key, query), time.perf_counter(), None
+        try:
+            try:
+                self.server.before_request(self.command, bucket, key, query)
+            except S3Error:
+                # The request body was never read; do not reuse the connection.
+                self.close_connection = True
+                raise
+            handler(bucket, key, query)
+        except S3Error as err:
+            self._send_error(err)
+
+    def do_GET(self) -> None:
+        self._dispatch(self._get)
+
+    def do_HEAD(self) -> None:
+        self._dispatch(self._get)
+
+    def do_PUT(self) -> None:
+        self._dispatch(self._put)
+
+    def do_POST(self) -> None:
+        self._dispatch(self._post)
+
+    def do_DELETE(self) -> None:
+        self._dispatch(self._delete)
+
+    # -- operations -----------------------------------------------------------------
+
+    def _object_headers(self, obj: StoredObject) -> dict[str, str]:
+        headers = {
+            "ETag": obj.etag,
+            "Last-Modified": _http_date(obj.last_modified),
+            "Content-Type": obj.content_type,
+            "Accept-Ranges": "bytes",
+        }
+        for name, value in obj.metadata.items():
+            headers[f"x-amz-meta-{name}"] = value
+        return headers
+
+    def _get(self, bucket: str, key: str, query: dict[str, list[str]]) -> None:
+        store = self.server.store
+        if not key:
+            if self.command == "HEAD":
+                store.bucket(bucket)
+                self._send(200)
+                return
+            if "location" in query:
+                store.bucket(bucket)
+                self._send_xml(200, f'<LocationConstraint xmlns="{S3_NS}"></LocationConstraint>')
+                return
+            self._list(bucket, query)
+            return
+        obj = store.get(bucket, key)
+        headers = self._object_headers(obj)
+        if self.headers.get("If-None-Match") == obj.etag:
+            self._send(304, headers={"ETag": obj.etag})
+            return
+        body = obj.body
+        status = 200
+        rng = self.headers.get("Range")
+        if rng and rng.startswith("bytes="):
+            first_s, _, last_s = rng[6:].partition("-")
+            size = len(obj.body)
+            if first_s:
+                first, last = int(first_s), min(int(last_s) if last_s else size - 1, size - 1)
+            else:
+                first, last = max(0, size - int(last_s)), size - 1
+            body = obj.body[first : last + 1]
+            headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+            status = 206
+        headers["Content-Length"] = str(len(body))
+        self._send(status, body, headers)
+
+    def _list(self, bucket: str, query: dict[str, list[str]]) -> None:
+        def arg(name: str, default: str = "") -> str:
+            return (query.get(name) or [default])[0]
+
+        prefix = arg("prefix")
+        delimiter = arg("delimiter")
+        max_keys = max(1, min(1000, int(arg("max-keys", "1000") or 1000)))
+        token = arg("continuation-token")
+        after = _decode_token(token) if token else arg("start-after")
+        contents, prefixes, marker = self.server.store.list(
+            bucket, prefix, delimiter=delimiter, max_keys=max_keys, after=after
+        )
+        parts = [
+            f'<ListBucketResult xmlns="{S3_NS}">',
+            _tag("Name", bucket),
+            _tag("Prefix", prefix),
+            _tag("KeyCount", len(contents) + len(prefixes)),
+            _tag("MaxKeys", max_keys),
+            _tag("IsTruncated", "true" if marker else "false"),
+        ]
+        if delimiter:
+            parts.append(_tag("Delimiter", delimiter))
+        if token:
+            parts.append(_tag("ContinuationToken", token))
+        if marker:
+            parts.append(_tag("NextContinuationToken", _encode_token(marker)))
+        for key, obj in contents:
+            parts.append(
+                "<Contents>"
+                f"{_tag('Key', key)}{_tag('LastModified', _iso_date(obj.last_modified))}"
+                f"{_tag('ETag', obj.etag)}{_tag('Size', len(obj.body))}"
+                f"{_tag('StorageClass', 'STANDARD')}</Contents>"
+            )
+        for common in prefixes:
+            parts.append(f"<CommonPrefixes>{_tag('Prefix', common)}</CommonPrefixes>")
+        parts.append("</ListBucketResult>")
+        self._send_xml(200, "".join(parts))
+
+    def _copy_source(self) -> tuple[str, str]:
+        src = unquote(self.headers["x-amz-copy-source"]).lstrip("/").split("?", 1)[0]
+        src_bucket, _, src_key = src.partition("/")
+        return src_bucket, src_key
+
+    def _request_metadata(self) -> dict[str, str]:
+        return {
+            name[len("x-amz-meta-") :]: value
+            for name, value in self.headers.items()
+            if name.lower().startswith("x-amz-meta-")
+        }
+
+    def _put(self, bucket: str, key: str, query: dict[str, list[str]]) -> None:
+        store = self.server.store
+        body = self._read_body()
+        if not key:
+            store.create_bucket(bucket)
+            self._send(200, headers={"Location": f"/{bucket}"})
+            return
+        if "uploadId" in query:
+            self._upload_part(bucket, key, query, body)
+            return
+        if "x-amz-copy-source" in self.headers:
+            src = store.get(*self._copy_source())
+            if (self.headers.get("x-amz-metadata-directive") or "COPY").upper() == "REPLACE":
+                content_type = self.headers.get("Content-Type") or src.content_type
+                metadata = self._request_metadata()
+            else:
+                content_type, metadata = src.content_type, src.metadata
+            obj = store.put(
+                bucket, key, src.body, content_type=content_type, metadata=metadata, etag=src.etag
+            )
+            self._send_xml(
+                200,
+                f"<CopyObjectResult>{_tag('LastModified', _iso_date(obj.last_modified))}"
+                f"{_tag('ETag', obj.etag)}</CopyObjectResult>",
+            )
+            return
+        obj = store.put(
+            bucket,
+            key,
+            body,
+            content_type=self.headers.get("Content-Type") or "binary/octet-stream",
+            metadata=self._request_metadata(),
+        )
+        self._send(200, headers={"ETag": obj.etag})
+
+    def _upload(self, bucket: str, query: dict[str, list[str]]) -> dict:
+        upload = self.server.store.bucket(bucket).uploads.get(query["uploadId"][0])
+        if upload is None:
+            raise S3Error(404, "NoSuchUpload", "The specified upload does not exist.")
+        return upload
+
+    def _upload_part(self, bucket: str, key: str, query: dict[str, list[str]], body: bytes) -> None:
+        upload = self._upload(bucket, query)
+        number = int(query["partNumber"][0])
+        copying = "x-amz-copy-source" in self.headers
+        if copying:
+            data = self.server.store.get(*self._copy_source()).body
+            rng = self.headers.get("x-amz-copy-source-range")
+            if rng:
+                first, _, last = rng.removeprefix("bytes=").partition("-")
+                data = data[int(first) : int(last) + 1]
+        else:
+            data = body
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        with self.server.store.lock:
+            upload["parts"][number] = (data, etag)
+        if copying:
+            self._send_xml(
+                200,
+                f"<CopyPartResult>{_tag('LastModified', _iso_date(time.time()))}"
+                f"{_tag('ETag', etag)}</CopyPartResult>",
+            )
+        else:
+            self._send(200, headers={"ETag": etag})
+
+    def _post(self, bucket: str, key: str, query: dict[str, list[str]]) -> None:
+        store = self.server.store
+        body = self._read_body()
+        if "delete" in query:
+            root = ET.fromstring(body)
+            quiet = (root.findtext(f"{{{S3_NS}}}Quiet") or root.findtext("Quiet") or "").lower() == "true"
+            deleted = []
+            for node in root.iter():
+                if node.tag.endswith("Object"):
+                    name = node.findtext(f"{{{S3_NS}}}Key") or node.findtext("Key")
+                    if name is not None:
+                        store.delete(bucket, name)
+                        deleted.append(name)
+            entries = "" if quiet else "".join(f"<Deleted>{_tag('Key', k)}</Deleted>" for k in deleted)
+            self._send_xml(200, f'<DeleteResult xmlns="{S3_NS}">{entries}</DeleteResult>')
+            return
+        if "uploads" in query:
+            upload_id = uuid.uuid4().hex
+            with store.lock:
+                store.bucket(bucket).uploads[upload_id] = {
+                    "key": key,
+                    "parts": {},
+                    "content_type": self.headers.get("Content-Type") or "binary/octet-stream",
+                    "metadata": self._request_metadata(),
+                }
+            self._send_xml(
+                200,
+                f'<InitiateMultipartUploadResult xmlns="{S3_NS}">{_tag("Bucket", bucket)}'
+                f'{_tag("Key", key)}{_tag("UploadId", upload_id)}</InitiateMultipartUploadResult>',
+            )
+            return
+        if "uploadId" in query:
+            upload = self._upload(bucket, query)
+            root = ET.fromstring(body)
+            numbers = sorted(
+                int(node.text or 0) for node in root.iter() if node.tag.endswith("PartNumber")
+            )
+            missing = [n for n in numbers if n not in upload["parts"]]
+            if missing:
+                raise S3Error(400, "InvalidPart", f"Part {missing[0]} was not uploaded")
+            data = b"".join(upload["parts"][n][0] for n in numbers)
+            digest = hashlib.md5(
+                b"".join(bytes.fromhex(upload["parts"][n][1].strip('"')) for n in numbers)
+            ).hexdigest()
+            obj = store.put(
+                bucket,
+                key,
+                data,
+                content_type=upload["content_type"],
+                metadata=upload["metadata"],
+                etag=f'"{digest}-{len(numbers)}"',
+            )
+            with store.lock:
+                store.bucket(bucket).uploads.pop(query["uploadId"][0], None)
+            self._send_xml(
+                200,
+                f'<CompleteMultipartUploadResult xmlns="{S3_NS}">{_tag("Bucket", bucket)}'
+                f'{_tag("Key", key)}{_tag("ETag", obj.etag)}</CompleteMultipartUploadResult>',
+            )
+            return
+        raise S3Error(400, "NotImplemented", "Unsupported POST operation")
+
+    def _delete(self, bucket: str, key: str, query: dict[str, list[str]]) -> None:
+        store = self.server.store
+        if "uploadId" in query:
+            with store.lock:
+                store.bucket(bucket).uploads.pop(query["uploadId"][0], None)
+        elif key:
+            store.delete(bucket, key)
+        else:
+            with store.lock:
+                store.buckets.pop(bucket, None)
+        self._send(204)
+
+
+class S3StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Many concurrent clients (thread pools, asyncio) connect at once.
+    request_queue_size = 1024
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        store: S3Store,
+        *,
+        verbose: bool = False,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        throttle_rate: float = 0.0,
+        seed: int | None = None,
+    ) -> None:
+        super().__init__(address, S3RequestHandler)
+        self.store = store
+        self.verbose = verbose
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self._rng = random.Random(seed)
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def before_request(self, method: str, bucket: str, key: str, query: dict[str, list[str]]) -> None:
+        """Injects the configured latency and SlowDown throttling; subclasses may extend."""
+        with self._stats_lock:
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            throttled = bool(self.throttle_rate) and self._rng.random() < self.throttle_rate
+        if delay > 0:
+            time.sleep(delay)
+        if throttled:
+            raise S3Error(503, "SlowDown", "Please reduce your request rate.", key or bucket)
+
+    def record(self, op: str, seconds: float, error: str | None) -> None:
+        with self._stats_lock:
+            self.latencies.setdefault(op, []).append(seconds)
+            if error:
+                self.errors[error] = self.errors.get(error, 0) + 1
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self.latencies: dict[str, list[float]] = {}
+            self.errors: dict[str, int] = {}
+
+
+class S3StandIn:
+    """Run an :class:`S3StandInServer` on a background thread (for tests and benchmarks)."""
+
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 0, *, store: S3Store | None = None, **faults
+    ) -> None:
+        self.store = store or S3Store()
+        self.server = S3StandInServer((host, port), self.store, **faults)
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "S3StandIn":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="s3-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "S3StandIn":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="In-memory S3 stand-in for offline runs")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=9000)
+    ap.add_argument("--bucket", action="append", default=[], help="Create this bucket at startup")
+    ap.add_argument("--verbose", action="store_true", help="Log every request")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every request")
+    ap.add_argument("--jitter-ms", type=float, default=0.0, help="Extra uniform random delay per request")
+    ap.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered 503 SlowDown")
+    args = ap.parse_args()
+
+    store = S3Store()
+    for name in args.bucket:
+        store.create_bucket(name)
+    server = S3StandInServer(
+        (args.host, args.port),
+        store,
+        verbose=args.verbose,
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        throttle_rate=args.throttle_rate,
+    )
+    print(f"S3 stand-in on http://{args.host}:{args.port} (buckets: {', '.join(args.bucket) or 'none'})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,454 @@
+"""
+Incremental write-through to the ``amr-sessions`` DynamoDB session index.
+
+Mirrors the key and GSI layout of ``server/sessionIndex/`` (``metadataMapping.js``,
+``prefixInfer.js``, ``workTypes.js``, ``dynamoStore.js#updateAfterMove``) so the ops
+scripts can update only the sessions they touched instead of asking for a full
+``npm run backfill:dynamo-sessions``.
+
+Items are updated in place (``UpdateItem`` guarded by ``attribute_exists(session_id)``)
+on a bounded thread pool. BatchWriteItem only supports whole-item puts, and rebuilding
+full items would mean porting ``metadataToSessionItem`` and the field-test derivation;
+sessions missing from the index are counted so the operator can backfill just those.
+
+``SessionIndexReader`` goes the other way: it selects candidate sessions from the index
+(parallel ``Query`` per gsi1 partition, or a segmented parallel ``Scan``) so the scripts
+only touch S3 for sessions that match. Like boto3 itself it honours
+``AWS_ENDPOINT_URL_DYNAMODB``, so a local DynamoDB stand-in works unchanged.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Iterable, Iterator
+
+# prefixInfer.js FOLDER_SUFFIX_TO_STATUS
+FOLDER_SUFFIX_TO_STATUS = {
+    "correct": "correct",
+    "incorrect": "incorrect_new",
+    "incorrect_analyzed": "incorrect_analyzed",
+    "incorrect_labeled": "incorrect_labeled",
+    "incorrect_training": "incorrect_training",
+    "no_dials": "no_dials",
+    "not_sure": "not_sure",
+    "skipped_review": "incorrect_new",
+}
+
+# workTypes.js
+WORK_TYPES = ["1000", "2000", "3000", "4000", "5000"]
+ALL_STATUSES = [
+    "correct",
+    "incorrect_new",
+    "incorrect_analyzed",
+    "incorrect_labeled",
+    "incorrect_training",
+    "no_dials",
+    "not_sure",
+    "manually_uploaded",
+]
+IOS_CODE_TO_PORTAL_WORK_TYPE = {
+    "METR": "1000",
+    "GO95": "2000",
+    "RISR": "3000",
+    "LEAK": "4000",
+    "INTR": "5000",
+}
+
+
+# metadataMapping.js sets these from deriveFieldTestFromMetadata, for field uploads only.
+FIELD_TEST_ATTRIBUTES = (
+    "on_tick_dial_count",
+    "reads_corrected_count",
+    "had_user_correction",
+    "final_reading",
+    "per_dial_compact",
+    "field_test_capture",
+)
+IMAGE_DIFFICULTIES = ("normal", "difficult", "very_difficult")
+
+
+def normalize_s3_session_prefix(prefix: str | None) -> str:
+    trimmed = (prefix or "").strip()
+    if not trimmed:
+        return ""
+    return trimmed if trimmed.endswith("/") else f"{trimmed}/"
+
+
+def infer_status_and_source(prefix: str) -> tuple[str, str]:
+    """(folder_status, source_type) for a session prefix, as ``inferStatusAndSourceFromSessionPrefix``."""
+    parts = [p for p in normalize_s3_session_prefix(prefix).split("/") if p]
+    for seg in reversed(parts[:-1]):
+        if seg == "manually_uploaded":
+            return "manually_uploaded", "simulator"
+        if seg == "correct":
+            return "correct", "field"
+        if seg == "incorrect":
+            return "incorrect_new", "field"
+        if seg.startswith("f_"):
+            return FOLDER_SUFFIX_TO_STATUS.get(seg[2:], "incorrect_new"), "field"
+        if seg.startswith("s_"):
+            return FOLDER_SUFFIX_TO_STATUS.get(seg[2:], "incorrect_new"), "simulator"
+    return "incorrect_new", "field"
+
+
+def work_type_hint_from_prefix(prefix: str) -> str:
+    for seg in normalize_s3_session_prefix(prefix).split("/"):
+        if seg in WORK_TYPES:
+            return seg
+        if seg.upper() in IOS_CODE_TO_PORTAL_WORK_TYPE:
+            return IOS_CODE_TO_PORTAL_WORK_TYPE[seg.upper()]
+    return "1000"
+
+
+def infer_portal_work_type(metadata: dict, hint: str = "1000") -> str:
+    """``inferPortalWorkTypeFromMetadata``."""
+    raw = metadata.get("work_type")
+    if raw is None:
+        raw = metadata.get("work_type_code")
+    raw = str(hint if raw is None else raw).strip()
+    if raw in WORK_TYPES:
+        return raw
+    mapped = IOS_CODE_TO_PORTAL_WORK_TYPE.get(raw.upper())
+    if mapped:
+        return mapped
+    return hint if hint in WORK_TYPES else "1000"
+
+
+def build_gsi1_pk(portal_work_type: str, folder_status: str, source_type: str) -> str:
+    return f"WT#{portal_work_type}#ST#{folder_status}#SRC#{source_type}"
+
+
+def build_gsi1_sk(captured_at: str | None, session_id: str) -> str:
+    ts = str(captured_at).strip() if captured_at and str(captured_at).strip() else "1970-01-01T00:00:00.000Z"
+    return f"{ts}#{session_id}"
+
+
+def session_id_for(metadata: dict, prefix: str) -> str:
+    sid = str(metadata.get("session_id") or "").strip()
+    if sid:
+        return sid
+    parts = [p for p in normalize_s3_session_prefix(prefix).split("/") if p]
+    return parts[-1] if parts else ""
+
+
+def primary_image_key_for(metadata: dict, prefix: str) -> str | None:
+    """``primary_image_key`` as ``metadataToSessionItem`` derives it from metadata alone."""
+    for name, base in (("primary_image_key", ""), ("primary_image_file", prefix)):
+        value = metadata.get(name)
+        if isinstance(value, str) and value.strip():
+            return f"{base}{value.strip()}"
+    return None
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _dynamo_value(value: Any) -> Any:
+    """JSON-ish value → something TypeSerializer accepts (floats become Decimal)."""
+    return json.loads(json.dumps(value), parse_float=Decimal)
+
+
+class SessionIndexWriter:
+    """Parallel, bounded ``UpdateItem`` writer for session index rows."""
+
+    def __init__(
+        self, table: str, *, region: str, workers: int = 16, client=None, metrics=None
+    ) -> None:
+        import boto3
+        from boto3.dynamodb.types import TypeSerializer
+        from botocore.config import Config
+
+        self.table = table
+        self.client = client or boto3.client(
+            "dynamodb", region_name=region, config=Config(max_pool_connections=workers + 4)
+        )
+        self._serializer = TypeSerializer()
+        self.metrics = metrics
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="session-index")
+        # Bound queued updates so a fast producer cannot buffer the whole run in memory.
+        self._slots = threading.BoundedSemaphore(max(1, workers) * 8)
+        self._lock = threading.Lock()
+        self.counts = {"updated": 0, "missing": 0, "failed": 0}
+        self.missing: list[str] = []
+
+    def _update(self, session_id: str, values: dict[str, Any], remove: tuple[str, ...] = ()) -> None:
+        names = {f"#a{i}": name for i, name in enumerate(values)}
+        names.update({f"#r{i}": name for i, name in enumerate(remove)})
+        attr_values = {
+            f":v{i}": self._serializer.serialize(_dynamo_value(value))
+            for i, value in enumerate(values.values())
+        }
+        expression = "SET " + ", ".join(f"#a{i} = :v{i}" for i in range(len(values)))
+        if remove:
+            expression += " REMOVE " + ", ".join(f"#r{i}" for i in range(len(remove)))
+        started = self.metrics.start("INDEX") if self.metrics is not None else 0.0
+        error: BaseException | None = None
+        try:
+            self.client.update_item(
+                TableName=self.table,
+                Key={"session_id": {"S": session_id}},
+                UpdateExpression=expression,
+                ConditionExpression="attribute_exists(session_id)",
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=attr_values,
+            )
+            outcome = "updated"
+        except Exception as exc:
+            code = ((getattr(exc, "response", None) or {}).get("Error") or {}).get("Code")
+            outcome = "missing" if code == "ConditionalCheckFailedException" else "failed"
+            if outcome == "failed":
+                error = exc
+                print(f"  ⚠️ index {session_id}: {exc}", flush=True)
+        if self.metrics is not None:
+            self.metrics.finish("INDEX", started, error)
+        with self._lock:
+            self.counts[outcome] += 1
+            if outcome == "missing":
+                self.missing.append(session_id)
+
+    def _submit(self, session_id: str, values: dict[str, Any], remove: tuple[str, ...] = ()) -> None:
+        if not session_id:
+            with self._lock:
+                self.counts["failed"] += 1
+            return
+        self._slots.acquire()
+
+        def _run() -> None:
+            try:
+                self._update(session_id, values, remove)
+            finally:
+                self._slots.release()
+
+        self._pool.submit(_run)
+
+    def after_move(self, metadata: dict, s3_session_prefix: str) -> None:
+        """
+        Re-point a moved session (``updateAfterMove``, plus the rewritten upload_mode) and
+        bring the attributes ``metadataToSessionItem`` derives from the moved metadata in
+        line: ``primary_image_key`` follows the new prefix (or is removed, so readers fall
+        back to it), ``metadata_etag`` of the source object is removed, and a session that
+        is no longer a field upload loses its field-test attributes and field-derived
+        ``image_difficulty``.
+        """
+        prefix = normalize_s3_session_prefix(s3_session_prefix)
+        sid = session_id_for(metadata, prefix)
+        status, source = infer_status_and_source(prefix)
+        work_type = infer_portal_work_type(metadata, work_type_hint_from_prefix(prefix))
+        captured_at = metadata.get("timestamp") or _now_iso()
+        values: dict[str, Any] = {
+            "s3_session_prefix": prefix,
+            "folder_status": status,
+            "source_type": source,
+            "portal_work_type": work_type,
+            "gsi1pk": build_gsi1_pk(work_type, status, source),
+            "gsi1sk": build_gsi1_sk(captured_at, sid),
+            "updated_at": _now_iso(),
+        }
+        if metadata.get("upload_mode") is not None:
+            values["upload_mode"] = str(metadata["upload_mode"])
+        remove = ["metadata_etag"]
+        primary_image_key = primary_image_key_for(metadata, prefix)
+        if primary_image_key:
+            values["primary_image_key"] = primary_image_key
+        else:
+            remove.append("primary_image_key")
+        if str(metadata.get("upload_mode") or "").strip().lower() != "field":
+            remove.extend(FIELD_TEST_ATTRIBUTES)
+            if metadata.get("image_difficulty") in IMAGE_DIFFICULTIES:
+                values["image_difficulty"] = metadata["image_difficulty"]
+            else:
+                remove.append("image_difficulty")
+        self._submit(sid, values, tuple(remove))
+
+    async def after_move_async(self, metadata: dict, s3_session_prefix: str) -> None:
+        """:meth:`after_move` for coroutines: waits for a queue slot off the event loop."""
+        await asyncio.to_thread(self.after_move, metadata, s3_session_prefix)
+
+    def set_capture_location(self, session_id: str, capture_location: dict) -> None:
+        """Replace ``capture_location`` (e.g. after a place_label relabel)."""
+        self._submit(session_id, {"capture_location": capture_location, "updated_at": _now_iso()})
+
+    def close(self) -> dict[str, int]:
+        """Wait for queued writes; returns the outcome counts."""
+        self._pool.shutdown(wait=True)
+        return dict(self.counts)
+
+    def describe(self) -> str:
+        c = self.counts
+        text = f"index {self.table}: updated {c['updated']}, not indexed {c['missing']}, failed {c['failed']}"
+        if self.missing:
+            text += f" (e.g. {', '.join(self.missing[:5])})"
+        return text
+
+
+def _plain(value: Any) -> Any:
+    """Deserialized DynamoDB value → plain JSON types (Decimal becomes int/float)."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, set)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def gsi1_partitions(work_types: Iterable[str], statuses: Iterable[str], sources: Iterable[str]) -> list[str]:
+    """gsi1pk values to query, as ``dynamoStore.js#gsi1QueryJobs``."""
+    return [
+        build_gsi1_pk(wt, status, src)
+        for wt in work_types
+        for status in statuses
+        for src in sources
+        if status != "manually_uploaded" or src == "simulator"
+    ]
+
+
+class SessionIndexReader:
+    """
+    Candidate selection from the session index.
+
+    A *job* names one unit of parallel work: ``gsi1:<gsi1pk>`` (Query one gsi1 partition)
+    or ``scan:<segment>/<total>`` (one Scan segment). :meth:`pages` pages through one job;
+    :meth:`items` runs many jobs on ``workers`` threads and yields items as they arrive.
+    """
+
+    def __init__(self, table: str, *, region: str, workers: int = 8, client=None, metrics=None) -> None:
+        import boto3
+        from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+        from botocore.config import Config
+
+        self.table = table
+        self.workers = max(1, workers)
+        self.client = client or boto3.client(
+            "dynamodb", region_name=region, config=Config(max_pool_connections=self.workers + 4)
+        )
+        self._deserializer = TypeDeserializer()
+        self._serializer = TypeSerializer()
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "items": 0, "consumed_rcu": 0.0}
+
+    @staticmethod
+    def query_jobs(partitions: Iterable[str]) -> list[str]:
+        return [f"gsi1:{pk}" for pk in partitions]
+
+    @staticmethod
+    def scan_jobs(segments: int) -> list[str]:
+        total = max(1, segments)
+        return [f"scan:{i}/{total}" for i in range(total)]
+
+    def pages(
+        self,
+        job: str,
+        *,
+        projection: Iterable[str] | None = None,
+        filter_expression: str | None = None,
+        filter_values: dict[str, Any] | None = None,
+    ) -> Iterator[list[dict]]:
+        """Items of one job, a response page at a time (filters apply to Scan jobs only)."""
+        kind, _, arg = job.partition(":")
+        kwargs: dict[str, Any] = {"TableName": self.table, "ReturnConsumedCapacity": "TOTAL"}
+        names: dict[str, str] = {}
+        if projection:
+            fields = list(projection)
+            names.update({f"#p{i}": f for i, f in enumerate(fields)})
+            kwargs["ProjectionExpression"] = ", ".join(f"#p{i}" for i in range(len(fields)))
+        if kind == "gsi1":
+            op = "QUERY"
+            call = self.client.query
+            kwargs["IndexName"] = "gsi1"
+            kwargs["KeyConditionExpression"] = "#pk = :pk"
+            names["#pk"] = "gsi1pk"
+            kwargs["ExpressionAttributeValues"] = {":pk": {"S": arg}}
+        elif kind == "scan":
+            op = "SCAN"
+            call = self.client.scan
+            segment, _, total = arg.partition("/")
+            kwargs["Segment"] = int(segment)
+            kwargs["TotalSegments"] = int(total)
+            if filter_expression:
+                kwargs["FilterExpression"] = filter_expression
+                kwargs["ExpressionAttributeValues"] = {
+                    k: self._serializer.serialize(_dynamo_value(v)) for k, v in (filter_values or {}).items()
+                }
+        else:
+            raise ValueError(f"unknown index job {job!r}")
+        if names:
+            kwargs["ExpressionAttributeNames"] = names
+        while True:
+            started = self.metrics.start(op) if self.metrics is not None else 0.0
+            error: BaseException | None = None
+            try:
+                resp = call(**kwargs)
+            except BaseException as exc:
+                error = exc
+                raise
+            finally:
+                if self.metrics is not None:
+                    self.metrics.finish(op, started, error)
+            items = [
+                _plain({k: self._deserializer.deserialize(v) for k, v in raw.items()})
+                for raw in resp.get("Items") or []
+            ]
+            with self._lock:
+                self.counts["requests"] += 1
+                self.counts["items"] += len(items)
+                self.counts["consumed_rcu"] += float((resp.get("ConsumedCapacity") or {}).get("CapacityUnits") or 0)
+            yield items
+            if not resp.get("LastEvaluatedKey"):
+                return
+            kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+    def items(self, jobs: list[str], **page_kwargs: Any) -> Iterator[dict]:
+        """Run ``jobs`` on ``workers`` threads; yields items in arrival order."""
+        out: queue.Queue = queue.Queue(maxsize=self.workers * 4)
+        done = object()
+        stop = threading.Event()
+
+        def put(item: Any) -> None:
+            # Give up once the consumer has gone away instead of blocking on a full queue.
+            while not stop.is_set():
+                try:
+                    out.put(item, timeout=0.2)
+                    return
+                except queue.Full:
+                    continue
+
+        def run(job: str) -> None:
+            try:
+                for page in self.pages(job, **page_kwargs):
+                    if stop.is_set():
+                        return
+                    put(page)
+            except Exception as exc:
+                print(f"  ⚠️ index {job}: {exc}", flush=True)
+            finally:
+                put(done)
+
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="session-index-read")
+        for job in jobs:
+            pool.submit(run, job)
+        try:
+            remaining = len(jobs)
+            while remaining:
+                page = out.get()
+                if page is done:
+                    remaining -= 1
+                    continue
+                yield from page
+        finally:
+            stop.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def describe(self) -> str:
+        c = self.counts
+        return (
+            f"index {self.table}: {c['items']} items in {c['requests']} requests "
+            f"({c['consumed_rcu']:.1f} RCU)"
+        )
@@ -0,0 +1,141 @@
+"""
+Sequential tar shards with per-shard offset indexes (WebDataset layout).
+
+Each sample is a group of consecutive tar members sharing a key: ``<key>.<ext>`` for
+every part (e.g. ``sess0/original.jpg`` and ``sess0/original.json``), so WebDataset and
+plain ``tar`` read the shards as they are. ``ShardWriter`` starts a new shard once the
+current one would exceed ``max_bytes`` and writes ``<shard>.idx.json`` beside it with the
+byte offset and size of every member's data. ``ShardReader`` memory-maps a shard and
+returns any member by key and extension without extracting or scanning the tar.
+
+Shards are written as ``<name>.partial`` and renamed (after their index) on close, so a
+``*.tar`` that exists is always complete.
+"""
+from __future__ import annotations
+
+import io
+import json
+import mmap
+import os
+import tarfile
+import time
+from pathlib import Path
+from typing import Iterator, Sequence
+
+INDEX_SUFFIX = ".idx.json"
+INDEX_VERSION = 1
+
+
+def _padded(size: int) -> int:
+    return -(-size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+
+
+class ShardWriter:
+    """Append samples to ``<out_dir>/<name>-000000.tar``, ``…-000001.tar``, …"""
+
+    def __init__(self, out_dir: str | Path, *, max_bytes: int, name: str = "shard") -> None:
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.name = name
+        self.mtime = int(time.time())
+        self.shards: list[str] = []
+        self.samples = 0
+        self._tar: tarfile.TarFile | None = None
+        self._path: Path | None = None
+        self._members: list[dict] = []
+
+    def existing(self) -> list[Path]:
+        """Shards and indexes with this writer's name already in ``out_dir``."""
+        return sorted(p for p in self.out_dir.glob(f"{self.name}-*") if p.name.endswith((".tar", INDEX_SUFFIX)))
+
+    def _open(self) -> None:
+        self._path = self.out_dir / f"{self.name}-{len(self.shards):06d}.tar"
+        self._tar = tarfile.open(self._path.with_name(self._path.name + ".partial"), "w")
+        self._members = []
+        self.shards.append(self._path.name)
+
+    def _close(self) -> None:
+        if self._tar is None or self._path is None:
+            return
+        self._tar.close()
+        index = {"version": INDEX_VERSION, "shard": self._path.name, "members": self._members}
+        idx_path = self._path.with_name(self._path.name + INDEX_SUFFIX)
+        tmp = idx_path.with_name(idx_path.name + ".partial")
+        tmp.write_text(json.dumps(index, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, idx_path)
+        os.replace(self._path.with_name(self._path.name + ".partial"), self._path)
+        self._tar = None
+
+    def add(self, key: str, parts: Sequence[tuple[str, bytes]]) -> tuple[str, list[tuple[int, int]]]:
+        """Append ``<key>.<ext>`` per ``(ext, data)``; returns the shard name and ``(offset, size)`` per part."""
+        needed = sum(tarfile.BLOCKSIZE + _padded(len(data)) for _ext, data in parts)
+        if self._tar is not None and self._members and self._tar.offset + needed > self.max_bytes:
+            self._close()
+        if self._tar is None:
+            self._open()
+        assert self._tar is not None
+        spans = []
+        for ext, data in parts:
+            info = tarfile.TarInfo(f"{key}.{ext}")
+            info.size = len(data)
+            info.mtime = self.mtime
+            self._tar.addfile(info, io.BytesIO(data))
+            # Data ends where the member's zero padding ends; headers can span several blocks.
+            offset = self._tar.offset - _padded(len(data))
+            self._members.append({"key": key, "ext": ext, "offset": offset, "size": len(data)})
+            spans.append((offset, len(data)))
+        self.samples += 1
+        return self.shards[-1], spans
+
+    def close(self) -> None:
+        self._close()
+
+    def __enter__(self) -> "ShardWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class ShardReader:
+    """Random access to the members of one shard through its offset index."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        index = json.loads(self.path.with_name(self.path.name + INDEX_SUFFIX).read_text(encoding="utf-8"))
+        self.samples: dict[str, dict[str, tuple[int, int]]] = {}
+        for member in index["members"]:
+            self.samples.setdefault(member["key"], {})[member["ext"]] = (member["offset"], member["size"])
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.samples)
+
+    def read(self, key: str, ext: str) -> bytes:
+        offset, size = self.samples[key][ext]
+        return self._map[offset : offset + size]
+
+    def read_json(self, key: str, ext: str = "json") -> dict:
+        return json.loads(self.read(key, ext))
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "ShardReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def shard_paths(directory: str | Path, name: str = "*") -> list[Path]:
+    """Complete shards (``*.tar`` with an index) in ``directory``, in order."""
+    return sorted(
+        p for p in Path(directory).glob(f"{name}-*.tar") if p.with_name(p.name + INDEX_SUFFIX).is_file()
+    )
@@ -0,0 +1,98 @@
+"""
+Vectorized nearest-neighbour search over lat/lon points.
+
+Points are mapped to unit vectors on the sphere, so straight-line (chord) distance is
+monotonic in great-circle distance and no projection or antimeridian handling is
+needed. ``PointIndex`` uses scipy's ``cKDTree`` when scipy is installed and otherwise
+a chunked NumPy search (one matrix product per chunk of queries), which is fast enough
+for the tens of thousands of places or sessions the relabel script deals with.
+
+Requires numpy (``pip install -r scripts/requirements-geo-offline.txt``).
+"""
+from __future__ import annotations
+
+from typing import Sequence
+
+try:
+    import numpy as np
+except ImportError as exc:
+    raise ImportError(
+        "offline geocoding needs numpy: pip install -r scripts/requirements-geo-offline.txt"
+    ) from exc
+
+EARTH_RADIUS_M = 6_371_008.8
+
+# Query chunk is sized so the (queries × points) distance block stays around 16M floats.
+_BLOCK = 1 << 24
+
+
+def unit_vectors(lats: Sequence[float] | np.ndarray, lons: Sequence[float] | np.ndarray) -> np.ndarray:
+    """``(n, 3)`` unit vectors for degree coordinates."""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chord_to_meters(chord: np.ndarray) -> np.ndarray:
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.clip(chord / 2.0, 0.0, 1.0))
+
+
+def meters_to_chord(meters: float) -> float:
+    return float(2.0 * np.sin(min(meters / (2.0 * EARTH_RADIUS_M), np.pi / 2)))
+
+
+class PointIndex:
+    """Nearest indexed point for whole batches of coordinates."""
+
+    def __init__(self, lats: Sequence[float] | np.ndarray, lons: Sequence[float] | np.ndarray) -> None:
+        self.points = unit_vectors(lats, lons)
+        self._tree = None
+        if len(self.points):
+            try:
+                from scipy.spatial import cKDTree
+            except ImportError:
+                pass
+            else:
+                self._tree = cKDTree(self.points)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def nearest(
+        self,
+        lats: Sequence[float] | np.ndarray,
+        lons: Sequence[float] | np.ndarray,
+        max_meters: float | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        ``(index, meters)`` of the nearest point per query. Queries with nothing within
+        ``max_meters`` (or an empty index) get index -1 and distance inf.
+        """
+        queries = unit_vectors(lats, lons)
+        n = len(queries)
+        idx = np.full(n, -1, dtype=np.int64)
+        dist = np.full(n, np.inf)
+        if not n or not len(self.points):
+            return idx, dist
+        if self._tree is not None:
+            bound = meters_to_chord(max_meters) if max_meters is not None else np.inf
+            chord, found = self._tree.query(queries, k=1, distance_upper_bound=bound)
+            hit = np.isfinite(chord)
+            idx[hit] = found[hit]
+            dist[hit] = chord_to_meters(chord[hit])
+            return idx, dist
+        step = max(1, _BLOCK // len(self.points))
+        for start in range(0, n, step):
+            block = queries[start : start + step]
+            # |a - b|² = 2 - 2 a·b for unit vectors, so the largest dot product is nearest.
+            dots = block @ self.points.T
+            best = np.argmax(dots, axis=1)
+            chord = np.sqrt(np.clip(2.0 - 2.0 * dots[np.arange(len(block)), best], 0.0, None))
+            idx[start : start + step] = best
+            dist[start : start + step] = chord_to_meters(chord)
+        if max_meters is not None:
+            far = dist > max_meters
+            idx[far] = -1
+            dist[far] = np.inf
+        return idx, dist
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the S3 ops scripts against a seeded local S3 stand-in.
+
+Seeds an in-memory bucket (scripts/amr_ops/s3_standin.py) with a synthetic copy of the
+real layout — ``<root>/{f,s}_<status>/<session>/metadata.json`` plus images for every
+work type (numeric and iOS-code roots), legacy 1000 folders, and
+``1000/unit_test_images/`` in both session and flat layouts — then runs each script /
+mode as a subprocess pointed at the stand-in via AWS_ENDPOINT_URL_S3.
+
+Per scenario it reports wall time, sessions/sec, S3 requests per session, peak RSS of
+the script process, throttled requests, and p50/p99 request latency (overall and per
+operation) as seen by the stand-in, which includes the injected latency.
+
+Relabel sessions are seeded with labels already in ``area · city`` form, so the
+relabel scenarios measure listing and metadata reads without calling Nominatim.
+Mutating scenarios (``*-execute``) reseed the bucket before the next scenario runs.
+
+Usage:
+  python3 scripts/benchmark_s3_ops.py
+  python3 scripts/benchmark_s3_ops.py --sessions 1000 --sessions 20000 --latency-ms 20 --jitter-ms 10
+  python3 scripts/benchmark_s3_ops.py --sessions 200000 --scenario reclassify-flat --scenario reclassify-asyncio
+  python3 scripts/benchmark_s3_ops.py --throttle-rate 0.02 --scenario reclassify-execute --json bench.jsonl
+  python3 scripts/benchmark_s3_ops.py --scenario unit-test --duplicate-fraction 0.3
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from importlib.util import find_spec
+from pathlib import Path
+from typing import NamedTuple
+
+from amr_ops.s3_standin import S3StandIn, S3Store
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+BUCKET = "meter-reader-training-feedback"
+
+WORK_TYPE_WEIGHTS = {"1000": 0.70, "2000": 0.075, "3000": 0.075, "4000": 0.075, "5000": 0.075}
+IOS_CODES = {"1000": "METR", "2000": "GO95", "3000": "RISR", "4000": "LEAK", "5000": "INTR"}
+STATUS_SUFFIX_WEIGHTS = {
+    "correct": 0.40,
+    "incorrect": 0.25,
+    "skipped_review": 0.15,
+    "incorrect_analyzed": 0.05,
+    "incorrect_labeled": 0.05,
+    "no_dials": 0.05,
+    "not_sure": 0.05,
+}
+LEGACY_1000_FOLDERS = ["correct", "incorrect", "f_correct", "f_incorrect"]
+RELABEL_PREFIXES = (
+    "1000/s_correct/",
+    "1000/s_skipped_review/",
+    "1000/f_correct/",
+    "1000/f_skipped_review/",
+    "1000/s_incorrect/",
+    "1000/f_incorrect/",
+)
+CAPTURE_DAYS = ["2026-04-14", "2026-05-02", "2026-05-29", "2026-05-30", "2026-05-31", "2026-06-08"]
+COLLECTORS = ["alex.m", "jordan.p", "sam.k", "reetika.s", "nirmala", "chris.d"]
+PLACES = [("Temescal", "Oakland"), ("Mission", "San Francisco"), ("Downtown", "Fresno"), ("Midtown", "Sacramento")]
+
+
+class Scenario(NamedTuple):
+    script: str
+    argv: tuple[str, ...]
+    population: str
+    mutates: bool = False
+    needs_aio: bool = False
+
+
+SCENARIOS = {
+    "reclassify-dry": Scenario("reclassify_field_sessions_bulk.py", ("--dry-run",), "field"),
+    "reclassify-pipeline": Scenario("reclassify_field_sessions_bulk.py", ("--dry-run", "--pipeline"), "field"),
+    "reclassify-flat": Scenario(
+        "reclassify_field_sessions_bulk.py", ("--dry-run", "--pipeline", "--flat-listing"), "field"
+    ),
+    "reclassify-asyncio": Scenario(
+        "reclassify_field_sessions_bulk.py",
+        ("--dry-run", "--engine", "asyncio", "--flat-listing", "--workers", "128"),
+        "field",
+        needs_aio=True,
+    ),
+    "reclassify-execute": Scenario(
+        "reclassify_field_sessions_bulk.py", ("--execute", "--pipeline"), "field", mutates=True
+    ),
+    "reclassify-execute-asyncio": Scenario(
+        "reclassify_field_sessions_bulk.py",
+        ("--execute", "--engine", "asyncio", "--flat-listing", "--workers", "128"),
+        "field",
+        mutates=True,
+        needs_aio=True,
+    ),
+    "relabel-dry": Scenario("relabel_capture_locations.py", ("--dry-run", "--no-geocode-cache"), "relabel"),
+    "relabel-asyncio": Scenario(
+        "relabel_capture_locations.py", ("--dry-run", "--no-geocode-cache", "--engine", "asyncio"), "relabel", needs_aio=True
+    ),
+    "unit-test": Scenario("unit_test_s3_to_csv.py", (), "unit_test"),
+    "unit-test-asyncio": Scenario(
+        "unit_test_s3_to_csv.py", ("--engine", "asyncio"), "unit_test", needs_aio=True
+    ),
+}
+
+
+def _pick(rng: random.Random, weights: dict[str, float]) -> str:
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def _session_metadata(rng: random.Random, session_id: str, work_type: str, source: str) -> dict:
+    area, city = rng.choice(PLACES)
+    reading = f"{rng.randrange(100000):05d}"
+    return {
+        "session_id": session_id,
+        "timestamp": f"{rng.choice(CAPTURE_DAYS)}T{rng.randrange(24):02d}:{rng.randrange(60):02d}:00.000Z",
+        "user_name": rng.choice(COLLECTORS),
+        "upload_mode": source,
+        "work_type": work_type,
+        "ml_prediction": reading,
+        "user_correction": reading if rng.random() < 0.7 else "",
+        "capture_location": {
+            "latitude": round(37.0 + rng.random(), 6),
+            "longitude": round(-122.5 + rng.random(), 6),
+            "place_label": f"{area} · {city}",
+        },
+    }
+
+
+def seed_bucket(
+    store: S3Store,
+    bucket: str,
+    sessions: int,
+    *,
+    seed: int = 7,
+    object_kb: int = 4,
+    unit_test_fraction: float = 0.02,
+    duplicate_fraction: float = 0.0,
+) -> dict[str, int]:
+    """
+    Fill ``bucket`` with ``sessions`` synthetic sessions; returns population counts.
+
+    Every image shares one body (to keep the stand-in small) but gets its own ETag, so
+    ETag-keyed dedup only collapses the ``duplicate_fraction`` of images that are given
+    a common one.
+    """
+    rng = random.Random(seed)
+    # Separate stream so the layout for a seed does not depend on duplicate_fraction.
+    etag_rng = random.Random(f"{seed}-etag")
+    image = os.urandom(object_kb * 1024)
+    shared_etag = f'"{uuid.UUID(int=etag_rng.getrandbits(128)).hex}"'
+
+    def _image_etag() -> str:
+        if etag_rng.random() < duplicate_fraction:
+            return shared_etag
+        return f'"{uuid.UUID(int=etag_rng.getrandbits(128)).hex}"'
+
+    store.buckets.pop(bucket, None)
+    store.create_bucket(bucket)
+    counts = {"sessions": sessions, "field": 0, "relabel": 0, "unit_test": 0}
+
+    def _put_session(prefix: str, meta: dict | None, images: int) -> None:
+        if meta is not None:
+            store.put(
+                bucket,
+                f"{prefix}metadata.json",
+                json.dumps(meta, indent=2).encode("utf-8"),
+                content_type="application/json; charset=utf-8",
+            )
+        for i in range(images):
+            name = "image.jpg" if i == 0 else f"image_{i + 1}.jpg"
+            store.put(bucket, f"{prefix}{name}", image, content_type="image/jpeg", etag=_image_etag())
+
+    for _ in range(sessions):
+        session_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        work_type = _pick(rng, WORK_TYPE_WEIGHTS)
+        source = "field" if rng.random() < 0.6 else "simulator"
+        if work_type == "1000" and source == "field" and rng.random() < 0.1:
+            folder = f"{rng.choice(LEGACY_1000_FOLDERS)}/"
+        else:
+            root = IOS_CODES[work_type] if rng.random() < 0.1 else work_type
+            folder = f"{root}/{source[0]}_{_pick(rng, STATUS_SUFFIX_WEIGHTS)}/"
+        prefix = f"{folder}{session_id}/"
+        meta = _session_metadata(rng, session_id, work_type, source) if rng.random() > 0.02 else None
+        _put_session(prefix, meta, rng.randint(1, 3))
+        if source == "field":
+            counts["field"] += 1
+        if prefix.startswith(RELABEL_PREFIXES):
+            counts["relabel"] += 1
+
+    unit_tests = max(10, int(sessions * unit_test_fraction))
+    for i in range(unit_tests):
+        reading = rng.randrange(10000)
+        if i % 2:
+            store.put(
+                bucket,
+                f"1000/unit_test_images/{i}_{reading}.jpeg",
+                image,
+                content_type="image/jpeg",
+                etag=_image_etag(),
+            )
+        else:
+            session_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            meta = _session_metadata(rng, session_id, "1000", "simulator")
+            _put_session(f"1000/unit_test_images/{session_id}/", meta, 1)
+    counts["unit_test"] = unit_tests
+    return counts
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def run_scenario(
+    standin: S3StandIn, name: str, scenario: Scenario, population: int, env: dict[str, str], workdir: Path
+) -> dict:
+    argv = list(scenario.argv)
+    if scenario.population == "unit_test":
+        argv += ["--bucket", BUCKET, "--out-dir", str(workdir / f"{name}-images"), "--csv", str(workdir / f"{name}.csv")]
+    log_path = workdir / f"{name}.log"
+    standin.server.reset_stats()
+    start = time.perf_counter()
+    with open(log_path, "wb") as log_fh:
+        proc = subprocess.Popen(
+            [sys.executable, str(SCRIPTS_DIR / scenario.script), *argv],
+            env=env,
+            cwd=workdir,
+            stdout=log_fh,
+            stderr=subprocess.STDOUT,
+        )
+        _pid, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    peak_rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+    server = standin.server
+    with server._stats_lock:
+        latencies = {op: sorted(values) for op, values in server.latencies.items()}
+        errors = dict(server.errors)
+    every = sorted(v for values in latencies.values() for v in values)
+    requests = len(every)
+    if proc.returncode != 0:
+        tail = log_path.read_text(errors="replace").splitlines()[-15:]
+        print(f"⚠️ {name} exited {proc.returncode}:\n  " + "\n  ".join(tail), file=sys.stderr)
+    return {
+        "scenario": name,
+        "script": scenario.script,
+        "args": argv,
+        "sessions": population,
+        "exit_code": proc.returncode,
+        "wall_s": round(wall, 3),
+        "sessions_per_s": round(population / wall, 1) if wall else 0.0,
+        "requests": requests,
+        "requests_per_session": round(requests / population, 2) if population else 0.0,
+        "throttled": errors.get("SlowDown", 0),
+        "peak_rss_mb": round(peak_rss_mb, 1),
+        "p50_ms": round(percentile(every, 50) * 1000, 2),
+        "p99_ms": round(percentile(every, 99) * 1000, 2),
+        "ops": {
+            op: {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+            }
+            for op, values in sorted(latencies.items())
+        },
+    }
+
+
+def print_report(results: list[dict]) -> None:
+    header = f"{'scenario':<28}{'sessions':>9}{'wall s':>9}{'sess/s':>10}{'req/sess':>10}{'thr':>6}{'RSS MB':>8}{'p50 ms':>8}{'p99 ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        flag = "" if r["exit_code"] == 0 else f"  (exit {r['exit_code']})"
+        print(
+            f"{r['scenario']:<28}{r['sessions']:>9}{r['wall_s']:>9.2f}{r['sessions_per_s']:>10.1f}"
+            f"{r['requests_per_session']:>10.2f}{r['throttled']:>6}{r['peak_rss_mb']:>8.1f}"
+            f"{r['p50_ms']:>8.2f}{r['p99_ms']:>8.2f}{flag}"
+        )
+        ops = "  ".join(
+            f"{op} {s['count']} ({s['p50_ms']:.1f}/{s['p99_ms']:.1f})" for op, s in r["ops"].items()
+        )
+        print(f"{'':<4}{ops}")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark the S3 ops scripts against a local S3 stand-in")
+    ap.add_argument("--sessions", type=int, action="append", help="Synthetic bucket size (repeatable; default 1000)")
+    ap.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="Scenario to run (repeatable; default: all that can run here)",
+    )
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="Latency injected into every request")
+    ap.add_argument("--jitter-ms", type=float, default=0.0, help="Extra uniform random latency per request")
+    ap.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered 503 SlowDown")
+    ap.add_argument("--object-kb", type=int, default=4, help="Size of each synthetic image object")
+    ap.add_argument(
+        "--duplicate-fraction",
+        type=float,
+        default=0.0,
+        help="Fraction of images seeded with one shared ETag, i.e. what download dedup can skip (default 0)",
+    )
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--json", type=Path, help="Append one JSON result per scenario run to this file")
+    ap.add_argument("--keep-logs", type=Path, help="Keep script output and downloads in this directory")
+    args = ap.parse_args()
+
+    has_aio = find_spec("aiobotocore") is not None
+    names = args.scenario or [n for n, s in SCENARIOS.items() if has_aio or not s.needs_aio]
+    for name in names:
+        if SCENARIOS[name].needs_aio and not has_aio:
+            ap.error(f"{name} needs aiobotocore: pip install -r scripts/requirements-s3-async.txt")
+
+    workdir = args.keep_logs or Path(tempfile.mkdtemp(prefix="amr-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    results: list[dict] = []
+    with S3StandIn(
+        latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000, throttle_rate=args.throttle_rate, seed=args.seed
+    ) as standin:
+        env = {k: v for k, v in os.environ.items() if not k.startswith("AWS_")}
+        env.update(
+            AWS_ENDPOINT_URL_S3=standin.url,
+            AWS_ACCESS_KEY_ID="bench",
+            AWS_SECRET_ACCESS_KEY="bench",
+            AWS_REGION="us-east-1",
+            AWS_EC2_METADATA_DISABLED="true",
+            AWS_S3_BUCKET=BUCKET,
+            AWS_S3_BASE_PREFIX="",
+            # Keep the scripts from picking these up from src/.env.
+            AWS_DYNAMODB_SESSIONS_TABLE="",
+            AMR_METADATA_CACHE="",
+        )
+        seed_kwargs = dict(seed=args.seed, object_kb=args.object_kb, duplicate_fraction=args.duplicate_fraction)
+        for size in args.sessions or [1000]:
+            t0 = time.perf_counter()
+            counts = seed_bucket(standin.store, BUCKET, size, **seed_kwargs)
+            print(
+                f"\n🌱 seeded {size} sessions ({counts['field']} field, {counts['relabel']} relabel, "
+                f"{counts['unit_test']} unit-test images) in {time.perf_counter() - t0:.1f}s; "
+                f"latency {args.latency_ms}±{args.jitter_ms} ms, throttle {args.throttle_rate:.1%}\n"
+            )
+            run_dir = workdir / str(size)
+            run_dir.mkdir(exist_ok=True)
+            batch: list[dict] = []
+            for name in names:
+                scenario = SCENARIOS[name]
+                result = run_scenario(standin, name, scenario, counts[scenario.population], env, run_dir)
+                result.update(
+                    bucket_sessions=size,
+                    latency_ms=args.latency_ms,
+                    jitter_ms=args.jitter_ms,
+                    throttle_rate=args.throttle_rate,
+                )
+                batch.append(result)
+                if args.json:
+                    with open(args.json, "a", encoding="utf-8") as fh:
+                        fh.write(json.dumps(result) + "\n")
+                if scenario.mutates:
+                    seed_bucket(standin.store, BUCKET, size, **seed_kwargs)
+            print_report(batch)
+            results.extend(batch)
+    print(f"\nScript logs: {workdir}")
+    return 0 if all(r["exit_code"] == 0 for r in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Score a model run against the unit-test manifest CSV in one vectorized pass.
+
+Inputs:
+
+* ``--manifest``: the CSV written by ``unit_test_s3_to_csv.py`` (``s3_key``,
+  ``image_file_name``, ``expected_meter_value``, ``difficulty``);
+* ``--predictions``: CSV or JSON Lines from the model run. Rows are joined to the
+  manifest on ``s3_key``, then on file name (``image_file_name`` / ``filename``). The
+  reading comes from ``predicted_reading`` (or ``predicted_meter_value`` /
+  ``prediction``). iOS per-image exports work as they are: per-dial
+  ``dial{d}_predicted_digit`` (and the other digit columns the portal reads),
+  ``dial{d}_digit_match``, ``overall_reading_match`` and confidences are used when
+  present. Otherwise the dial digits are the reading's digits, left to right.
+
+Both files are loaded into NumPy arrays. Readings become an ``(images × dials)`` digit
+matrix, and every metric is a mask, ``bincount`` or sorted join over those arrays.
+The metrics are exact-reading accuracy, per-dial accuracy, accuracy per difficulty
+tier (d1/d2/d3) and per S3 prefix, and expected × predicted digit confusion matrices.
+Hundreds of thousands of rows take a few seconds, mostly CSV parsing.
+
+Matching follows ``server/unitTestMetricsApply.js``. A dial is correct when the digits
+are equal, or when dial 4 reads below the expected digit (it may lag). An
+explicit ``*_match`` column in the predictions wins. Percentages are rounded to 3
+decimals like the portal.
+
+The JSON has the shape of ``GET /api/unit-test/run-detail``. ``summary`` carries the
+iOS summary keys (``images_processed``, ``accuracy_percent``,
+``dial{d}_with_ground_truth``/``_correct``/``_accuracy_percent``/``_average_confidence``,
+…) plus the parsed ``imagesProcessed``/``withGroundTruth``/``correct``/
+``accuracyPercent``. Next come ``imageDifficultyBreakdown`` and ``dialStats``, then
+``prefixBreakdown`` and ``digitConfusion``.
+
+Usage:
+  pip install -r scripts/requirements-evaluate.txt
+  python scripts/evaluate_unit_test_predictions.py \\
+    --manifest ./unit_test_manifest.csv \\
+    --predictions ./run_predictions.csv \\
+    --out ./run_metrics.json
+
+  # Group prefixes three levels deep (e.g. per session folder) and read JSON Lines:
+  python scripts/evaluate_unit_test_predictions.py --manifest m.csv --predictions p.jsonl --prefix-depth 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+try:
+    import numpy as np
+except ImportError:
+    print("Install numpy: pip install -r scripts/requirements-evaluate.txt", file=sys.stderr)
+    sys.exit(1)
+
+# server/portalMetricFormat.js PORTAL_ACCURACY_CONFIDENCE_PCT_DECIMALS
+PCT_DECIMALS = 3
+
+# server/unitTestCsv.js IMAGE_DIFFICULTY_TIERS
+DIFFICULTY_TIERS = (("d1", "Normal"), ("d2", "Difficult"), ("d3", "Very difficult"))
+
+READING_COLUMNS = ("predicted_reading", "predicted_meter_value", "prediction")
+# server/unitTestMetricsApply.js resolvePredictedDigit, in order.
+DIGIT_COLUMNS = (
+    "dial{d}_predicted_digit",
+    "dial{d}_finalDigit",
+    "dial{d}_final_digit",
+    "dial{d}_stage3_final_digit",
+    "dial{d}_floorDigit",
+    "dial{d}_nearestDigit",
+)
+DIAL_CONFIDENCE_COLUMNS = ("dial{d}_composite_confidence", "dial{d}_stage2_kp_model_confidence")
+
+_NON_DIGITS = re.compile(r"[^0-9]+")
+_LEADING_INT = re.compile(r"[+-]?[0-9]+")
+
+
+def load_columns(path: str) -> dict[str, np.ndarray]:
+    """Column name → array of stripped strings, from CSV or JSON Lines (``.jsonl``/``.ndjson``)."""
+    if path.endswith((".jsonl", ".ndjson")):
+        records = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    records.append(json.loads(line))
+        names = list(dict.fromkeys(k for r in records for k in r))
+        table = [["" if r.get(k) is None else str(r[k]) for k in names] for r in records]
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            names = [h.strip() for h in next(reader, [])]
+            table = [row for row in reader if row]
+    width = len(names)
+    padded = (row if len(row) == width else (row + [""] * width)[:width] for row in table)
+    transposed = list(zip(*padded)) or [()] * width
+    return {name: np.char.strip(np.array(values, dtype=str)) for name, values in zip(names, transposed)}
+
+
+def column(cols: dict[str, np.ndarray], names, n: int) -> np.ndarray:
+    """First of ``names`` present in ``cols``; empty strings when none is."""
+    for name in names:
+        if name in cols:
+            return cols[name]
+    return np.full(n, "", dtype=str)
+
+
+def reading_digits(values: np.ndarray) -> np.ndarray:
+    """``readingDigits``: keep ASCII digits only."""
+    return np.array([_NON_DIGITS.sub("", v) for v in values.tolist()], dtype=str)
+
+
+def digit_matrix(readings: np.ndarray, dials: int) -> np.ndarray:
+    """``(n, dials)`` int8 digits, left-padded with zeros to ``dials``; -1 where the reading is empty."""
+    n = len(readings)
+    if not n:
+        return np.empty((0, dials), dtype=np.int8)
+    width = max(dials, int(np.char.str_len(readings).max()))
+    raw = np.char.zfill(readings, width).astype(f"S{width}")
+    digits = raw.view(np.uint8).reshape(n, width)[:, width - dials :].astype(np.int8) - ord("0")
+    digits[np.char.str_len(readings) == 0] = -1
+    return digits
+
+
+def parse_digit(value: str) -> int:
+    """``parseDigit``: ``parseInt`` of the cell (leading sign and digits, e.g. ``"07"`` → 7) if 0–9, else -1."""
+    m = _LEADING_INT.match(value.strip())
+    if m is None:
+        return -1
+    digit = int(m.group(0))
+    return digit if 0 <= digit <= 9 else -1
+
+
+def digit_column(values: np.ndarray) -> np.ndarray:
+    """``parseDigit`` for a column: 0–9, or -1. Parses each distinct cell once."""
+    if not len(values):
+        return np.full(0, -1, dtype=np.int8)
+    distinct, inverse = np.unique(values, return_inverse=True)
+    parsed = np.array([parse_digit(v) for v in distinct.tolist()], dtype=np.int8)
+    return parsed[inverse.reshape(-1)]
+
+
+def flag_column(values: np.ndarray) -> np.ndarray:
+    """``parseDigitMatch``: 1 for true/1/yes, 0 for false/0/no, -1 otherwise."""
+    lowered = np.char.lower(values)
+    out = np.full(len(values), -1, dtype=np.int8)
+    out[np.isin(lowered, ("true", "1", "yes"))] = 1
+    out[np.isin(lowered, ("false", "0", "no"))] = 0
+    return out
+
+
+def confidence_column(values: np.ndarray) -> np.ndarray:
+    """``confidencePctFromRaw``: 0–1 scaled to %, NaN where missing or unparsable."""
+    present = values != ""
+    if not present.any():
+        return np.full(len(values), np.nan)
+    try:
+        out = np.where(present, values, "nan").astype(np.float64)
+    except ValueError:
+        # Some cell is not a number: parse one by one and leave those NaN.
+        out = np.full(len(values), np.nan)
+        for i in np.flatnonzero(present):
+            try:
+                out[i] = float(values[i])
+            except ValueError:
+                pass
+    return np.where((out >= 0) & (out <= 1), out * 100, out)
+
+
+def pct(correct, total) -> float | None:
+    return round(100.0 * correct / total, PCT_DECIMALS) if total else None
+
+
+def mean_pct(values: np.ndarray) -> float | None:
+    values = values[np.isfinite(values)]
+    return round(float(values.mean()), PCT_DECIMALS) if len(values) else None
+
+
+def join(manifest_keys: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """Index into ``manifest_keys`` per entry of ``keys`` (sorted search); -1 where absent or ambiguous."""
+    out = np.full(len(keys), -1, dtype=np.int64)
+    if not len(manifest_keys) or not len(keys):
+        return out
+    order = np.argsort(manifest_keys, kind="stable")
+    ordered = manifest_keys[order]
+    unique = np.ones(len(ordered), dtype=bool)
+    unique[1:] &= ordered[1:] != ordered[:-1]
+    unique[:-1] &= ordered[:-1] != ordered[1:]
+    pos = np.clip(np.searchsorted(ordered, keys), 0, len(ordered) - 1)
+    hit = (ordered[pos] == keys) & unique[pos] & (np.char.str_len(keys) > 0)
+    out[hit] = order[pos[hit]]
+    return out
+
+
+def prefix_of(keys: np.ndarray, depth: int) -> np.ndarray:
+    """Parent path of each S3 key, cut to ``depth`` components."""
+    out = []
+    for key in keys.tolist():
+        parts = key.split("/", depth)
+        out.append("/".join(parts[: min(depth, len(parts) - 1)]))
+    return np.array(out, dtype=str)
+
+
+def evaluate(manifest: dict[str, np.ndarray], predictions: dict[str, np.ndarray], *, dials: int, prefix_depth: int):
+    m_keys = column(manifest, ("s3_key",), 0)
+    m_names = column(manifest, ("image_file_name",), len(m_keys))
+    p_n = len(next(iter(predictions.values()), ()))
+
+    # Join: S3 key first, then file name for rows whose key is stale or missing.
+    idx = join(m_keys, column(predictions, ("s3_key",), p_n))
+    by_name = join(m_names, column(predictions, ("image_file_name", "filename", "file_name"), p_n))
+    idx = np.where(idx >= 0, idx, by_name)
+    matched = idx >= 0
+    rows = idx[matched]
+    n = len(rows)
+
+    expected = reading_digits(column(manifest, ("expected_meter_value",), len(m_keys))[rows])
+    predicted = reading_digits(column(predictions, READING_COLUMNS, p_n)[matched])
+    has_truth = np.char.str_len(expected) > 0
+
+    # Exact reading: explicit overall_reading_match, else zero-padded reading equality.
+    # np.char.zfill fails on empty arrays, so a run with no joined rows skips it.
+    same = np.zeros(n, dtype=bool)
+    if n:
+        pad = max(dials, int(np.char.str_len(expected).max()), int(np.char.str_len(predicted).max()))
+        same = (np.char.zfill(expected, pad) == np.char.zfill(predicted, pad)) & (np.char.str_len(predicted) > 0)
+    overall_flag = flag_column(column(predictions, ("overall_reading_match",), p_n)[matched])
+    correct = has_truth & np.where(overall_flag >= 0, overall_flag == 1, same)
+
+    # Per dial: (n, dials) matrices; a column of per-dial predictions beats the reading's digits.
+    exp_digits = digit_matrix(expected, dials)
+    pred_digits = digit_matrix(predicted, dials)
+    dial_match = np.full((n, dials), -1, dtype=np.int8)
+    dial_conf = np.full((n, dials), np.nan)
+    for d in range(1, dials + 1):
+        for template in DIGIT_COLUMNS:
+            name = template.format(d=d)
+            if name in predictions:
+                col = digit_column(predictions[name][matched])
+                pred_digits[:, d - 1] = np.where(col >= 0, col, pred_digits[:, d - 1])
+        if f"dial{d}_expected_digit" in predictions:
+            col = digit_column(predictions[f"dial{d}_expected_digit"][matched])
+            exp_digits[:, d - 1] = np.where(exp_digits[:, d - 1] >= 0, exp_digits[:, d - 1], col)
+        if f"dial{d}_digit_match" in predictions:
+            dial_match[:, d - 1] = flag_column(predictions[f"dial{d}_digit_match"][matched])
+        conf = column(predictions, [t.format(d=d) for t in DIAL_CONFIDENCE_COLUMNS], p_n)[matched]
+        dial_conf[:, d - 1] = confidence_column(conf)
+    dial_truth = exp_digits >= 0
+    equal = (pred_digits >= 0) & (pred_digits == exp_digits)
+    if dials >= 4:
+        # dialDigitMatches: dial 4 may lag its expected digit.
+        equal[:, 3] |= (pred_digits[:, 3] >= 0) & (pred_digits[:, 3] < exp_digits[:, 3])
+    dial_correct = dial_truth & np.where(dial_match >= 0, dial_match == 1, equal)
+
+    confidence = confidence_column(column(predictions, ("average_confidence",), p_n)[matched])
+
+    # Difficulty tiers and prefixes as integer groups, counted with bincount.
+    codes = column(manifest, ("difficulty",), len(m_keys))[rows]
+    if "image_difficulty_code" in predictions:
+        codes = np.where(codes == "", np.char.lower(predictions["image_difficulty_code"][matched]), codes)
+    tier = np.full(n, 0, dtype=np.int64)  # difficultyToCode: unknown → d1
+    for i, (code, _label) in enumerate(DIFFICULTY_TIERS):
+        tier[codes == code] = i
+    prefixes, prefix_group = np.unique(prefix_of(m_keys[rows], prefix_depth), return_inverse=True)
+
+    def grouped(group: np.ndarray, size: int):
+        return (
+            np.bincount(group, minlength=size),
+            np.bincount(group, weights=has_truth, minlength=size).astype(np.int64),
+            np.bincount(group, weights=correct, minlength=size).astype(np.int64),
+        )
+
+    tier_images, tier_truth, tier_correct = grouped(tier, len(DIFFICULTY_TIERS))
+    prefix_images, prefix_truth, prefix_correct = grouped(prefix_group.reshape(-1), len(prefixes))
+    tier_conf = [mean_pct(confidence[tier == i]) for i in range(len(DIFFICULTY_TIERS))]
+
+    # Digit confusion: expected × predicted over every dial with both digits.
+    both = dial_truth & (pred_digits >= 0)
+    cells = exp_digits.astype(np.int64) * 10 + pred_digits
+    per_dial_confusion = [
+        np.bincount(cells[both[:, d], d], minlength=100).reshape(10, 10) for d in range(dials)
+    ]
+
+    with_truth = int(has_truth.sum())
+    n_correct = int(correct.sum())
+    summary: dict[str, object] = {
+        "images_processed": str(n),
+        "with_filename_ground_truth": str(with_truth),
+        "correct_readings": str(n_correct),
+        "accuracy_percent": "" if pct(n_correct, with_truth) is None else str(pct(n_correct, with_truth)),
+        "average_confidence": "" if mean_pct(confidence) is None else str(mean_pct(confidence)),
+    }
+    dial_stats = []
+    for d in range(dials):
+        truth_d = int(dial_truth[:, d].sum())
+        correct_d = int(dial_correct[:, d].sum())
+        conf_d = mean_pct(dial_conf[:, d])
+        summary[f"dial{d + 1}_with_ground_truth"] = str(truth_d)
+        summary[f"dial{d + 1}_correct"] = str(correct_d)
+        acc_d = pct(correct_d, truth_d)
+        summary[f"dial{d + 1}_accuracy_percent"] = "" if acc_d is None else str(acc_d)
+        summary[f"dial{d + 1}_average_confidence"] = "" if conf_d is None else str(conf_d)
+        dial_stats.append(
+            {
+                "dial": d + 1,
+                "withGroundTruth": truth_d,
+                "correct": correct_d,
+                "accuracyPct": acc_d,
+                "confidencePct": conf_d,
+            }
+        )
+    summary.update(
+        imagesProcessed=n,
+        withGroundTruth=with_truth,
+        correct=n_correct,
+        accuracyPercent=pct(n_correct, with_truth),
+    )
+
+    return {
+        "generatedUtc": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "summary": summary,
+        "imageDifficultyBreakdown": [
+            {
+                "code": code,
+                "label": label,
+                "imageCount": int(tier_images[i]),
+                "withGroundTruth": int(tier_truth[i]),
+                "correct": int(tier_correct[i]),
+                "accuracyPct": pct(int(tier_correct[i]), int(tier_truth[i])),
+                "confidencePct": tier_conf[i],
+            }
+            for i, (code, label) in enumerate(DIFFICULTY_TIERS)
+        ],
+        "dialStats": dial_stats,
+        "prefixBreakdown": [
+            {
+                "prefix": str(prefix),
+                "imageCount": int(prefix_images[i]),
+                "withGroundTruth": int(prefix_truth[i]),
+                "correct": int(prefix_correct[i]),
+                "accuracyPct": pct(int(prefix_correct[i]), int(prefix_truth[i])),
+            }
+            for i, prefix in enumerate(prefixes)
+        ],
+        "digitConfusion": {
+            "labels": list(range(10)),
+            "all": sum(per_dial_confusion, np.zeros((10, 10), dtype=np.int64)).tolist(),
+            "perDial": {str(d + 1): matrix.tolist() for d, matrix in enumerate(per_dial_confusion)},
+        },
+        "perImageCount": n,
+        "unmatchedPredictions": int(p_n - n),
+        "manifestRowsWithoutPrediction": int(len(m_keys) - len(np.unique(rows))),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--manifest", default="./unit_test_manifest.csv", help="CSV from unit_test_s3_to_csv.py")
+    ap.add_argument("--predictions", required=True, help="Model run predictions (CSV or JSON Lines)")
+    ap.add_argument("--out", default="-", help="JSON output path (- = stdout)")
+    ap.add_argument("--dials", type=int, default=4, help="Dials per meter (digits per reading)")
+    ap.add_argument("--prefix-depth", type=int, default=2, help="S3 key path components per prefix group")
+    args = ap.parse_args()
+
+    started = time.perf_counter()
+    manifest = load_columns(args.manifest)
+    predictions = load_columns(args.predictions)
+    if "s3_key" not in manifest:
+        print(f"{args.manifest}: no s3_key column (expected unit_test_s3_to_csv.py output)", file=sys.stderr)
+        sys.exit(2)
+    loaded = time.perf_counter()
+    result = evaluate(manifest, predictions, dials=max(1, args.dials), prefix_depth=max(0, args.prefix_depth))
+    finished = time.perf_counter()
+
+    text = json.dumps(result, indent=2)
+    if args.out == "-":
+        print(text)
+    else:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    s = result["summary"]
+    print(
+        f"{s['imagesProcessed']} images scored, accuracy {s['accuracyPercent']}% "
+        f"({s['correct']}/{s['withGroundTruth']}); {result['unmatchedPredictions']} predictions not in the manifest, "
+        f"{result['manifestRowsWithoutPrediction']} manifest rows without a prediction "
+        f"(load {loaded - started:.2f}s, evaluate {finished - loaded:.2f}s)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
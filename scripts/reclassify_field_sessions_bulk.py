@@ -5,28 +5,61 @@ Bulk reclassify mis-tagged field S3 sessions → simulator (awaiting review).
 Keep Field only when capture day is 2026-05-29 … 2026-05-31 (UTC date) and
 collector is not reetika* / nirmala.
 
-Uses concurrent S3 copy/delete (much faster than sequential Node script).
-After --execute, run: npm run backfill:dynamo-sessions
+Uses concurrent S3 copy/delete (much faster than sequential Node script). Moved sessions
+are re-pointed in the DynamoDB session index as they finish when
+AWS_DYNAMODB_SESSIONS_TABLE or --sessions-table is set.
+
+Options:
+  --workers N                 sessions inspected/moved at once
+  --copy-concurrency N        process-wide copy threads shared by all sessions
+  --copy-workers N            copies in flight for any one session
+  --multipart-threshold-mb N  copy objects this large as parallel UploadPartCopy parts
+  --pipeline                  move sessions while folders are still being listed
+  --flat-listing              list each folder once without a delimiter, grouped by session
+  --list-shards N             list each folder as N session-id key ranges at once
+  --inventory PATH            list folders from a local S3 Inventory instead of LIST calls
+  --journal PATH              JSONL journal of move phases and folder listings
+  --resume                    finish half-moved sessions and replay listings from --journal
+  --relist                    with --resume, list folders again to find new sessions
+  --engine asyncio            run sessions as coroutines on one event loop and pool
+  --adaptive                  per-operation AIMD concurrency (the worker flags are upper bounds)
+  --from-index                select field sessions from the session index instead of S3
+  --metadata-cache DIR        ETag-keyed on-disk metadata.json cache
+  --metrics PATH              periodic JSON metrics (--prometheus-textfile for node_exporter)
 
 Usage:
   python3 scripts/reclassify_field_sessions_bulk.py --dry-run
   python3 scripts/reclassify_field_sessions_bulk.py --execute
   python3 scripts/reclassify_field_sessions_bulk.py --execute --workers 32 --work-type 1000
+  python3 scripts/reclassify_field_sessions_bulk.py --execute --pipeline --flat-listing --list-shards 16
+  python3 scripts/reclassify_field_sessions_bulk.py --execute --journal reclassify.jsonl [--resume [--relist]]
+  python3 scripts/reclassify_field_sessions_bulk.py --execute --engine asyncio --workers 256 --flat-listing
+  python3 scripts/reclassify_field_sessions_bulk.py --execute --pipeline --from-index --sessions-table amr-sessions
 """
 from __future__ import annotations
 
 import argparse
+import asyncio
 import json
 import os
+import queue
 import re
 import sys
 import threading
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterator, NamedTuple, Union
 
 import boto3
 from botocore.config import Config
 
+from amr_ops.listing import list_pages
+
+if TYPE_CHECKING:
+    from amr_ops.meta_cache import MetadataCache
+    from amr_ops.session_index import SessionIndexReader, SessionIndexWriter
+
 REPO_ROOT = Path(__file__).resolve().parent.parent
 ENV_SRC = REPO_ROOT / "src" / ".env"
 
@@ -56,6 +89,103 @@ DAY_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})")
 _print_lock = threading.Lock()
 
 
+class SessionListing(NamedTuple):
+    """One session folder from a flat (delimiter-less) folder listing."""
+
+    prefix: str
+    keys: list[str]
+    has_metadata: bool
+    sizes: dict[str, int]
+    metadata_etag: str | None = None
+
+
+SessionJob = Union[str, SessionListing]
+
+MOVE_PHASES = ("planned", "copied", "metadata_written", "deleted")
+# Results that need no further work on a resumed run (failures and dry-run results are retried).
+SETTLED_RESULTS = {"keep_field", "moved", "skipped:already_at_target", "skipped:no_metadata"}
+
+
+class SessionJournal:
+    """
+    Append-only JSONL checkpoint log for --execute runs.
+
+    Each line is one event: a move phase for a session (``planned`` carries the target
+    prefix, source keys and rewritten metadata so later phases need no S3 reads), a
+    ``done`` result for sessions that were not moved, or a ``listed`` event with every
+    session of a folder whose listing completed (flat-listing sessions keep their key
+    sizes and metadata ETag, so a replay needs no per-session LIST). Replaying the file rebuilds the
+    latest state per session; a torn final line from a crash is ignored.
+    """
+
+    def __init__(self, path: Path, *, resume: bool) -> None:
+        self.path = path
+        self.sessions: dict[str, dict] = {}
+        self.listed: dict[str, list[str | dict]] = {}
+        self._lock = threading.Lock()
+        if resume and path.is_file():
+            self._replay()
+        self._fh = path.open("a", encoding="utf-8")
+
+    def _replay(self) -> None:
+        with self.path.open(encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self._apply(event)
+
+    def _apply(self, event: dict) -> None:
+        phase = event.get("phase")
+        if phase == "listed":
+            self.listed[event["folder"]] = event.get("sessions") or []
+            return
+        prefix = event.get("prefix")
+        if not prefix:
+            return
+        if phase == "planned":
+            self.sessions[prefix] = dict(event)
+        elif phase in ("deleted", "done"):
+            # Settled sessions only need their outcome; drop keys and metadata.
+            self.sessions[prefix] = {"prefix": prefix, "phase": phase, "result": event.get("result")}
+        elif prefix in self.sessions:
+            self.sessions[prefix]["phase"] = phase
+
+    def _write(self, event: dict) -> None:
+        line = json.dumps(event, separators=(",", ":"))
+        with self._lock:
+            self._fh.write(line + "\n")
+            self._fh.flush()
+            self._apply(event)
+
+    def record(self, prefix: str, phase: str, **fields) -> None:
+        self._write({"prefix": prefix, "phase": phase, **fields})
+
+    async def record_async(self, prefix: str, phase: str, **fields) -> None:
+        """:meth:`record` for coroutines: the file write runs off the event loop."""
+        await asyncio.to_thread(self.record, prefix, phase, **fields)
+
+    def record_listed(self, folder: str, sessions: list[str | dict]) -> None:
+        self._write({"phase": "listed", "folder": folder, "sessions": sessions})
+
+    def is_settled(self, prefix: str) -> bool:
+        entry = self.sessions.get(prefix)
+        return bool(entry and entry["phase"] in ("deleted", "done"))
+
+    def unfinished(self) -> list[dict]:
+        """Sessions stopped between ``planned`` and ``deleted``, in prefix order."""
+        with self._lock:
+            entries = [
+                dict(e) for e in self.sessions.values() if e["phase"] in MOVE_PHASES[:-1]
+            ]
+        return sorted(entries, key=lambda e: e["prefix"])
+
+    def close(self) -> None:
+        with self._lock:
+            self._fh.close()
+
+
 def load_dotenv(path: Path) -> None:
     if not path.is_file():
         return
@@ -147,44 +277,103 @@ def get_field_folder_jobs(work_type: str, s3_base: str) -> list[tuple[str, str]]
     return out
 
 
-def list_session_prefixes(s3, bucket: str, folder: str) -> list[str]:
+def iter_session_prefix_pages(s3, bucket: str, folder: str, shards: int = 1) -> Iterator[list[str]]:
+    """Yield session prefixes under ``folder`` one ListObjectsV2 page at a time, in key order."""
     prefix = folder if folder.endswith("/") else f"{folder}/"
+    for resp in list_pages(s3, bucket, prefix, shards=shards, delimiter="/"):
+        page = [cp["Prefix"] for cp in resp.get("CommonPrefixes") or [] if cp.get("Prefix")]
+        if page:
+            yield page
+
+
+def list_session_prefixes(s3, bucket: str, folder: str, shards: int = 1) -> list[str]:
     out: list[str] = []
-    token = None
-    while True:
-        kwargs = {"Bucket": bucket, "Prefix": prefix, "Delimiter": "/"}
-        if token:
-            kwargs["ContinuationToken"] = token
-        resp = s3.list_objects_v2(**kwargs)
-        for cp in resp.get("CommonPrefixes") or []:
-            if cp.get("Prefix"):
-                out.append(cp["Prefix"])
-        if not resp.get("IsTruncated"):
-            break
-        token = resp.get("NextContinuationToken")
+    for page in iter_session_prefix_pages(s3, bucket, folder, shards):
+        out.extend(page)
     return out
 
 
-def list_object_keys(s3, bucket: str, prefix: str) -> list[str]:
+def _session_listing(prefix: str, sizes: dict[str, int], metadata_etag: str | None) -> SessionListing:
+    return SessionListing(prefix, list(sizes), f"{prefix}metadata.json" in sizes, sizes, metadata_etag)
+
+
+def iter_flat_session_pages(s3, bucket: str, folder: str, shards: int = 1) -> Iterator[list[SessionListing]]:
+    """
+    List ``folder`` once without a delimiter and group the keys by session prefix.
+
+    ListObjectsV2 returns keys in lexicographic order, so each session's keys are
+    contiguous and a session is complete as soon as the next one starts (sharded
+    listings are merged back into key order, so this holds for ``shards`` > 1 too).
+    Objects directly under ``folder`` (no session segment) are ignored.
+    """
+    prefix = folder if folder.endswith("/") else f"{folder}/"
+    current: str | None = None
+    sizes: dict[str, int] = {}
+    metadata_etag: str | None = None
+    for resp in list_pages(s3, bucket, prefix, shards=shards):
+        page: list[SessionListing] = []
+        for obj in resp.get("Contents") or []:
+            key = obj.get("Key") or ""
+            session, sep, _rest = key[len(prefix) :].partition("/")
+            if not session or not sep:
+                continue
+            session_prefix = f"{prefix}{session}/"
+            if session_prefix != current:
+                if current is not None:
+                    page.append(_session_listing(current, sizes, metadata_etag))
+                current, sizes, metadata_etag = session_prefix, {}, None
+            sizes[key] = int(obj.get("Size") or 0)
+            if key == f"{session_prefix}metadata.json":
+                metadata_etag = obj.get("ETag")
+        if page:
+            yield page
+    if current is not None:
+        yield [_session_listing(current, sizes, metadata_etag)]
+
+
+def job_prefix(job: SessionJob) -> str:
+    return job.prefix if isinstance(job, SessionListing) else job
+
+
+def job_record(job: SessionJob) -> str | dict:
+    """JSON form of a job for the journal's ``listed`` events."""
+    if isinstance(job, SessionListing):
+        return {"prefix": job.prefix, "sizes": job.sizes, "metadata_etag": job.metadata_etag}
+    return job
+
+
+def job_from_record(record: str | dict) -> SessionJob:
+    if isinstance(record, dict):
+        return _session_listing(record["prefix"], record.get("sizes") or {}, record.get("metadata_etag"))
+    return record
+
+
+def list_object_sizes(s3, bucket: str, prefix: str, shards: int = 1) -> dict[str, int]:
+    """Key → size for every object under ``prefix``, in key order."""
     norm = prefix if prefix.endswith("/") else f"{prefix}/"
-    keys: list[str] = []
-    token = None
-    while True:
-        kwargs = {"Bucket": bucket, "Prefix": norm}
-        if token:
-            kwargs["ContinuationToken"] = token
-        resp = s3.list_objects_v2(**kwargs)
+    sizes: dict[str, int] = {}
+    for resp in list_pages(s3, bucket, norm, shards=shards):
         for obj in resp.get("Contents") or []:
             if obj.get("Key"):
-                keys.append(obj["Key"])
-        if not resp.get("IsTruncated"):
-            break
-        token = resp.get("NextContinuationToken")
-    return keys
+                sizes[obj["Key"]] = int(obj.get("Size") or 0)
+    return sizes
+
 
+def list_object_keys(s3, bucket: str, prefix: str, shards: int = 1) -> list[str]:
+    return list(list_object_sizes(s3, bucket, prefix, shards))
 
-def read_metadata(s3, bucket: str, prefix: str) -> dict | None:
+
+def read_metadata(
+    s3,
+    bucket: str,
+    prefix: str,
+    *,
+    cache: MetadataCache | None = None,
+    etag: str | None = None,
+) -> dict | None:
     key = f"{prefix}metadata.json"
+    if cache is not None:
+        return cache.read_json(s3, bucket, key, etag)
     try:
         body = s3.get_object(Bucket=bucket, Key=key)["Body"].read()
         return json.loads(body)
@@ -196,13 +385,196 @@ def read_metadata(s3, bucket: str, prefix: str) -> dict | None:
         raise
 
 
-def copy_keys_parallel(s3, bucket: str, jobs: list[tuple[str, str]], copy_workers: int) -> None:
-    def _copy(pair: tuple[str, str]) -> None:
-        src, dst = pair
-        s3.copy_object(Bucket=bucket, CopySource={"Bucket": bucket, "Key": src}, Key=dst)
-
-    with ThreadPoolExecutor(max_workers=copy_workers) as pool:
-        list(pool.map(_copy, jobs))
+class _CopyBatch:
+    """Copy tasks submitted by one session, plus its completion state."""
+
+    def __init__(self, per_batch_limit: int) -> None:
+        self.tasks: deque[Callable[[], None]] = deque()
+        self.limit = max(1, per_batch_limit)
+        self.inflight = 0
+        self.remaining = 0
+        self.error: BaseException | None = None
+        self.done = threading.Event()
+
+
+class CopyScheduler:
+    """
+    Process-wide S3 copy scheduler shared by every session worker.
+
+    A fixed pool of ``concurrency`` threads serves all sessions, so the number of
+    in-flight CopyObject / UploadPartCopy requests never exceeds the budget no matter
+    how many sessions run at once. Sessions are served round-robin, one task per turn,
+    and each session has at most ``per_session`` tasks in flight, so one large session
+    cannot starve the rest. Objects of ``multipart_threshold`` bytes or more are copied
+    with UploadPartCopy, and each part is scheduled as its own task.
+    """
+
+    def __init__(
+        self,
+        s3,
+        bucket: str,
+        *,
+        concurrency: int,
+        per_session: int,
+        multipart_threshold: int,
+        part_size: int,
+    ) -> None:
+        self.s3 = s3
+        self.bucket = bucket
+        self.per_session = per_session
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+        self.concurrency = max(1, concurrency)
+        self._cond = threading.Condition()
+        self._ready: deque[_CopyBatch] = deque()
+        self._threads: list[threading.Thread] = []
+
+    def _start(self) -> None:
+        """Start the copy threads on first use."""
+        with self._cond:
+            if self._threads:
+                return
+            self._threads = [
+                threading.Thread(target=self._run, name=f"copy-{i}", daemon=True)
+                for i in range(self.concurrency)
+            ]
+            for t in self._threads:
+                t.start()
+
+    def copy(self, jobs: list[tuple[str, str]], sizes: dict[str, int] | None = None) -> None:
+        """Copy every ``(src, dst)`` pair; blocks until done and re-raises the first error."""
+        if not jobs:
+            return
+        self._start()
+        batch = _CopyBatch(self.per_session)
+        for src, dst in jobs:
+            size = (sizes or {}).get(src)
+            if size is not None and size >= self.multipart_threshold:
+                batch.tasks.append(self._multipart_starter(batch, src, dst, size))
+            else:
+                batch.tasks.append(self._simple_copy(src, dst))
+        batch.remaining = len(batch.tasks)
+        with self._cond:
+            self._ready.append(batch)
+            self._cond.notify_all()
+        batch.done.wait()
+        if batch.error is not None:
+            raise batch.error
+
+    def _simple_copy(self, src: str, dst: str) -> Callable[[], None]:
+        def _task() -> None:
+            self.s3.copy_object(
+                Bucket=self.bucket,
+                CopySource={"Bucket": self.bucket, "Key": src},
+                Key=dst,
+            )
+
+        return _task
+
+    def _multipart_starter(
+        self, batch: _CopyBatch, src: str, dst: str, size: int
+    ) -> Callable[[], None]:
+        def _task() -> None:
+            head = self.s3.head_object(Bucket=self.bucket, Key=src)
+            create = {"Bucket": self.bucket, "Key": dst, "Metadata": head.get("Metadata") or {}}
+            for field in ("ContentType", "ContentEncoding", "ContentDisposition", "CacheControl"):
+                if head.get(field):
+                    create[field] = head[field]
+            upload_id = self.s3.create_multipart_upload(**create)["UploadId"]
+            ranges = [
+                (start, min(start + self.part_size, size) - 1)
+                for start in range(0, size, self.part_size)
+            ]
+            etags: list[str | None] = [None] * len(ranges)
+            lock = threading.Lock()
+            left = [len(ranges)]
+
+            def _part(number: int, first: int, last: int) -> Callable[[], None]:
+                def _run_part() -> None:
+                    # A failed part or a failed completion aborts the upload, so no
+                    # orphaned parts stay billed.
+                    try:
+                        resp = self.s3.upload_part_copy(
+                            Bucket=self.bucket,
+                            Key=dst,
+                            UploadId=upload_id,
+                            PartNumber=number,
+                            CopySource={"Bucket": self.bucket, "Key": src},
+                            CopySourceRange=f"bytes={first}-{last}",
+                        )
+                        etags[number - 1] = resp["CopyPartResult"]["ETag"]
+                        with lock:
+                            left[0] -= 1
+                            finished = left[0] == 0
+                        if finished:
+                            self.s3.complete_multipart_upload(
+                                Bucket=self.bucket,
+                                Key=dst,
+                                UploadId=upload_id,
+                                MultipartUpload={
+                                    "Parts": [
+                                        {"ETag": etag, "PartNumber": i + 1} for i, etag in enumerate(etags)
+                                    ]
+                                },
+                            )
+                    except BaseException:
+                        try:
+                            self.s3.abort_multipart_upload(
+                                Bucket=self.bucket, Key=dst, UploadId=upload_id
+                            )
+                        except Exception:
+                            pass
+                        raise
+
+                return _run_part
+
+            with self._cond:
+                for i, (first, last) in enumerate(ranges):
+                    batch.tasks.append(_part(i + 1, first, last))
+                batch.remaining += len(ranges)
+                if batch not in self._ready:
+                    self._ready.append(batch)
+                self._cond.notify_all()
+
+        return _task
+
+    def _next_task(self) -> tuple[_CopyBatch, Callable[[], None]]:
+        with self._cond:
+            while True:
+                for _ in range(len(self._ready)):
+                    batch = self._ready.popleft()
+                    if not batch.tasks:
+                        continue
+                    if batch.inflight >= batch.limit:
+                        self._ready.append(batch)
+                        continue
+                    task = batch.tasks.popleft()
+                    batch.inflight += 1
+                    if batch.tasks:
+                        self._ready.append(batch)
+                    return batch, task
+                self._cond.wait()
+
+    def _run(self) -> None:
+        while True:
+            batch, task = self._next_task()
+            try:
+                task()
+                error = None
+            except BaseException as exc:
+                error = exc
+            with self._cond:
+                batch.inflight -= 1
+                batch.remaining -= 1
+                if error is not None and batch.error is None:
+                    batch.error = error
+                    batch.remaining -= len(batch.tasks)
+                    batch.tasks.clear()
+                if batch.tasks and batch not in self._ready:
+                    self._ready.append(batch)
+                if batch.remaining <= 0 and batch.inflight == 0:
+                    batch.done.set()
+                self._cond.notify_all()
 
 
 def delete_keys_batch(s3, bucket: str, keys: list[str]) -> None:
@@ -214,61 +586,534 @@ def delete_keys_batch(s3, bucket: str, keys: list[str]) -> None:
         )
 
 
+def complete_move(
+    s3,
+    bucket: str,
+    source_prefix: str,
+    target_prefix: str,
+    keys: list[str],
+    metadata: dict,
+    *,
+    copier: CopyScheduler,
+    sizes: dict[str, int] | None = None,
+    journal: SessionJournal | None = None,
+    reached: str | None = None,
+    index: SessionIndexWriter | None = None,
+) -> str:
+    """
+    Copy ``keys`` to ``target_prefix``, write the rewritten metadata, then delete the
+    source. ``reached`` is the last journaled phase of a resumed session; only the
+    phases after it run. ``index`` re-points the session's index item once the source
+    is gone. Every step is idempotent while the source still exists, so a
+    resumed move always converges to the same end state.
+    """
+    start = MOVE_PHASES.index(reached) + 1 if reached else 0
+
+    if start <= 0 and journal:
+        journal.record(
+            source_prefix,
+            "planned",
+            target=target_prefix,
+            keys=keys,
+            sizes=sizes or {},
+            metadata=metadata,
+        )
+
+    if start <= 1:
+        copy_jobs = []
+        for key in keys:
+            rel = key[len(source_prefix) :] if key.startswith(source_prefix) else key
+            copy_jobs.append((key, f"{target_prefix}{rel}"))
+        copier.copy(copy_jobs, sizes)
+        if journal:
+            journal.record(source_prefix, "copied")
+
+    if start <= 2:
+        s3.put_object(
+            Bucket=bucket,
+            Key=f"{target_prefix}metadata.json",
+            Body=json.dumps(metadata, indent=2).encode("utf-8"),
+            ContentType="application/json; charset=utf-8",
+        )
+        if journal:
+            journal.record(source_prefix, "metadata_written")
+
+    delete_keys_batch(s3, bucket, keys)
+    if journal:
+        journal.record(source_prefix, "deleted", result="moved")
+    if index:
+        index.after_move(metadata, target_prefix)
+    return "moved"
+
+
 def move_session(
     s3,
     bucket: str,
     source_prefix: str,
     *,
     execute: bool,
-    copy_workers: int,
+    copier: CopyScheduler | None,
+    listing: SessionListing | None = None,
+    journal: SessionJournal | None = None,
+    index: SessionIndexWriter | None = None,
+    cache: MetadataCache | None = None,
 ) -> str:
+    """
+    Inspect one session and move it to the simulator folder when it should not stay
+    field. ``listing`` (from --flat-listing) supplies the session's keys up front, so
+    the per-session LIST is skipped and metadata is only fetched when it exists.
+    """
     target_prefix = rewrite_prefix_source(source_prefix, "simulator")
     if not target_prefix or target_prefix == source_prefix:
         return "failed:bad_prefix"
 
-    metadata = read_metadata(s3, bucket, source_prefix)
+    if listing is not None and not listing.has_metadata:
+        metadata = None
+    else:
+        etag = listing.metadata_etag if listing is not None else None
+        metadata = read_metadata(s3, bucket, source_prefix, cache=cache, etag=etag)
     if metadata is None:
-        if read_metadata(s3, bucket, target_prefix) is not None:
+        if read_metadata(s3, bucket, target_prefix, cache=cache) is not None:
             return "skipped:already_at_target"
         return "skipped:no_metadata"
 
     if should_stay_field(metadata):
         return "keep_field"
 
-    if not execute:
+    if not execute or copier is None:
         return "would_move"
 
-    keys = list_object_keys(s3, bucket, source_prefix)
+    if listing is not None:
+        keys, sizes = listing.keys, listing.sizes
+    else:
+        sizes = list_object_sizes(s3, bucket, source_prefix)
+        keys = list(sizes)
     if not keys:
         return "failed:empty"
 
-    copy_jobs = []
-    for key in keys:
+    metadata["upload_mode"] = "simulator"
+    return complete_move(
+        s3,
+        bucket,
+        source_prefix,
+        target_prefix,
+        keys,
+        metadata,
+        copier=copier,
+        sizes=sizes,
+        journal=journal,
+        index=index,
+    )
+
+
+async def complete_move_async(
+    aio,
+    bucket: str,
+    source_prefix: str,
+    target_prefix: str,
+    keys: list[str],
+    metadata: dict,
+    *,
+    copy_slots: asyncio.Semaphore,
+    per_session: int,
+    multipart_threshold: int,
+    part_size: int,
+    sizes: dict[str, int] | None = None,
+    journal: SessionJournal | None = None,
+    index: SessionIndexWriter | None = None,
+) -> str:
+    """asyncio twin of :func:`complete_move` (same phases, same journal events)."""
+    if journal:
+        await journal.record_async(
+            source_prefix,
+            "planned",
+            target=target_prefix,
+            keys=keys,
+            sizes=sizes or {},
+            metadata=metadata,
+        )
+
+    session_slots = asyncio.Semaphore(max(1, per_session))
+
+    async def _copy(key: str) -> None:
         rel = key[len(source_prefix) :] if key.startswith(source_prefix) else key
-        copy_jobs.append((key, f"{target_prefix}{rel}"))
+        async with session_slots, copy_slots:
+            await aio.copy(
+                bucket,
+                key,
+                f"{target_prefix}{rel}",
+                size=(sizes or {}).get(key),
+                multipart_threshold=multipart_threshold,
+                part_size=part_size,
+            )
+
+    await asyncio.gather(*(_copy(key) for key in keys))
+    if journal:
+        await journal.record_async(source_prefix, "copied")
+
+    await aio.put_json(bucket, f"{target_prefix}metadata.json", metadata)
+    if journal:
+        await journal.record_async(source_prefix, "metadata_written")
+
+    await aio.delete_batch(bucket, keys)
+    if journal:
+        await journal.record_async(source_prefix, "deleted", result="moved")
+    if index:
+        await index.after_move_async(metadata, target_prefix)
+    return "moved"
+
+
+async def move_session_async(
+    aio,
+    bucket: str,
+    source_prefix: str,
+    *,
+    execute: bool,
+    copy_slots: asyncio.Semaphore,
+    per_session: int,
+    multipart_threshold: int,
+    part_size: int,
+    listing: SessionListing | None = None,
+    journal: SessionJournal | None = None,
+    index: SessionIndexWriter | None = None,
+    cache: MetadataCache | None = None,
+) -> str:
+    """asyncio twin of :func:`move_session`."""
+
+    async def _read(prefix: str, etag: str | None = None) -> dict | None:
+        key = f"{prefix}metadata.json"
+        if cache is not None:
+            return await cache.read_json_async(aio, bucket, key, etag)
+        return await aio.get_json(bucket, key)
+
+    target_prefix = rewrite_prefix_source(source_prefix, "simulator")
+    if not target_prefix or target_prefix == source_prefix:
+        return "failed:bad_prefix"
+
+    if listing is not None and not listing.has_metadata:
+        metadata = None
+    else:
+        metadata = await _read(source_prefix, listing.metadata_etag if listing is not None else None)
+    if metadata is None:
+        if await _read(target_prefix) is not None:
+            return "skipped:already_at_target"
+        return "skipped:no_metadata"
+
+    if should_stay_field(metadata):
+        return "keep_field"
 
-    copy_keys_parallel(s3, bucket, copy_jobs, copy_workers)
+    if not execute:
+        return "would_move"
+
+    if listing is not None:
+        keys, sizes = listing.keys, listing.sizes
+    else:
+        sizes = {o["Key"]: int(o.get("Size") or 0) async for o in aio.iter_objects(bucket, source_prefix)}
+        keys = list(sizes)
+    if not keys:
+        return "failed:empty"
 
     metadata["upload_mode"] = "simulator"
-    s3.put_object(
-        Bucket=bucket,
-        Key=f"{target_prefix}metadata.json",
-        Body=json.dumps(metadata, indent=2).encode("utf-8"),
-        ContentType="application/json; charset=utf-8",
+    return await complete_move_async(
+        aio,
+        bucket,
+        source_prefix,
+        target_prefix,
+        keys,
+        metadata,
+        copy_slots=copy_slots,
+        per_session=per_session,
+        multipart_threshold=multipart_threshold,
+        part_size=part_size,
+        sizes=sizes,
+        journal=journal,
+        index=index,
     )
 
-    delete_keys_batch(s3, bucket, keys)
-    return "moved"
 
+def resume_unfinished(
+    s3,
+    bucket: str,
+    journal: SessionJournal,
+    *,
+    workers: int,
+    copier: CopyScheduler,
+    index: SessionIndexWriter | None = None,
+) -> Iterator[tuple[str, str]]:
+    """Finish sessions the journal shows as half-moved, without listing S3."""
+    entries = journal.unfinished()
+    if not entries:
+        return
+    log(f"♻️ finishing {len(entries)} half-moved sessions from {journal.path}")
+
+    def _finish(entry: dict) -> tuple[str, str]:
+        result = complete_move(
+            s3,
+            bucket,
+            entry["prefix"],
+            entry["target"],
+            entry["keys"],
+            entry["metadata"],
+            copier=copier,
+            sizes=entry.get("sizes"),
+            journal=journal,
+            reached=entry["phase"],
+            index=index,
+        )
+        return entry["prefix"], result
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_finish, entries)
+
+
+def journaled_pages(
+    iter_pages: Callable[[str], Iterator[list[SessionJob]]],
+    journal: SessionJournal,
+    *,
+    relist: bool = False,
+) -> Callable[[str], Iterator[list[SessionJob]]]:
+    """
+    Wrap a folder lister so completed listings are recorded and replayed from the
+    journal, and sessions already settled in the journal are never handed to workers.
+    A replayed folder is the recorded snapshot: sessions written to it afterwards are
+    only found with ``relist`` (--relist), which lists every folder again.
+    """
+
+    def _pages(folder: str) -> Iterator[list[SessionJob]]:
+        if folder in journal.listed and not relist:
+            jobs = (job_from_record(record) for record in journal.listed[folder])
+            pending = [job for job in jobs if not journal.is_settled(job_prefix(job))]
+            for i in range(0, len(pending), 1000):
+                yield pending[i : i + 1000]
+            return
+        seen: list[str | dict] = []
+        for page in iter_pages(folder):
+            seen.extend(job_record(job) for job in page)
+            pending_jobs = [job for job in page if not journal.is_settled(job_prefix(job))]
+            if pending_jobs:
+                yield pending_jobs
+        journal.record_listed(folder, seen)
+
+    return _pages
+
+
+def collect_jobs(
+    folders: list[str],
+    iter_pages: Callable[[str], Iterator[list[SessionJob]]],
+) -> list[SessionJob]:
+    jobs: list[SessionJob] = []
+    for folder in folders:
+        found = [job for page in iter_pages(folder) for job in page]
+        log(f"📂 {folder} → {len(found)} sessions")
+        jobs.extend(found)
+    return jobs
+
+
+INDEX_PROJECTION = ("s3_session_prefix", "user_name", "user_email", "captured_at")
+
+
+def index_candidate_pages(
+    reader: SessionIndexReader,
+    work_types: list[str],
+    s3_base: str,
+    kept: list[int],
+) -> Callable[[str], Iterator[list[SessionJob]]]:
+    """
+    ``iter_pages`` over session index jobs: yields the prefixes of indexed field sessions
+    and counts (in ``kept[0]``) those whose indexed user and capture day keep them in
+    Field, without touching S3.
+    """
+    base = f"{s3_base.rstrip('/')}/" if s3_base else ""
+    lock = threading.Lock()
+    filter_values = {":src": "field", **{f":wt{i}": wt for i, wt in enumerate(work_types)}}
+    filter_expression = (
+        f"source_type = :src AND portal_work_type IN ({', '.join(f':wt{i}' for i in range(len(work_types)))})"
+    )
 
-def collect_jobs(s3, bucket: str, work_types: list[str], s3_base: str) -> list[str]:
-    prefixes: list[str] = []
+    def _pages(job: str) -> Iterator[list[SessionJob]]:
+        for items in reader.pages(
+            job, projection=INDEX_PROJECTION, filter_expression=filter_expression, filter_values=filter_values
+        ):
+            page: list[SessionJob] = []
+            for item in items:
+                prefix = item.get("s3_session_prefix") or ""
+                if not prefix or not prefix.startswith(base):
+                    continue
+                indexed = {
+                    "user_name": item.get("user_name"),
+                    "user_email": item.get("user_email"),
+                    "timestamp": item.get("captured_at"),
+                }
+                if should_stay_field(indexed):
+                    with lock:
+                        kept[0] += 1
+                    continue
+                page.append(prefix if prefix.endswith("/") else f"{prefix}/")
+            yield page
+
+    return _pages
+
+
+def get_all_field_folders(work_types: list[str], s3_base: str) -> list[str]:
+    folders: list[str] = []
     for wt in work_types:
         for folder, _status in get_field_folder_jobs(wt, s3_base):
-            found = list_session_prefixes(s3, bucket, folder)
-            log(f"📂 {folder} → {len(found)} sessions")
-            prefixes.extend(found)
-    return prefixes
+            if folder not in folders:
+                folders.append(folder)
+    return folders
+
+
+def run_batch(
+    task: Callable[[SessionJob], tuple[str, str]],
+    session_prefixes: list[SessionJob],
+    workers: int,
+) -> Iterator[tuple[str, str]]:
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(task, p): p for p in session_prefixes}
+        for fut in as_completed(futures):
+            yield fut.result()
+
+
+_END = object()
+
+
+def run_pipeline(
+    folders: list[str],
+    iter_pages: Callable[[str], Iterator[list[SessionJob]]],
+    task: Callable[[SessionJob], tuple[str, str]],
+    *,
+    list_workers: int,
+    session_workers: int,
+    queue_size: int,
+    unlisted: list[str],
+) -> Iterator[tuple[str, str]]:
+    """
+    Stream list → inspect → move.
+
+    Folder listings (``iter_pages``) run on ``list_workers`` threads and push each page
+    of session jobs into a bounded queue; ``session_workers`` threads drain it. A full queue
+    blocks the listers, so at most ``queue_size`` prefixes are buffered at any time.
+    Yields ``(prefix, result)`` in completion order. A folder whose listing fails is
+    appended to ``unlisted`` and the run carries on with the other folders.
+    """
+    pending: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+    results: queue.Queue = queue.Queue()
+
+    def lister(folder: str) -> None:
+        found = 0
+        try:
+            for page in iter_pages(folder):
+                for job in page:
+                    pending.put(job)
+                found += len(page)
+        except Exception as exc:
+            log(f"   ⚠️ list {folder}: {exc}")
+            unlisted.append(folder)
+            return
+        log(f"📂 {folder} → {found} sessions")
+
+    def feed() -> None:
+        with ThreadPoolExecutor(max_workers=max(1, list_workers)) as pool:
+            list(pool.map(lister, folders))
+        for _ in range(session_workers):
+            pending.put(_END)
+
+    def worker() -> None:
+        while True:
+            job = pending.get()
+            if job is _END:
+                results.put(_END)
+                return
+            try:
+                results.put(task(job))
+            except Exception as exc:
+                log(f"   ⚠️ {job_prefix(job)}: {exc}")
+                results.put((job_prefix(job), "failed:error"))
+
+    threads = [threading.Thread(target=feed, name="reclassify-list", daemon=True)]
+    threads += [
+        threading.Thread(target=worker, name=f"reclassify-session-{i}", daemon=True)
+        for i in range(session_workers)
+    ]
+    for t in threads:
+        t.start()
+
+    finished = 0
+    while finished < session_workers:
+        item = results.get()
+        if item is _END:
+            finished += 1
+            continue
+        yield item
+
+
+def run_async_pipeline(
+    engine,
+    folders: list[str],
+    iter_pages: Callable[[str], Iterator[list[SessionJob]]],
+    atask: Callable[[SessionJob], "asyncio.Future[tuple[str, str]]"],
+    *,
+    list_workers: int,
+    session_workers: int,
+    queue_size: int,
+    unlisted: list[str],
+) -> Iterator[tuple[str, str]]:
+    """
+    :func:`run_pipeline` with the session stage on the engine's event loop.
+
+    Listing stays on ``list_workers`` threads (its S3 calls go through the engine's
+    pool); each job is handed to a bounded ``asyncio.Queue`` drained by
+    ``session_workers`` coroutines, so backpressure works as in the threaded pipeline.
+    """
+    results: queue.Queue = queue.Queue()
+
+    async def _make_queue() -> asyncio.Queue:
+        return asyncio.Queue(maxsize=max(1, queue_size))
+
+    pending = engine.run(_make_queue())
+
+    async def worker() -> None:
+        while True:
+            job = await pending.get()
+            if job is _END:
+                results.put(_END)
+                return
+            try:
+                results.put(await atask(job))
+            except Exception as exc:
+                log(f"   ⚠️ {job_prefix(job)}: {exc}")
+                results.put((job_prefix(job), "failed:error"))
+
+    def lister(folder: str) -> None:
+        found = 0
+        try:
+            for page in iter_pages(folder):
+                for job in page:
+                    engine.run(pending.put(job))
+                found += len(page)
+        except Exception as exc:
+            log(f"   ⚠️ list {folder}: {exc}")
+            unlisted.append(folder)
+            return
+        log(f"📂 {folder} → {found} sessions")
+
+    def feed() -> None:
+        with ThreadPoolExecutor(max_workers=max(1, list_workers)) as pool:
+            list(pool.map(lister, folders))
+        for _ in range(session_workers):
+            engine.run(pending.put(_END))
+
+    for _ in range(session_workers):
+        engine.submit(worker())
+    threading.Thread(target=feed, name="reclassify-list", daemon=True).start()
+
+    finished = 0
+    while finished < session_workers:
+        item = results.get()
+        if item is _END:
+            finished += 1
+            continue
+        yield item
 
 
 def main() -> int:
@@ -276,11 +1121,125 @@ def main() -> int:
     parser.add_argument("--execute", action="store_true")
     parser.add_argument("--dry-run", action="store_true")
     parser.add_argument("--workers", type=int, default=24)
-    parser.add_argument("--copy-workers", type=int, default=8)
+    parser.add_argument(
+        "--copy-workers",
+        type=int,
+        default=8,
+        help="Max copies in flight for any one session (fair share of --copy-concurrency)",
+    )
+    parser.add_argument(
+        "--copy-concurrency",
+        type=int,
+        default=64,
+        help="Process-wide copy budget shared by all sessions",
+    )
+    parser.add_argument(
+        "--multipart-threshold-mb",
+        type=int,
+        default=128,
+        help="Copy objects at least this large with parallel UploadPartCopy parts",
+    )
+    parser.add_argument("--part-size-mb", type=int, default=64, help="UploadPartCopy part size")
     parser.add_argument("--work-type", action="append", dest="work_types")
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Stream sessions to workers while folders are still being listed",
+    )
+    parser.add_argument("--list-workers", type=int, default=8, help="Concurrent folder listings (--pipeline)")
+    parser.add_argument(
+        "--list-shards",
+        type=int,
+        default=1,
+        help="Split each folder listing into N session-id key ranges listed concurrently",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=0,
+        help="Max session prefixes buffered between listing and workers (--pipeline; default workers × 4)",
+    )
+    parser.add_argument(
+        "--flat-listing",
+        action="store_true",
+        help="List each folder once without a delimiter; skips per-session LIST and metadata probes",
+    )
+    parser.add_argument(
+        "--inventory",
+        type=Path,
+        help="List folders from a local S3 Inventory (manifest.json, delivery dir or CSV/Parquet file)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=("boto3", "asyncio"),
+        default="boto3",
+        help="asyncio: sessions run as coroutines on one event loop and pool (needs aiobotocore)",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="AIMD per-operation concurrency driven by latency and S3 throttling (limits are upper bounds)",
+    )
+    parser.add_argument(
+        "--sessions-table",
+        default=None,
+        help="DynamoDB session index to update after each move (default: AWS_DYNAMODB_SESSIONS_TABLE)",
+    )
+    parser.add_argument(
+        "--no-index-update",
+        action="store_true",
+        help="Do not touch the session index (backfill it afterwards instead)",
+    )
+    parser.add_argument("--index-workers", type=int, default=16, help="Concurrent session index updates")
+    parser.add_argument(
+        "--from-index",
+        action="store_true",
+        help="Select field sessions from the session index instead of listing S3 folders",
+    )
+    parser.add_argument(
+        "--index-scan-segments",
+        type=int,
+        default=0,
+        help="With --from-index: parallel Scan with this many segments instead of gsi1 Queries",
+    )
+    parser.add_argument(
+        "--metadata-cache",
+        type=Path,
+        default=os.environ.get("AMR_METADATA_CACHE") or None,
+        help="Directory for the ETag-keyed metadata.json cache (default: AMR_METADATA_CACHE)",
+    )
+    parser.add_argument("--metadata-cache-mb", type=int, default=512, help="Metadata cache size bound")
+    parser.add_argument("--metrics", metavar="PATH", help="Append periodic JSON metrics lines here ('-' = stderr)")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="Seconds between metrics snapshots")
+    parser.add_argument("--prometheus-textfile", metavar="PATH", help="Rewrite this Prometheus textfile each interval")
+    parser.add_argument("--journal", type=Path, help="Append-only JSONL checkpoint journal (--execute)")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resume from --journal: finish half-moved sessions, skip settled sessions and listed folders",
+    )
+    parser.add_argument(
+        "--relist",
+        action="store_true",
+        help="With --resume: list folders again instead of replaying journaled listings (finds new sessions)",
+    )
     args = parser.parse_args()
 
     execute = args.execute and not args.dry_run
+    if args.resume and not args.journal:
+        parser.error("--resume requires --journal")
+    if args.relist and not args.resume:
+        parser.error("--relist requires --resume")
+    if args.journal and not execute:
+        parser.error("--journal only applies to --execute runs")
+    if args.journal and args.journal.exists() and not args.resume:
+        parser.error(f"{args.journal} already exists; pass --resume or choose a new path")
+    if args.from_index and args.flat_listing:
+        parser.error("--from-index replaces folder listings; drop --flat-listing")
+    if args.list_shards < 1:
+        parser.error("--list-shards must be at least 1")
+    if args.from_index and args.inventory:
+        parser.error("--from-index and --inventory are both candidate sources; pick one")
     load_dotenv(ENV_SRC)
 
     bucket = (os.environ.get("AWS_S3_BUCKET") or "meter-reader-training-feedback").strip()
@@ -293,17 +1252,86 @@ def main() -> int:
         os.environ.pop("AWS_SECRET_ACCESS_KEY", None)
         os.environ.pop("AWS_SESSION_TOKEN", None)
 
-    cfg = Config(max_pool_connections=max(50, args.workers * 4), retries={"max_attempts": 10})
+    metrics = None
+    if args.metrics or args.prometheus_textfile:
+        from amr_ops.metrics import Metrics, MeteredClient
+
+        metrics = Metrics("reclassify")
+
+    controller = None
+    retries = {"max_attempts": 10}
+    if args.adaptive:
+        from amr_ops.adaptive import AdaptiveClient, AdaptiveController, client_config_retries
+
+        controller = AdaptiveController(
+            {
+                "LIST": args.workers + args.list_workers * args.list_shards,
+                "GET": args.workers,
+                "PUT": args.workers,
+                "COPY": args.copy_concurrency,
+                "DELETE": args.workers,
+            }
+        )
+        retries = client_config_retries()
+
+    cfg = Config(
+        max_pool_connections=max(50, args.workers * 2 + args.copy_concurrency),
+        retries=retries,
+    )
     s3 = boto3.client("s3", region_name=region, config=cfg)
+    if metrics is not None:
+        s3 = MeteredClient(s3, metrics)
+    if controller is not None:
+        s3 = AdaptiveClient(s3, controller)
+    multipart_threshold = args.multipart_threshold_mb * 1024 * 1024
+    part_size = max(5, args.part_size_mb) * 1024 * 1024
+    # Only boto3 moves (and journal resumes) copy through the thread scheduler; its
+    # threads start on the first copy.
+    copier = None
+    if execute:
+        copier = CopyScheduler(
+            s3,
+            bucket,
+            concurrency=args.copy_concurrency,
+            per_session=args.copy_workers,
+            multipart_threshold=multipart_threshold,
+            part_size=part_size,
+        )
 
     mode = "EXECUTE" if execute else "DRY RUN"
     log(f"\n🚀 {mode} — bulk reclassify field → simulator")
     log(f"   Bucket: s3://{bucket}/")
-    log(f"   Workers: {args.workers} sessions, {args.copy_workers} copies/session")
+    log(
+        f"   Workers: {args.workers} sessions, {args.copy_concurrency} copies shared "
+        f"(≤{args.copy_workers}/session)"
+    )
     log(f"   Keep field: {', '.join(sorted(FIELD_WINDOW_DAYS))} (non-internal only)\n")
 
-    session_prefixes = collect_jobs(s3, bucket, work_types, s3_base)
-    log(f"\n📋 {len(session_prefixes)} field session folders to inspect\n")
+    journal = SessionJournal(args.journal, resume=args.resume) if args.journal else None
+
+    reporter = None
+    if metrics is not None:
+        from amr_ops.metrics import MetricsReporter
+
+        if controller is not None:
+            metrics.limits = controller.snapshot
+        reporter = MetricsReporter(
+            metrics, jsonl=args.metrics, textfile=args.prometheus_textfile, interval=args.metrics_interval
+        )
+
+    cache = None
+    if args.metadata_cache:
+        from amr_ops.meta_cache import MetadataCache
+
+        cache = MetadataCache(args.metadata_cache.expanduser(), max_bytes=args.metadata_cache_mb * 1024 * 1024)
+
+    sessions_table = (args.sessions_table or os.environ.get("AWS_DYNAMODB_SESSIONS_TABLE") or "").strip()
+    index = None
+    if execute and sessions_table and not args.no_index_update:
+        from amr_ops.session_index import SessionIndexWriter
+
+        index = SessionIndexWriter(sessions_table, region=region, workers=args.index_workers, metrics=metrics)
+        log(f"   Session index: {sessions_table} (updated per moved session)\n")
 
     counts = {
         "keep_field": 0,
@@ -313,32 +1341,166 @@ def main() -> int:
         "skipped:no_metadata": 0,
         "failed:bad_prefix": 0,
         "failed:empty": 0,
+        "failed:error": 0,
     }
 
-    def task(prefix: str) -> tuple[str, str]:
+    def task(job: SessionJob) -> tuple[str, str]:
+        prefix = job_prefix(job)
         result = move_session(
             s3,
             bucket,
             prefix,
             execute=execute,
-            copy_workers=args.copy_workers,
+            copier=copier,
+            listing=job if isinstance(job, SessionListing) else None,
+            journal=journal,
+            index=index,
+            cache=cache,
         )
+        if journal and result in SETTLED_RESULTS and result != "moved":
+            journal.record(prefix, "done", result=result)
         return prefix, result
 
+    engine = None
+    list_client = s3
+    if args.engine == "asyncio":
+        from amr_ops.aio_s3 import S3Engine
+
+        engine = S3Engine(
+            region=region,
+            max_connections=max(50, args.workers * 2 + args.copy_concurrency),
+            retries=retries,
+            controller=controller,
+            metrics=metrics,
+        )
+        list_client = engine.blocking_client()
+
+    async def atask(job: SessionJob) -> tuple[str, str]:
+        prefix = job_prefix(job)
+        result = await move_session_async(
+            engine.s3,
+            bucket,
+            prefix,
+            execute=execute,
+            copy_slots=copy_slots,
+            per_session=args.copy_workers,
+            multipart_threshold=multipart_threshold,
+            part_size=part_size,
+            listing=job if isinstance(job, SessionListing) else None,
+            journal=journal,
+            index=index,
+            cache=cache,
+        )
+        if journal and result in SETTLED_RESULTS and result != "moved":
+            await journal.record_async(prefix, "done", result=result)
+        return prefix, result
+
+    folders = get_all_field_folders(work_types, s3_base)
+    if args.inventory:
+        from amr_ops.inventory import InventoryListing
+
+        list_client = InventoryListing(args.inventory, bucket=bucket, prefixes=folders)
+        log(f"   Listing: {list_client.describe()}\n")
+
+    def iter_pages(folder: str) -> Iterator[list[SessionJob]]:
+        if args.flat_listing or args.inventory:
+            return iter_flat_session_pages(list_client, bucket, folder, args.list_shards)
+        return iter_session_prefix_pages(list_client, bucket, folder, args.list_shards)
+
+    reader = None
+    kept_by_index = [0]
+    if args.from_index:
+        if not sessions_table:
+            parser.error("--from-index needs --sessions-table or AWS_DYNAMODB_SESSIONS_TABLE")
+        from amr_ops.session_index import ALL_STATUSES, SessionIndexReader, gsi1_partitions
+
+        reader = SessionIndexReader(sessions_table, region=region, workers=args.list_workers, metrics=metrics)
+        if args.index_scan_segments:
+            folders = reader.scan_jobs(args.index_scan_segments)
+        else:
+            folders = reader.query_jobs(gsi1_partitions(work_types, ALL_STATUSES, ["field"]))
+        iter_pages = index_candidate_pages(reader, work_types, s3_base, kept_by_index)
+        log(f"   Candidates: {sessions_table} ({len(folders)} {'Scan segments' if args.index_scan_segments else 'gsi1 partitions'})\n")
+
+    if journal:
+        iter_pages = journaled_pages(iter_pages, journal, relist=args.relist)
+        # --journal implies --execute, so the copier exists.
+        for prefix, result in resume_unfinished(
+            s3, bucket, journal, workers=args.workers, copier=copier, index=index
+        ):
+            counts[result] += 1
+            log(f"   ♻️ {prefix.split('/')[-2]}: {result}")
+
+    source = "session index jobs" if reader is not None else "field folders"
+    unlisted: list[str] = []
+    if engine is not None:
+        log(f"📋 streaming sessions from {len(folders)} {source} (asyncio)\n")
+        total = ""
+
+        async def _make_copy_slots() -> asyncio.Semaphore:
+            return asyncio.Semaphore(max(1, args.copy_concurrency))
+
+        copy_slots = engine.run(_make_copy_slots())
+        results = run_async_pipeline(
+            engine,
+            folders,
+            iter_pages,
+            atask,
+            list_workers=args.list_workers,
+            session_workers=args.workers,
+            queue_size=args.queue_size or args.workers * 4,
+            unlisted=unlisted,
+        )
+    elif args.pipeline:
+        log(f"📋 streaming sessions from {len(folders)} {source}\n")
+        total = ""
+        results = run_pipeline(
+            folders,
+            iter_pages,
+            task,
+            list_workers=args.list_workers,
+            session_workers=args.workers,
+            queue_size=args.queue_size or args.workers * 4,
+            unlisted=unlisted,
+        )
+    else:
+        session_prefixes = collect_jobs(folders, iter_pages)
+        if metrics is not None:
+            metrics.total = len(session_prefixes)
+        log(f"\n📋 {len(session_prefixes)} field session folders to inspect\n")
+        total = f"/{len(session_prefixes)}"
+        results = run_batch(task, session_prefixes, args.workers)
+
     done = 0
-    with ThreadPoolExecutor(max_workers=args.workers) as pool:
-        futures = {pool.submit(task, p): p for p in session_prefixes}
-        for fut in as_completed(futures):
-            prefix, result = fut.result()
-            bucket_key = result if result in counts else "failed:other"
-            if bucket_key not in counts:
-                counts[bucket_key] = 0
-            counts[bucket_key] += 1
-            done += 1
-            if result == "moved" and (done <= 10 or done % 50 == 0):
-                log(f"   ✅ [{done}/{len(session_prefixes)}] {prefix.split('/')[-2]}")
-            elif result.startswith("failed") and done <= 30:
-                log(f"   ⚠️ {prefix}: {result}")
+    for prefix, result in results:
+        bucket_key = result if result in counts else "failed:other"
+        if bucket_key not in counts:
+            counts[bucket_key] = 0
+        counts[bucket_key] += 1
+        if metrics is not None:
+            metrics.session_done(result)
+        done += 1
+        if result == "moved" and (done <= 10 or done % 50 == 0):
+            log(f"   ✅ [{done}{total}] {prefix.split('/')[-2]}")
+        elif result.startswith("failed") and done <= 30:
+            log(f"   ⚠️ {prefix}: {result}")
+
+    if reader is not None:
+        counts["keep_field"] += kept_by_index[0]
+        log(f"\n   Candidates: {reader.describe()}; {kept_by_index[0]} kept in Field without S3 reads")
+    if journal:
+        journal.close()
+    if engine is not None:
+        engine.close()
+    if controller is not None:
+        log(f"\n   Adaptive limits: {controller.describe()}")
+    if index is not None:
+        index.close()
+        log(f"\n   Session {index.describe()}")
+    if cache is not None:
+        log(f"\n   Metadata cache: {cache.describe()}")
+    if reporter is not None:
+        reporter.close()
 
     moved = counts["moved"] + counts["would_move"]
     log(
@@ -346,12 +1508,19 @@ def main() -> int:
         f"{'moved' if execute else 'would move'} {moved}, "
         f"already moved {counts['skipped:already_at_target']}, "
         f"no metadata {counts['skipped:no_metadata']}, "
-        f"failed {counts['failed:bad_prefix'] + counts['failed:empty']}\n"
+        f"failed {counts['failed:bad_prefix'] + counts['failed:empty'] + counts['failed:error']}\n"
     )
 
-    if execute and moved > 0:
+    if execute and moved > 0 and index is None:
         log("Next: AWS_DYNAMODB_SESSIONS_TABLE=amr-sessions npm run backfill:dynamo-sessions\n")
-
+    elif index is not None and index.counts["missing"]:
+        log("Next: backfill the sessions listed as not indexed (npm run backfill:dynamo-sessions)\n")
+
+    if unlisted:
+        log(f"❌ {len(unlisted)} {source} could not be listed; their sessions were not inspected:")
+        for folder in sorted(unlisted):
+            log(f"   {folder}")
+        return 1
     return 0
 
 
@@ -2,26 +2,53 @@
 """
 Re-label capture_location.place_label using neighborhood · city format.
 
-Uses OpenStreetMap Nominatim (rate-limited). Updates S3 metadata.json + DynamoDB index.
+Uses OpenStreetMap Nominatim (rate-limited). Updates S3 metadata.json + DynamoDB index
+(AWS_DYNAMODB_SESSIONS_TABLE) as each session is written.
+
+Options:
+  --limit N                   stop after N relabels; reads stop there too (0 = all)
+  --read-workers N            metadata reads ahead of the geocoder (boto3 engine)
+  --write-workers N           label writes and index updates in flight (boto3 engine)
+  --engine asyncio            batched metadata reads/writes on one event loop and pool
+  --list-shards N             list each prefix as N session-id key ranges at once
+  --inventory PATH            metadata.json keys from a local S3 Inventory instead of LIST calls
+  --from-index                select candidates from the session index instead of S3
+  --metadata-cache DIR        ETag-keyed on-disk metadata.json cache
+  --geocode-cache PATH        SQLite reverse-geocode cache per --geocode-precision grid cell
+  --geocoder offline          resolve from a local --places dataset with NumPy, no network
+  --propagate-labels          reuse the label of a labelled session within --propagate-meters
+  --metrics PATH              periodic JSON metrics (--prometheus-textfile for node_exporter)
 
 Usage:
   python3 scripts/relabel_capture_locations.py --dry-run
   python3 scripts/relabel_capture_locations.py --execute
   AWS_DYNAMODB_SESSIONS_TABLE=amr-sessions python3 scripts/relabel_capture_locations.py --execute --limit 200
+  python3 scripts/relabel_capture_locations.py --dry-run --engine asyncio --list-shards 16
+  python3 scripts/relabel_capture_locations.py --execute --geocoder offline --places data/bay-area-neighbourhoods.geojson
+  python3 scripts/relabel_capture_locations.py --execute --propagate-labels --propagate-meters 100
+  AWS_DYNAMODB_SESSIONS_TABLE=amr-sessions python3 scripts/relabel_capture_locations.py --execute --from-index
 """
 from __future__ import annotations
 
 import argparse
+import itertools
 import json
 import os
+import threading
 import time
 import urllib.parse
 import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
 
 import boto3
 from botocore.config import Config
 
+from amr_ops.listing import list_pages
+
 REPO_ROOT = Path(__file__).resolve().parent.parent
 ENV_SRC = REPO_ROOT / "src" / ".env"
 
@@ -108,29 +135,360 @@ def needs_relabel(place_label: str | None) -> bool:
     return " · " not in place_label
 
 
-def iter_metadata_keys(s3, bucket: str, prefixes: list[str]):
+def iter_metadata_keys(
+    s3, bucket: str, prefixes: list[str], engine=None, shards: int = 1
+) -> Iterator[tuple[str, str | None]]:
+    """Yield ``(key, etag)`` for every metadata.json under ``prefixes``, in key order per prefix."""
+    client = engine.blocking_client() if engine is not None else s3
     for prefix in prefixes:
-        token = None
-        while True:
-            kwargs = {"Bucket": bucket, "Prefix": prefix, "MaxKeys": 500}
-            if token:
-                kwargs["ContinuationToken"] = token
-            resp = s3.list_objects_v2(**kwargs)
+        for resp in list_pages(client, bucket, prefix, shards=shards, page_size=500):
             for obj in resp.get("Contents") or []:
                 key = obj["Key"]
                 if key.endswith("metadata.json"):
-                    yield key
-            if not resp.get("IsTruncated"):
-                break
-            token = resp.get("NextContinuationToken")
+                    yield key, obj.get("ETag")
+
+
+def iter_index_metadata_keys(
+    reader, jobs: list[str], prefixes: list[str], donors: list[tuple[float, float, str]] | None = None
+) -> Iterator[tuple[str, str | None]]:
+    """
+    Yield ``(key, None)`` for indexed sessions under ``prefixes`` whose indexed
+    capture_location has coordinates and needs a relabel. Already-labelled sessions are
+    appended to ``donors`` as ``(lat, lon, label)`` when a list is given.
+    """
+    for item in reader.items(jobs, projection=("s3_session_prefix", "capture_location")):
+        prefix = item.get("s3_session_prefix") or ""
+        if not prefix.endswith("/"):
+            prefix += "/"
+        if not any(prefix.startswith(p) for p in prefixes):
+            continue
+        loc = item.get("capture_location") or {}
+        point = capture_point({"capture_location": loc})
+        if point is None:
+            continue
+        label = loc.get("place_label")
+        if needs_relabel(label):
+            yield f"{prefix}metadata.json", None
+        elif donors is not None:
+            donors.append((*point, label.strip()))
+
+
+def iter_metadata(
+    s3,
+    bucket: str,
+    keys: Iterable[tuple[str, str | None]],
+    engine=None,
+    batch_size: int = 500,
+    cache=None,
+    workers: int = 1,
+) -> Iterator[tuple[str, Any]]:
+    """
+    Yield ``(key, metadata)`` per ``(key, etag)``, in listing order; metadata is the
+    exception when the read failed. With an asyncio engine, each batch of
+    ``batch_size`` GETs is issued concurrently; otherwise ``workers`` threads read up
+    to ``workers * 4`` objects ahead of the consumer. With a cache, entries whose ETag
+    matches the listing skip the GET.
+    """
+    if engine is None:
+
+        def read(key: str, etag: str | None) -> Any:
+            try:
+                if cache is not None:
+                    meta = cache.read_json(s3, bucket, key, etag)
+                    return FileNotFoundError(key) if meta is None else meta
+                return json.loads(s3.get_object(Bucket=bucket, Key=key)["Body"].read())
+            except Exception as exc:
+                return exc
+
+        if workers <= 1:
+            for key, etag in keys:
+                yield key, read(key, etag)
+            return
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="read")
+        ahead: deque = deque()
+        it = iter(keys)
+        try:
+            while True:
+                while len(ahead) < workers * 4 and (item := next(it, None)) is not None:
+                    ahead.append((item[0], pool.submit(read, *item)))
+                if not ahead:
+                    break
+                key, future = ahead.popleft()
+                yield key, future.result()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        return
+    it = iter(keys)
+    while batch := list(itertools.islice(it, batch_size)):
+        if cache is not None:
+            metas = engine.map(lambda item: cache.read_json_async(engine.s3, bucket, *item), batch)
+        else:
+            metas = engine.get_json_many(bucket, [key for key, _etag in batch])
+        for (key, _etag), meta in zip(batch, metas):
+            yield key, FileNotFoundError(key) if meta is None else meta
+
+
+class MetadataWriter:
+    """
+    Writes relabelled metadata.json (then its index item) in the background. With a
+    boto3 client, ``workers`` threads each PUT one object; with an asyncio ``engine``,
+    each ``batch_size`` writes go out as one concurrent batch on the engine's loop while
+    the caller moves on. Either way at most a few batches' worth are queued.
+    """
+
+    def __init__(
+        self, s3, bucket: str, *, workers: int = 8, engine=None, batch_size: int = 500, on_written=None
+    ) -> None:
+        self.s3 = s3
+        self.bucket = bucket
+        self.engine = engine
+        self.batch_size = max(1, batch_size)
+        self.on_written = on_written
+        self.written = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._batch: list[tuple[str, dict]] = []
+        if engine is not None:
+            # One batch being written, one waiting; the caller blocks only beyond that.
+            workers = 1
+            self._slots = threading.BoundedSemaphore(2)
+        else:
+            self._slots = threading.BoundedSemaphore(max(1, workers) * 4)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="write")
+
+    def _done(self, key: str, meta: dict, exc: BaseException | None) -> None:
+        if exc is None and self.on_written is not None:
+            try:
+                self.on_written(key, meta)
+            except Exception as callback_exc:
+                exc = callback_exc
+        with self._lock:
+            if exc is None:
+                self.written += 1
+            else:
+                self.failed += 1
+        if exc is not None:
+            print(f"  ⚠️ write {key}: {exc}", flush=True)
+
+    def _write(self, key: str, meta: dict) -> None:
+        try:
+            self.s3.put_object(
+                Bucket=self.bucket,
+                Key=key,
+                Body=json.dumps(meta, indent=2).encode("utf-8"),
+                ContentType="application/json; charset=utf-8",
+            )
+        except Exception as exc:
+            self._done(key, meta, exc)
+        else:
+            self._done(key, meta, None)
+        finally:
+            self._slots.release()
+
+    def _write_batch(self, batch: list[tuple[str, dict]]) -> None:
+        try:
+            for (key, meta), err in zip(batch, self.engine.put_json_many(self.bucket, batch)):
+                self._done(key, meta, err)
+        finally:
+            self._slots.release()
+
+    def _flush(self) -> None:
+        if self._batch:
+            batch, self._batch = self._batch, []
+            self._slots.acquire()
+            self._pool.submit(self._write_batch, batch)
+
+    def submit(self, key: str, meta: dict) -> None:
+        if self.engine is not None:
+            self._batch.append((key, meta))
+            if len(self._batch) >= self.batch_size:
+                self._flush()
+            return
+        self._slots.acquire()
+        self._pool.submit(self._write, key, meta)
+
+    def close(self) -> None:
+        """Write any partial batch and wait for every queued write."""
+        self._flush()
+        self._pool.shutdown(wait=True)
+
+
+def capture_point(meta: Any) -> tuple[float, float] | None:
+    if isinstance(meta, BaseException):
+        return None
+    loc = meta.get("capture_location") or {}
+    lat, lon = loc.get("latitude"), loc.get("longitude")
+    if not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
+        return None
+    return float(lat), float(lon)
+
+
+def propagate_labels(
+    items: Iterable[tuple[str, Any]],
+    max_meters: float,
+    inherited: dict[str, tuple[str, float]],
+    reread: Callable[[Iterable[tuple[str, str | None]]], Iterator[tuple[str, Any]]],
+    donors: Iterable[tuple[float, float, str]] = (),
+) -> Iterator[tuple[str, Any]]:
+    """
+    Yield each session as it is read, except relabel candidates with coordinates: only
+    their keys and points are kept. Once ``items`` is exhausted, the labelled sessions
+    (plus any extra ``donors`` ``(lat, lon, label)``, which are only consumed then) form
+    one donor index; each candidate's nearest donor within ``max_meters`` is recorded in
+    ``inherited`` (key → (label, meters)). The candidates are then read again through
+    ``reread`` and streamed on, so geocoding and writes overlap with those reads.
+    """
+    from amr_ops.spatial import PointIndex
+
+    candidates: list[str] = []
+    candidate_lats: list[float] = []
+    candidate_lons: list[float] = []
+    donor_lats: list[float] = []
+    donor_lons: list[float] = []
+    donor_labels: list[str] = []
+    for key, meta in items:
+        point = capture_point(meta)
+        if point is None:
+            yield key, meta
+            continue
+        label = (meta.get("capture_location") or {}).get("place_label")
+        if needs_relabel(label):
+            candidates.append(key)
+            candidate_lats.append(point[0])
+            candidate_lons.append(point[1])
+            continue
+        donor_lats.append(point[0])
+        donor_lons.append(point[1])
+        donor_labels.append(label.strip())
+        yield key, meta
+    for lat, lon, label in donors:
+        donor_lats.append(lat)
+        donor_lons.append(lon)
+        donor_labels.append(label)
+    if candidates and donor_labels:
+        donor_index = PointIndex(donor_lats, donor_lons)
+        nearest, meters = donor_index.nearest(candidate_lats, candidate_lons, max_meters)
+        for key, idx, dist in zip(candidates, nearest, meters):
+            if idx >= 0:
+                inherited[key] = (donor_labels[idx], float(dist))
+    yield from reread((key, None) for key in candidates)
+
+
+def prefetch_places(
+    items: Iterable[tuple[str, Any]], geocache, geocode_many, batch_size: int, skip: dict | None = None
+) -> Iterator[tuple[str, Any]]:
+    """
+    Pass ``(key, metadata)`` through, geocoding each batch's uncached cells in one call
+    (sessions in ``skip`` already have a label and are left out).
+    """
+    it = iter(items)
+    while batch := list(itertools.islice(it, batch_size)):
+        coords = []
+        for key, meta in batch:
+            point = capture_point(meta)
+            if point is None or (skip and key in skip):
+                continue
+            if needs_relabel((meta.get("capture_location") or {}).get("place_label")):
+                coords.append(point)
+        if coords:
+            geocache.prefetch(coords, geocode_many)
+        yield from batch
 
 
 def main() -> int:
     parser = argparse.ArgumentParser()
     parser.add_argument("--execute", action="store_true")
     parser.add_argument("--dry-run", action="store_true")
-    parser.add_argument("--limit", type=int, default=0, help="Max sessions to process (0 = all)")
+    parser.add_argument("--limit", type=int, default=0, help="Max sessions to relabel (0 = all)")
+    parser.add_argument(
+        "--engine",
+        choices=("boto3", "asyncio"),
+        default="boto3",
+        help="asyncio: concurrent metadata reads/writes on one pool (needs aiobotocore)",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=500, help="Concurrent metadata reads/writes per batch (asyncio)"
+    )
+    parser.add_argument(
+        "--read-workers", type=int, default=16, help="Concurrent metadata reads ahead of the geocoder (boto3)"
+    )
+    parser.add_argument("--write-workers", type=int, default=8, help="Concurrent label writes (boto3)")
+    parser.add_argument("--index-workers", type=int, default=16, help="Concurrent session index updates")
+    parser.add_argument(
+        "--list-shards", type=int, default=1, help="Session-id key ranges listed concurrently per prefix"
+    )
+    parser.add_argument(
+        "--metadata-cache",
+        type=Path,
+        default=os.environ.get("AMR_METADATA_CACHE") or None,
+        help="Directory for the ETag-keyed metadata.json cache (default: AMR_METADATA_CACHE)",
+    )
+    parser.add_argument("--metadata-cache-mb", type=int, default=512, help="Metadata cache size bound")
+    parser.add_argument(
+        "--geocode-cache",
+        type=Path,
+        default=os.environ.get("AMR_GEOCODE_CACHE") or Path.home() / ".cache" / "amr-ops" / "geocode.sqlite",
+        help="SQLite reverse-geocode cache (default: AMR_GEOCODE_CACHE or ~/.cache/amr-ops/geocode.sqlite)",
+    )
+    parser.add_argument("--no-geocode-cache", action="store_true", help="Only dedup cells within this run")
+    parser.add_argument(
+        "--geocode-precision", type=int, default=3, help="Decimal places of the lat/lon cell grid (3 ≈ 110 m)"
+    )
+    parser.add_argument(
+        "--geocoder",
+        choices=("nominatim", "offline"),
+        default="nominatim",
+        help="offline: resolve from a local place dataset (--places) in NumPy batches",
+    )
+    parser.add_argument(
+        "--places",
+        type=Path,
+        default=os.environ.get("AMR_PLACES_DATASET") or None,
+        help="GeoJSON/CSV place dataset for --geocoder offline (default: AMR_PLACES_DATASET)",
+    )
+    parser.add_argument(
+        "--places-max-km", type=float, default=10.0, help="Max distance to a place centroid (offline)"
+    )
+    parser.add_argument(
+        "--propagate-labels",
+        action="store_true",
+        help="Give unlabelled sessions the label of a nearby already-labelled session (needs numpy)",
+    )
+    parser.add_argument(
+        "--propagate-meters", type=float, default=150.0, help="Max distance to the labelled neighbour"
+    )
+    parser.add_argument(
+        "--inventory",
+        type=Path,
+        default=None,
+        help="List metadata.json keys from a local S3 Inventory (manifest.json, delivery dir or CSV/Parquet file)",
+    )
+    parser.add_argument(
+        "--from-index",
+        action="store_true",
+        help="Select candidates from the session index (AWS_DYNAMODB_SESSIONS_TABLE) instead of listing S3",
+    )
+    parser.add_argument(
+        "--index-scan-segments",
+        type=int,
+        default=0,
+        help="With --from-index: parallel Scan with this many segments instead of gsi1 Queries",
+    )
+    parser.add_argument("--metrics", metavar="PATH", help="Append periodic JSON metrics lines here ('-' = stderr)")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="Seconds between metrics snapshots")
+    parser.add_argument("--prometheus-textfile", metavar="PATH", help="Rewrite this Prometheus textfile each interval")
     args = parser.parse_args()
+    if args.geocoder == "offline" and not args.places:
+        parser.error("--geocoder offline needs --places (or AMR_PLACES_DATASET)")
+    if args.list_shards < 1:
+        parser.error("--list-shards must be at least 1")
+    if args.from_index and args.inventory:
+        parser.error("--from-index and --inventory are both candidate sources; pick one")
+    if args.geocoder == "offline" or args.propagate_labels:
+        try:
+            import amr_ops.spatial  # noqa: F401
+        except ImportError as exc:
+            raise SystemExit(str(exc)) from None
 
     execute = args.execute and not args.dry_run
     load_dotenv(ENV_SRC)
@@ -143,7 +501,76 @@ def main() -> int:
         for key in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN"):
             os.environ.pop(key, None)
 
-    s3 = boto3.client("s3", region_name=region, config=Config(max_pool_connections=20))
+    metrics = reporter = None
+    if args.metrics or args.prometheus_textfile:
+        from amr_ops.metrics import Metrics, MeteredClient, MetricsReporter
+
+        metrics = Metrics("relabel")
+        reporter = MetricsReporter(
+            metrics, jsonl=args.metrics, textfile=args.prometheus_textfile, interval=args.metrics_interval
+        )
+
+    s3 = boto3.client(
+        "s3",
+        region_name=region,
+        config=Config(max_pool_connections=max(20, args.read_workers + args.write_workers + args.list_shards)),
+    )
+    if metrics is not None:
+        s3 = MeteredClient(s3, metrics)
+    engine = None
+    if args.engine == "asyncio":
+        from amr_ops.aio_s3 import S3Engine
+
+        engine = S3Engine(region=region, max_connections=max(16, args.batch_size + args.list_shards), metrics=metrics)
+    cache = None
+    if args.metadata_cache:
+        from amr_ops.meta_cache import MetadataCache
+
+        cache = MetadataCache(args.metadata_cache.expanduser(), max_bytes=args.metadata_cache_mb * 1024 * 1024)
+    index = None
+    if execute and table:
+        from amr_ops.session_index import SessionIndexWriter, session_id_for
+
+        index = SessionIndexWriter(table, region=region, workers=args.index_workers, metrics=metrics)
+
+    geocoder = None
+    if args.geocoder == "offline":
+        from amr_ops.offline_geocode import OfflineGeocoder
+
+        geocoder = OfflineGeocoder(args.places, max_meters=args.places_max_km * 1000)
+        print(f"Offline geocoder: {geocoder.describe()}")
+
+    from amr_ops.geocache import GeocodeCache
+
+    geocache = GeocodeCache(
+        None if args.no_geocode_cache else args.geocode_cache,
+        precision=args.geocode_precision,
+        source=geocoder.source if geocoder is not None else "nominatim",
+    )
+    last_geocode = 0.0
+
+    def offline(lats: list[float], lons: list[float]) -> list[tuple[str | None, str | None, str | None]]:
+        with metrics.timer("GEOCODE") if metrics is not None else nullcontext():
+            return geocoder.lookup_many(lats, lons)
+
+    def nominatim(lat: float, lon: float) -> tuple[str | None, str | None, str | None]:
+        nonlocal last_geocode
+        elapsed = time.time() - last_geocode
+        if elapsed < 1.1:
+            time.sleep(1.1 - elapsed)
+        last_geocode = time.time()
+        with metrics.timer("GEOCODE") if metrics is not None else nullcontext():
+            return reverse_geocode(lat, lon)
+
+    def tally(result: str) -> None:
+        if metrics is not None:
+            metrics.session_done(result)
+
+    def written(key: str, meta: dict) -> None:
+        if index is not None:
+            sid = session_id_for(meta, key[: -len("metadata.json")])
+            index.set_capture_location(sid, meta["capture_location"])
+        tally("updated")
 
     prefixes = [
         "1000/s_correct/",
@@ -155,23 +582,73 @@ def main() -> int:
     ]
 
     scanned = 0
-    updated = 0
+    relabelled = 0
     skipped = 0
     failed = 0
-    last_geocode = 0.0
 
     print(f"\n{'EXECUTE' if execute else 'DRY RUN'} — relabel capture locations\n")
 
-    for key in iter_metadata_keys(s3, bucket, prefixes):
-        if args.limit and scanned >= args.limit:
-            break
+    reader = None
+    index_donors: list[tuple[float, float, str]] = []
+    if args.from_index:
+        if not table:
+            parser.error("--from-index needs AWS_DYNAMODB_SESSIONS_TABLE")
+        from amr_ops.session_index import (
+            SessionIndexReader,
+            build_gsi1_pk,
+            infer_status_and_source,
+            work_type_hint_from_prefix,
+        )
+
+        reader = SessionIndexReader(table, region=region, metrics=metrics)
+        if args.index_scan_segments:
+            jobs = reader.scan_jobs(args.index_scan_segments)
+        else:
+            partitions = []
+            for prefix in prefixes:
+                status, source = infer_status_and_source(f"{prefix}session/")
+                pk = build_gsi1_pk(work_type_hint_from_prefix(prefix), status, source)
+                if pk not in partitions:
+                    partitions.append(pk)
+            jobs = reader.query_jobs(partitions)
+        keys = iter_index_metadata_keys(
+            reader, jobs, prefixes, index_donors if args.propagate_labels else None
+        )
+    elif args.inventory:
+        from amr_ops.inventory import InventoryListing
+
+        inventory = InventoryListing(args.inventory, bucket=bucket, prefixes=prefixes)
+        print(f"Listing: {inventory.describe()}\n")
+        keys = iter_metadata_keys(inventory, bucket, prefixes, None, args.list_shards)
+    else:
+        keys = iter_metadata_keys(s3, bucket, prefixes, engine, args.list_shards)
+
+    writer = None
+    if execute:
+        writer = MetadataWriter(
+            s3, bucket, workers=args.write_workers, engine=engine, batch_size=args.batch_size, on_written=written
+        )
+
+    items = iter_metadata(s3, bucket, keys, engine, args.batch_size, cache, workers=args.read_workers)
+    inherited: dict[str, tuple[str, float]] = {}
+    propagated = 0
+    if args.propagate_labels:
+
+        def reread(candidates: Iterable[tuple[str, str | None]]) -> Iterator[tuple[str, Any]]:
+            return iter_metadata(s3, bucket, candidates, engine, args.batch_size, cache, workers=args.read_workers)
+
+        items = propagate_labels(items, args.propagate_meters, inherited, reread, index_donors)
+    geocode = nominatim
+    if geocoder is not None:
+        items = prefetch_places(items, geocache, offline, args.batch_size, skip=inherited)
+        geocode = lambda lat, lon: offline([lat], [lon])[0]  # noqa: E731
+
+    for key, meta in items:
         scanned += 1
-
-        try:
-            meta = json.loads(s3.get_object(Bucket=bucket, Key=key)["Body"].read())
-        except Exception as exc:
+        if isinstance(meta, BaseException):
             failed += 1
-            print(f"  ⚠️ read {key}: {exc}")
+            tally("failed")
+            print(f"  ⚠️ read {key}: {meta}")
             continue
 
         loc = meta.get("capture_location") or {}
@@ -181,52 +658,77 @@ def main() -> int:
 
         if not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
             skipped += 1
+            tally("skipped")
             continue
         if not needs_relabel(old_label):
             skipped += 1
+            tally("skipped")
             continue
 
-        elapsed = time.time() - last_geocode
-        if elapsed < 1.1:
-            time.sleep(1.1 - elapsed)
-        last_geocode = time.time()
-
         try:
-            area, city, state = reverse_geocode(float(lat), float(lon))
-            new_label = format_place_label(area, city, state)
+            if key in inherited:
+                new_label, _meters = inherited[key]
+                propagated += 1
+            else:
+                area, city, state = geocache.lookup(float(lat), float(lon), geocode)
+                new_label = format_place_label(area, city, state)
         except Exception as exc:
             failed += 1
+            tally("failed")
             print(f"  ⚠️ geocode {meta.get('session_id', key)}: {exc}")
             continue
 
         if not new_label:
             skipped += 1
+            tally("skipped")
             continue
 
         old_key = filter_area_key(old_label or "")
         new_key = filter_area_key(new_label)
         if old_key.lower() == new_key.lower() and old_label and " · " in old_label:
             skipped += 1
+            tally("skipped")
             continue
 
         if execute:
             loc["place_label"] = new_label
             meta["capture_location"] = loc
-            s3.put_object(
-                Bucket=bucket,
-                Key=key,
-                Body=json.dumps(meta, indent=2).encode("utf-8"),
-                ContentType="application/json; charset=utf-8",
-            )
+            writer.submit(key, meta)
+        else:
+            tally("would_update")
 
-        updated += 1
-        if updated <= 15 or updated % 25 == 0:
+        relabelled += 1
+        if relabelled <= 15 or relabelled % 25 == 0:
             print(f"  {'✅' if execute else '↪'} {meta.get('session_id', key)}")
             print(f"      {old_label!r} → {new_label!r}")
+        if args.limit and relabelled >= args.limit:
+            print(f"\n  Reached --limit {args.limit}")
+            break
+
+    items.close()
+    updated = relabelled
+    if writer is not None:
+        writer.close()
+        updated, failed = writer.written, failed + writer.failed
+    if engine is not None:
+        engine.close()
 
     print(f"\nDone: scanned {scanned}, {'updated' if execute else 'would update'} {updated}, skipped {skipped}, failed {failed}\n")
-    if execute and updated > 0 and table:
-        print(f"Next: AWS_DYNAMODB_SESSIONS_TABLE={table} npm run backfill:dynamo-sessions\n")
+    if args.propagate_labels:
+        print(f"Propagated: {propagated} labels from labelled sessions within {args.propagate_meters:g} m\n")
+    if reader is not None:
+        print(f"Candidates: {reader.describe()}\n")
+    print(f"Geocode: {geocache.describe()}\n")
+    geocache.close()
+    if cache is not None:
+        print(f"Metadata cache: {cache.describe()}\n")
+    if index is not None:
+        index.close()
+        print(f"Session {index.describe()}\n")
+        if index.counts["missing"]:
+            print(f"Next: AWS_DYNAMODB_SESSIONS_TABLE={table} npm run backfill:dynamo-sessions (not indexed sessions)\n")
+    if reporter is not None:
+        reporter.close()
     return 0
 
 
@@ -0,0 +1,51 @@
+"""
+Shared fixtures for the ops script tests: an in-memory S3 stand-in (amr_ops/s3_standin.py)
+and boto3 clients pointed at it.
+
+  pip install -r scripts/requirements-test.txt
+  python -m pytest scripts/tests
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parents[1]
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+from amr_ops.s3_standin import S3StandIn  # noqa: E402
+
+BUCKET = "meter-reader-training-feedback"
+
+
+@pytest.fixture(scope="session")
+def _standin_server():
+    with S3StandIn() as st:
+        yield st
+
+
+@pytest.fixture
+def standin(_standin_server):
+    """The session's stand-in with an empty BUCKET and fresh request stats."""
+    _standin_server.store.buckets.clear()
+    _standin_server.store.create_bucket(BUCKET)
+    _standin_server.server.reset_stats()
+    return _standin_server
+
+
+@pytest.fixture
+def s3(standin):
+    boto3 = pytest.importorskip("boto3")
+    from botocore.config import Config
+
+    return boto3.client(
+        "s3",
+        endpoint_url=standin.url,
+        region_name="us-east-1",
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+        config=Config(retries={"total_max_attempts": 1, "mode": "standard"}, max_pool_connections=32),
+    )
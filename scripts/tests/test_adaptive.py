@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+from botocore.exceptions import ClientError
+
+from amr_ops.adaptive import AdaptiveClient, AdaptiveController, AimdLimiter, is_throttle, is_transient
+from amr_ops.s3_standin import S3Error
+from conftest import BUCKET
+
+
+def fail_first(standin, monkeypatch, method: str, errors: list[S3Error]) -> list[str]:
+    """Answer the first ``len(errors)`` ``method`` requests with ``errors``, in order."""
+    seen: list[str] = []
+    lock = threading.Lock()
+
+    def before_request(m, bucket, key, query):
+        if m != method:
+            return
+        with lock:
+            seen.append(key)
+            attempt = len(seen)
+        if attempt <= len(errors):
+            raise errors[attempt - 1]
+
+    monkeypatch.setattr(standin.server, "before_request", before_request)
+    return seen
+
+
+def adaptive(s3, **kwargs) -> tuple[AdaptiveClient, AdaptiveController]:
+    controller = AdaptiveController({"COPY": 8, "GET": 8}, base_backoff=0.001, **kwargs)
+    return AdaptiveClient(s3, controller), controller
+
+
+@pytest.mark.parametrize(
+    "error",
+    [S3Error(500, "InternalError", "injected"), S3Error(503, "SlowDown", "injected")],
+    ids=["internal-error", "slow-down"],
+)
+def test_adaptive_copy_retries_transient_errors(standin, s3, monkeypatch, error):
+    standin.store.put(BUCKET, "a/image.jpg", b"\xff\xd8 body")
+    client, controller = adaptive(s3)
+    seen = fail_first(standin, monkeypatch, "PUT", [error, error])
+
+    client.copy_object(Bucket=BUCKET, CopySource={"Bucket": BUCKET, "Key": "a/image.jpg"}, Key="b/image.jpg")
+
+    assert standin.store.get(BUCKET, "b/image.jpg").body == b"\xff\xd8 body"
+    assert len(seen) == 3
+    # Only throttles count against the limit.
+    assert controller.limiter("COPY").throttles == (2 if error.code == "SlowDown" else 0)
+
+
+def test_adaptive_call_gives_up_after_max_retries(standin, s3, monkeypatch):
+    standin.store.put(BUCKET, "a/image.jpg", b"body")
+    client, _ = adaptive(s3, max_retries=2)
+    seen = fail_first(standin, monkeypatch, "GET", [S3Error(500, "InternalError", "injected")] * 5)
+
+    with pytest.raises(ClientError, match="InternalError"):
+        client.get_object(Bucket=BUCKET, Key="a/image.jpg")
+    assert len(seen) == 3
+
+
+def test_adaptive_call_does_not_retry_client_errors(standin, s3, monkeypatch):
+    client, _ = adaptive(s3)
+    seen = fail_first(standin, monkeypatch, "GET", [])
+
+    with pytest.raises(ClientError, match="NoSuchKey"):
+        client.get_object(Bucket=BUCKET, Key="missing.jpg")
+    assert len(seen) == 1
+
+
+def test_error_classification():
+    def client_error(status: int, code: str) -> ClientError:
+        return ClientError({"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}}, "GetObject")
+
+    assert is_throttle(client_error(503, "SlowDown")) and is_transient(client_error(503, "SlowDown"))
+    assert not is_throttle(client_error(500, "InternalError")) and is_transient(client_error(500, "InternalError"))
+    assert not is_transient(client_error(403, "AccessDenied"))
+    assert not is_transient(ValueError("not an S3 error"))
+
+
+def test_aimd_limiter_grows_per_round_trip_and_halves_on_throttle():
+    limiter = AimdLimiter("GET", initial=2, maximum=4)
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release(0.01)
+    assert limiter.capacity == 3
+
+    limiter.acquire()
+    limiter.release(None, throttled=True)
+    assert limiter.capacity == 1
+    # A second throttle from the same window does not shrink the limit again.
+    limiter.acquire()
+    limiter.release(None, throttled=True)
+    assert (limiter.capacity, limiter.throttles) == (1, 2)
+
+
+def test_aimd_limiter_holds_while_latency_is_high():
+    limiter = AimdLimiter("GET", initial=1, maximum=8, latency_ratio=2.0)
+    limiter.acquire()
+    limiter.release(0.01)
+    assert limiter.capacity == 2
+    for _ in range(10):
+        limiter.acquire()
+        limiter.release(1.0)
+    assert limiter.capacity < 4
+
+
+def test_aimd_limiter_blocks_at_capacity_until_release():
+    limiter = AimdLimiter("GET", initial=1, maximum=1)
+    limiter.acquire()
+    acquired = threading.Event()
+    waiter = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+    waiter.start()
+    assert not acquired.wait(0.05)
+    limiter.release(0.01)
+    assert acquired.wait(1)
+    waiter.join()
+    assert limiter.inflight == 1
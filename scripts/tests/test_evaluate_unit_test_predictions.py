@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from evaluate_unit_test_predictions import evaluate  # noqa: E402
+
+PREFIX = "1000/unit_test_images/"
+
+
+def run(expected: list[str], predicted: list[str], *, dials: int = 4, **columns: list[str]) -> dict:
+    keys = [f"{PREFIX}{i}_{reading}.jpeg" for i, reading in enumerate(expected)]
+    manifest = {
+        "s3_key": np.array(keys),
+        "image_file_name": np.array([k.rsplit("/", 1)[-1] for k in keys]),
+        "expected_meter_value": np.array(expected),
+        "difficulty": np.array(["d1"] * len(keys)),
+    }
+    predictions = {"s3_key": np.array(keys), "predicted_reading": np.array(predicted)}
+    predictions.update({name: np.array(values) for name, values in columns.items()})
+    return evaluate(manifest, predictions, dials=dials, prefix_depth=2)
+
+
+def dial_correct(result: dict) -> list[int]:
+    return [stat["correct"] for stat in result["dialStats"]]
+
+
+def test_dial_4_may_lag_its_expected_digit():
+    result = run(["1234"], ["1233"])
+    assert dial_correct(result) == [1, 1, 1, 1]
+    assert result["summary"]["correct"] == 0  # the reading itself still differs
+
+
+def test_dial_4_ahead_of_expected_is_wrong():
+    assert dial_correct(run(["1234"], ["1235"])) == [1, 1, 1, 0]
+
+
+def test_only_dial_4_may_lag():
+    assert dial_correct(run(["1234"], ["1134"])) == [1, 0, 1, 1]
+    assert dial_correct(run(["12345"], ["12335"], dials=5)) == [1, 1, 1, 1, 1]
+    assert dial_correct(run(["12345"], ["12344"], dials=5)) == [1, 1, 1, 1, 0]
+
+
+def test_explicit_digit_match_overrides_lag_rule():
+    result = run(["1234", "1234"], ["1233", "1233"], dial4_digit_match=["false", ""])
+    assert dial_correct(result) == [2, 2, 2, 1]
+
+
+def test_lag_rule_needs_a_predicted_digit():
+    result = run(["1234", "1234"], ["", "1230"])
+    assert result["dialStats"][3]["withGroundTruth"] == 2
+    assert dial_correct(result) == [1, 1, 1, 1]
+
+
+def test_predicted_digit_cells_parse_like_parse_int():
+    result = run(["1234"] * 6, [""] * 6, dial1_predicted_digit=["01", "+1", "1.0", " 1x", "10", "-1"])
+    assert result["dialStats"][0]["correct"] == 4
+
+
+def empty(*names: str) -> dict:
+    return {name: np.array([], dtype=str) for name in names}
+
+
+@pytest.mark.parametrize(
+    "manifest, predictions",
+    [
+        (  # keys from another prefix
+            {"s3_key": np.array([f"{PREFIX}0_1234.jpeg"]), "expected_meter_value": np.array(["1234"])},
+            {"s3_key": np.array(["2000/unit_test_images/0_1234.jpeg"]), "predicted_reading": np.array(["1234"])},
+        ),
+        (  # empty predictions file
+            {"s3_key": np.array([f"{PREFIX}0_1234.jpeg"]), "expected_meter_value": np.array(["1234"])},
+            empty("s3_key", "predicted_reading", "dial1_predicted_digit"),
+        ),
+        (  # empty manifest
+            empty("s3_key", "image_file_name", "expected_meter_value"),
+            {"s3_key": np.array([f"{PREFIX}0_1234.jpeg"]), "predicted_reading": np.array(["1234"])},
+        ),
+    ],
+    ids=["foreign-keys", "no-predictions", "no-manifest-rows"],
+)
+def test_no_joined_rows_scores_zero(manifest, predictions):
+    result = evaluate(manifest, predictions, dials=4, prefix_depth=2)
+    assert result["summary"]["imagesProcessed"] == 0
+    assert result["summary"]["accuracyPercent"] is None
+    assert dial_correct(result) == [0, 0, 0, 0]
+    assert result["digitConfusion"]["all"] == [[0] * 10] * 10
+    assert result["unmatchedPredictions"] == len(predictions["s3_key"])
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import pytest
+
+from amr_ops.geocache import GeocodeCache, cell_key
+
+MISSION = ("Mission District", "San Francisco", "California")
+
+
+def recorder(place=MISSION):
+    calls: list[tuple[float, float]] = []
+
+    def geocode(lat, lon):
+        calls.append((lat, lon))
+        return place
+
+    return geocode, calls
+
+
+def test_cell_key_snaps_to_the_grid():
+    assert cell_key(37.75991, -122.41481, 3) == "37.760,-122.415"
+    assert cell_key(37.7599, -122.4148, 3) == cell_key(37.7602, -122.4151, 3)
+    assert cell_key(37.7599, -122.4148, 4) != cell_key(37.7602, -122.4151, 4)
+
+
+def test_lookup_geocodes_each_cell_once_at_its_centre():
+    cache = GeocodeCache(None)
+    geocode, calls = recorder()
+    for lat, lon in [(37.7599, -122.4148), (37.7602, -122.4151), (37.7599, -122.4148), (40.0, -100.0)]:
+        assert cache.lookup(lat, lon, geocode) == MISSION
+    assert calls == [(37.76, -122.415), (40.0, -100.0)]
+    assert (cache.misses, cache.hits) == (2, 2)
+
+
+def test_answers_persist_per_source_and_failures_are_not_cached(tmp_path):
+    path = tmp_path / "geo" / "cache.sqlite"
+    cache = GeocodeCache(path)
+    cache.lookup(37.76, -122.415, recorder()[0])
+    cache.lookup(0.0, 0.0, recorder((None, None, None))[0])  # "no label" is an answer too
+
+    def failing(lat, lon):
+        raise TimeoutError("geocoder down")
+
+    with pytest.raises(TimeoutError):
+        cache.lookup(51.5, -0.12, failing)
+    cache.close()
+
+    reopened = GeocodeCache(path)
+    geocode, calls = recorder(("x", "y", "z"))
+    assert reopened.lookup(37.7601, -122.4149, geocode) == MISSION
+    assert reopened.lookup(0.0, 0.0, geocode) == (None, None, None)
+    assert reopened.lookup(51.5, -0.12, geocode) == ("x", "y", "z")
+    assert calls == [(51.5, -0.12)]
+    reopened.close()
+
+    other = GeocodeCache(path, source="offline")
+    assert other.get(cell_key(37.76, -122.415, 3)) is None
+    other.close()
+
+
+def test_prefetch_resolves_uncached_cells_in_one_call():
+    cache = GeocodeCache(None)
+    cache.put(cell_key(40.0, -100.0, 3), ("Kansas", None, "Kansas"))
+    batches: list[tuple[list[float], list[float]]] = []
+
+    def geocode_many(lats, lons):
+        batches.append((lats, lons))
+        return [MISSION] * len(lats)
+
+    coords = [(37.7599, -122.4148), (37.7602, -122.4151), (40.0, -100.0), (34.05, -118.25)]
+    assert cache.prefetch(coords, geocode_many) == 2
+    assert batches == [([37.76, 34.05], [-122.415, -118.25])]
+    assert cache.prefetch(coords, geocode_many) == 0
+
+    def no_geocoding(lat, lon):
+        raise AssertionError("prefetched")
+
+    assert [cache.lookup(lat, lon, no_geocoding)[0] for lat, lon in coords] == [
+        "Mission District",
+        "Mission District",
+        "Kansas",
+        "Mission District",
+    ]
+    # Prefetched cells count as geocoded the first time they are looked up.
+    assert (cache.misses, cache.hits) == (2, 2)
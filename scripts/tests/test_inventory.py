@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import json
+from urllib.parse import quote_plus
+
+import pytest
+
+from amr_ops.inventory import InventoryListing, iter_objects
+from amr_ops.listing import list_pages
+from conftest import BUCKET
+
+SCHEMA = "Bucket, Key, Size, LastModifiedDate, ETag, IsLatest, IsDeleteMarker"
+KEYS = sorted(
+    [f"1000/f_correct/{s:02x}aa-session/{name}" for s in range(0, 256, 9) for name in ("image.jpg", "metadata.json")]
+    + ["1000/f_correct/loose file.jpg", "1000/f_correct/ünïcode/image.jpg"]
+)
+
+
+@pytest.fixture
+def inventory(tmp_path):
+    """A CSV.gz inventory delivery in two unsorted data files, with rows that must be skipped."""
+    delivery = tmp_path / "cfg" / "2026-10-15T01-00Z"
+    delivery.mkdir(parents=True)
+    (tmp_path / "cfg" / "data").mkdir()
+    rows = [[BUCKET, key, str(len(key)), "2026-10-14T08:00:00.000Z", f"etag{i}", "true", "false"]
+            for i, key in enumerate(KEYS)]
+    rows += [
+        [BUCKET, "1000/f_correct/deleted/image.jpg", "1", "2026-10-14T08:00:00.000Z", "e", "true", "true"],
+        [BUCKET, "1000/f_correct/old/image.jpg", "1", "2026-10-14T08:00:00.000Z", "e", "false", "false"],
+        ["another-bucket", "1000/f_correct/other/image.jpg", "1", "2026-10-14T08:00:00.000Z", "e", "true", "false"],
+        [BUCKET, "1000/s_correct/x/image.jpg", "1", "2026-10-14T08:00:00.000Z", "e", "true", "false"],
+    ]
+    rows.reverse()
+    files = []
+    for part in range(2):
+        name = f"part-{part}.csv.gz"
+        with gzip.open(tmp_path / "cfg" / "data" / name, "wt", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+            for row in rows[part::2]:
+                writer.writerow([row[0], quote_plus(row[1], safe="/"), *row[2:]])
+        files.append({"key": f"inventory/{BUCKET}/cfg/data/{name}", "size": 1, "MD5checksum": "-"})
+    manifest = {"sourceBucket": BUCKET, "fileFormat": "CSV", "fileSchema": SCHEMA, "files": files}
+    (delivery / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+    return tmp_path / "cfg"
+
+
+def test_iter_objects_filters_bucket_prefix_and_versions(inventory):
+    objects = list(iter_objects(inventory, bucket=BUCKET, prefixes=["1000/f_correct/"]))
+    assert sorted(o.key for o in objects) == KEYS
+    first = next(o for o in objects if o.key == KEYS[0])
+    assert (first.size, first.etag, first.last_modified.year) == (len(KEYS[0]), "etag0", 2026)
+
+
+@pytest.mark.parametrize("max_keys", [1, 4, 1000])
+def test_list_objects_v2_pages_through_every_key_once(inventory, max_keys):
+    listing = InventoryListing(inventory, bucket=BUCKET, prefixes=["1000/f_correct/"])
+    keys, token, pages = [], None, 0
+    while True:
+        kwargs = {"Bucket": BUCKET, "Prefix": "1000/f_correct/", "MaxKeys": max_keys}
+        if token:
+            kwargs["ContinuationToken"] = token
+        resp = listing.list_objects_v2(**kwargs)
+        assert resp["KeyCount"] == len(resp["Contents"]) <= max_keys
+        keys += [obj["Key"] for obj in resp["Contents"]]
+        pages += 1
+        if not resp["IsTruncated"]:
+            break
+        token = resp["NextContinuationToken"]
+    assert keys == KEYS
+    assert pages == -(-len(KEYS) // max_keys)
+    assert resp["Contents"][-1]["ETag"].startswith('"')
+
+
+def test_list_objects_v2_pages_common_prefixes(inventory):
+    listing = InventoryListing(inventory, bucket=BUCKET, prefixes=["1000/f_correct/"])
+    prefixes, loose, token = [], [], None
+    while True:
+        kwargs = {"Bucket": BUCKET, "Prefix": "1000/f_correct/", "Delimiter": "/", "MaxKeys": 3}
+        if token:
+            kwargs["ContinuationToken"] = token
+        resp = listing.list_objects_v2(**kwargs)
+        prefixes += [cp["Prefix"] for cp in resp["CommonPrefixes"]]
+        loose += [obj["Key"] for obj in resp["Contents"]]
+        if not resp["IsTruncated"]:
+            break
+        token = resp["NextContinuationToken"]
+    assert prefixes == sorted({k.rsplit("/", 1)[0] + "/" for k in KEYS if k.count("/") == 3})
+    assert loose == ["1000/f_correct/loose file.jpg"]
+
+
+def test_list_pages_over_inventory_matches_sorted_keys(inventory):
+    listing = InventoryListing(inventory, bucket=BUCKET, prefixes=["1000/f_correct/"])
+    pages = list_pages(listing, BUCKET, "1000/f_correct/", shards=6, page_size=5)
+    assert [obj["Key"] for page in pages for obj in page["Contents"]] == KEYS
+
+
+def test_list_objects_v2_rejects_other_buckets_and_prefixes(inventory):
+    listing = InventoryListing(inventory, bucket=BUCKET, prefixes=["1000/f_correct/"])
+    with pytest.raises(ValueError):
+        listing.list_objects_v2(Bucket="another-bucket", Prefix="1000/f_correct/")
+    with pytest.raises(ValueError):
+        listing.list_objects_v2(Bucket=BUCKET, Prefix="1000/s_correct/")
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+
+import pytest
+
+from amr_ops.listing import BUFFER_PAGES, list_pages, shard_boundaries
+from conftest import BUCKET
+
+PREFIX = "1000/f_correct/"
+
+
+def test_shard_boundaries_split_the_alphabet_evenly():
+    assert shard_boundaries(1) == []
+    assert shard_boundaries(4) == ["4", "8", "c"]
+    deep = shard_boundaries(40)
+    assert len(deep) == 39
+    assert deep == sorted(set(deep))
+    assert {len(b) for b in deep} == {2}
+    assert shard_boundaries(3, alphabet="ab") == ["ab", "ba"]  # two characters are too few at depth 1
+
+
+@pytest.fixture
+def listed_bucket(standin):
+    """Sessions under PREFIX plus keys on, between and outside the shard boundaries."""
+    keys = []
+    for i in range(120):
+        session = f"{PREFIX}{uuid.UUID(int=i * 0x0213_4567_89AB_CDEF_0123_4567_89AB_CDEF % (1 << 128))}/"
+        keys += [f"{session}image.jpg", f"{session}metadata.json"]
+    keys += [f"{PREFIX}{b}" for b in ("4", "8", "c", "4/image.jpg", "c0/metadata.json")]
+    keys += [f"{PREFIX}{k}" for k in ("#legacy.jpg", "Z/image.jpg", "zz.txt", "~tmp/x.json")]
+    for key in keys:
+        standin.store.put(BUCKET, key, b"x")
+    standin.store.put(BUCKET, "1000/f_correctness/outside.jpg", b"x")
+    standin.store.put(BUCKET, "1000/f_correct", b"x")
+    return sorted(keys)
+
+
+@pytest.mark.parametrize("shards", [1, 2, 3, 16, 40])
+def test_list_pages_covers_every_key_once(s3, listed_bucket, shards):
+    pages = list(list_pages(s3, BUCKET, PREFIX, shards=shards, page_size=7))
+    keys = [obj["Key"] for page in pages for obj in page["Contents"]]
+    assert keys == listed_bucket
+
+
+@pytest.mark.parametrize("shards", [1, 5, 16])
+def test_list_pages_with_delimiter_covers_every_prefix_once(s3, listed_bucket, shards):
+    pages = list(list_pages(s3, BUCKET, PREFIX, shards=shards, delimiter="/", page_size=5))
+    prefixes = [cp["Prefix"] for page in pages for cp in page["CommonPrefixes"]]
+    loose = [obj["Key"] for page in pages for obj in page["Contents"]]
+    expected_prefixes = sorted({k[: k.index("/", len(PREFIX)) + 1] for k in listed_bucket if "/" in k[len(PREFIX) :]})
+    assert prefixes == expected_prefixes
+    assert loose == [k for k in listed_bucket if "/" not in k[len(PREFIX) :]]
+
+
+def test_list_pages_bounded_buffers_keep_order_and_stop(s3, listed_bucket):
+    pages = list(list_pages(s3, BUCKET, PREFIX, shards=8, page_size=3, buffer_pages=1))
+    assert [obj["Key"] for page in pages for obj in page["Contents"]] == listed_bucket
+
+    pages = list_pages(s3, BUCKET, PREFIX, shards=8, page_size=3, buffer_pages=1)
+    next(pages)
+    pages.close()
+    deadline = time.monotonic() + 5
+    while any(t.name.startswith("list-shard") for t in threading.enumerate()) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not [t.name for t in threading.enumerate() if t.name.startswith("list-shard")]
+
+
+def test_list_pages_reads_only_a_few_pages_ahead_by_default(standin, s3, listed_bucket):
+    pages = list_pages(s3, BUCKET, PREFIX, shards=4, page_size=2)
+    next(pages)
+    time.sleep(0.3)  # let every range list as far ahead as it may
+    lists = len(standin.server.latencies.get("LIST", []))
+    # Each range holds BUFFER_PAGES pages, plus one waiting in put() and one request in flight.
+    assert lists <= 4 * (BUFFER_PAGES + 2) < len(listed_bucket) // 2
+    assert [obj["Key"] for page in [*pages] for obj in page["Contents"]] == listed_bucket[2:]
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from amr_ops.meta_cache import MetadataCache
+from conftest import BUCKET
+
+KEY = "1000/f_correct/session/metadata.json"
+
+
+def get_count(standin) -> int:
+    return len(standin.server.latencies.get("GET", []))
+
+
+def test_read_json_serves_known_etags_and_revalidates_the_rest(standin, s3, tmp_path):
+    obj = standin.store.put(BUCKET, KEY, json.dumps({"reading": "1"}).encode())
+    cache = MetadataCache(tmp_path)
+
+    assert cache.read_json(s3, BUCKET, KEY) == {"reading": "1"}
+    assert cache.read_json(s3, BUCKET, KEY, obj.etag) == {"reading": "1"}
+    assert get_count(standin) == 1
+    assert cache.read_json(s3, BUCKET, KEY) == {"reading": "1"}  # answered with a 304
+    assert get_count(standin) == 2
+    assert (cache.hits, cache.revalidated, cache.misses) == (1, 1, 1)
+
+    changed = standin.store.put(BUCKET, KEY, json.dumps({"reading": "2"}).encode())
+    assert cache.read_json(s3, BUCKET, KEY, changed.etag) == {"reading": "2"}
+    assert cache.misses == 2
+
+    standin.store.delete(BUCKET, KEY)
+    assert cache.read_json(s3, BUCKET, KEY) is None
+    assert cache.lookup(KEY) is None
+
+
+def test_read_json_async_matches_the_blocking_path(standin, monkeypatch, tmp_path):
+    pytest.importorskip("aiobotocore")
+    from amr_ops.aio_s3 import S3Engine
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setenv("AWS_ENDPOINT_URL_S3", standin.url)
+    obj = standin.store.put(BUCKET, KEY, b'{"reading": "1"}')
+    cache = MetadataCache(tmp_path)
+    with S3Engine(region="us-east-1") as engine:
+        read = lambda etag=None: engine.run(cache.read_json_async(engine.s3, BUCKET, KEY, etag))  # noqa: E731
+        assert read() == read() == read(obj.etag) == {"reading": "1"}
+        assert (cache.hits, cache.revalidated, cache.misses) == (1, 1, 1)
+        standin.store.delete(BUCKET, KEY)
+        assert read() is None
+    assert get_count(standin) == 3
+
+
+def test_cache_persists_and_evicts_least_recently_used(tmp_path):
+    cache = MetadataCache(tmp_path, max_bytes=10_000)
+    for i in range(4):
+        cache.put(f"k{i}", f'"e{i}"', b"x" * 3000)
+    assert cache.get("k0", "e0") is None  # evicted to stay under max_bytes
+    assert cache.get("k1", '"e1"') == b"x" * 3000
+    assert cache.get("k1", "other") is None
+
+    reopened = MetadataCache(tmp_path, max_bytes=10_000)
+    assert [reopened.get(f"k{i}", f"e{i}") is not None for i in range(4)] == [False, True, True, True]
+    MetadataCache(tmp_path, max_bytes=5_000)  # a smaller budget evicts on open
+    assert len(list(tmp_path.glob("*/*"))) == 1
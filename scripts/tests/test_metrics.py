@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from amr_ops.metrics import BUCKETS, MeteredClient, Metrics, MetricsReporter, _OpStats
+from amr_ops.s3_standin import S3Error
+from conftest import BUCKET
+
+
+def test_metered_client_counts_what_the_server_saw(standin, s3, monkeypatch):
+    metrics = Metrics("test")
+    client = MeteredClient(s3, metrics)
+    for i in range(3):
+        client.put_object(Bucket=BUCKET, Key=f"k{i}", Body=b"x")
+    client.list_objects_v2(Bucket=BUCKET, Prefix="k")
+    client.head_object(Bucket=BUCKET, Key="k0")
+    client.get_object(Bucket=BUCKET, Key="k1")["Body"].read()
+    with pytest.raises(s3.exceptions.NoSuchKey):
+        client.get_object(Bucket=BUCKET, Key="missing")
+
+    def before_request(method, bucket, key, query):
+        if method == "PUT":
+            raise S3Error(503, "SlowDown", "injected", key)
+
+    monkeypatch.setattr(standin.server, "before_request", before_request)
+    with pytest.raises(s3.exceptions.ClientError):
+        client.put_object(Bucket=BUCKET, Key="k9", Body=b"x")
+
+    ops = metrics.snapshot()["ops"]
+    assert {op: ops[op]["requests"] for op in ops} == {"GET": 2, "HEAD": 1, "LIST": 1, "PUT": 4}
+    assert (ops["GET"]["errors"], ops["GET"]["throttles"]) == (1, 0)
+    assert (ops["PUT"]["errors"], ops["PUT"]["throttles"]) == (1, 1)
+    assert all(o["inflight"] == 0 for o in ops.values())
+    assert client.meta is s3.meta  # everything else passes through
+
+
+def test_quantiles_interpolate_within_the_histogram():
+    stats = _OpStats()
+    assert stats.quantile(0.5) is None
+    for seconds in [0.001] * 98 + [0.3, 0.4]:
+        stats.requests += 1
+        stats.max_seconds = max(stats.max_seconds, seconds)
+        stats.buckets[next(i for i, bound in enumerate(BUCKETS) if seconds <= bound)] += 1
+    assert 0 < stats.quantile(0.5) <= BUCKETS[0]
+    assert BUCKETS[5] < stats.quantile(0.99) <= 0.4
+    assert stats.quantile(1.0) == 0.4
+
+
+def test_snapshot_reports_progress_and_eta():
+    metrics = Metrics("test", total=10)
+    metrics.started -= 2
+    for result in ("updated", "updated", "skipped", "failed"):
+        metrics.session_done(result)
+    with metrics.timer("GEOCODE"):
+        pass
+    snap = metrics.snapshot()
+    assert snap["results"] == {"updated": 2, "skipped": 1, "failed": 1}
+    assert snap["sessions_done"] == 4 and snap["sessions_total"] == 10
+    assert 2.5 < snap["eta_s"] < 3.5
+    assert snap["ops"]["GEOCODE"]["requests"] == 1
+
+
+def test_reporter_writes_json_lines_and_a_prometheus_textfile(tmp_path):
+    metrics = Metrics("relabel")
+    for _ in range(3):
+        metrics.finish("GET", metrics.start("GET"))
+    metrics.session_done("updated")
+    jsonl, textfile = tmp_path / "metrics.jsonl", tmp_path / "amr.prom"
+    reporter = MetricsReporter(metrics, jsonl=str(jsonl), textfile=str(textfile), interval=60)
+    reporter.close()
+
+    (line,) = jsonl.read_text().splitlines()
+    snap = json.loads(line)
+    assert snap["job"] == "relabel" and snap["ops"]["GET"]["requests"] == 3
+    assert snap["window_sessions_per_s"] > 0
+
+    text = textfile.read_text()
+    assert 'amr_ops_requests_total{job="relabel",op="GET"} 3' in text
+    assert 'amr_ops_request_duration_seconds_bucket{job="relabel",op="GET",le="+Inf"} 3' in text
+    assert 'amr_ops_request_duration_seconds_count{job="relabel",op="GET"} 3' in text
+    assert 'amr_ops_sessions_total{job="relabel",result="updated"} 1' in text
+    buckets = [line for line in text.splitlines() if line.startswith("amr_ops_request_duration_seconds_bucket")]
+    counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    assert counts == sorted(counts) and len(counts) == len(BUCKETS) + 1
+    assert not list(tmp_path.glob(".*.tmp"))
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from amr_ops.offline_geocode import PolygonIndex  # noqa: E402
+
+
+def square(x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+    return np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], dtype=np.float64)
+
+
+@pytest.fixture
+def index() -> PolygonIndex:
+    return PolygonIndex(
+        [
+            ((None, None, "California"), [square(-125, 30, -110, 45)]),
+            ((None, "San Francisco", None), [square(-122.6, 37.6, -122.3, 37.9)]),
+            (("Mission", None, None), [square(-122.43, 37.74, -122.40, 37.77)]),
+            # Doughnut: the hole is not part of the neighbourhood.
+            (
+                ("Presidio", None, None),
+                [square(-122.50, 37.78, -122.44, 37.81), square(-122.48, 37.79, -122.46, 37.80)],
+            ),
+        ]
+    )
+
+
+def fill(index: PolygonIndex, points: list[tuple[float, float]]) -> list[tuple]:
+    xs = np.array([p[0] for p in points], dtype=np.float64)
+    ys = np.array([p[1] for p in points], dtype=np.float64)
+    fields = np.full((len(points), 3), None, dtype=object)
+    index.fill(xs, ys, fields)
+    return [tuple(row) for row in fields.tolist()]
+
+
+def test_fill_takes_each_field_from_smallest_containing_polygon(index):
+    assert fill(index, [(-122.415, 37.76)]) == [("Mission", "San Francisco", "California")]
+
+
+def test_fill_leaves_fields_no_polygon_provides(index):
+    assert fill(index, [(-122.35, 37.65), (-118.2, 34.05), (0.0, 51.5)]) == [
+        (None, "San Francisco", "California"),
+        (None, None, "California"),
+        (None, None, None),
+    ]
+
+
+def test_fill_respects_holes(index):
+    assert fill(index, [(-122.47, 37.795), (-122.49, 37.79)]) == [
+        (None, "San Francisco", "California"),
+        ("Presidio", "San Francisco", "California"),
+    ]
+
+
+def test_fill_handles_many_points_and_empty_input(index):
+    rng = np.random.default_rng(7)
+    points = list(zip(rng.uniform(-122.43, -122.40, 500), rng.uniform(37.74, 37.77, 500)))
+    assert set(fill(index, points)) == {("Mission", "San Francisco", "California")}
+    assert fill(index, []) == []
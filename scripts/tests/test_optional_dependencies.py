@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import importlib
+import sys
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "module, dependency, hint",
+    [
+        ("amr_ops.spatial", "numpy", "requirements-geo-offline.txt"),
+        ("amr_ops.offline_geocode", "numpy", "requirements-geo-offline.txt"),
+        ("amr_ops.preprocess", "PIL", "requirements-preprocess.txt"),
+    ],
+)
+def test_missing_dependency_raises_import_error_with_install_hint(monkeypatch, module, dependency, hint):
+    monkeypatch.setitem(sys.modules, dependency, None)
+    for name in ("amr_ops.spatial", "amr_ops.offline_geocode", "amr_ops.preprocess"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+
+    with pytest.raises(ImportError, match=hint):
+        importlib.import_module(module)
+
+
+@pytest.mark.parametrize(
+    "script, argv, dependency",
+    [
+        ("relabel_capture_locations", ["--dry-run", "--propagate-labels"], "numpy"),
+        ("unit_test_s3_to_csv", ["--preprocess"], "PIL"),
+    ],
+)
+def test_scripts_exit_with_the_install_hint(monkeypatch, script, argv, dependency):
+    pytest.importorskip("boto3")
+    main = importlib.import_module(script).main
+    monkeypatch.setitem(sys.modules, dependency, None)
+    for name in ("amr_ops.spatial", "amr_ops.preprocess"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    monkeypatch.setattr("sys.argv", [f"{script}.py", *argv])
+
+    with pytest.raises(SystemExit, match="pip install -r scripts/requirements-"):
+        main()
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import io
+import os
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from amr_ops.preprocess import Preprocessor, normalize, preprocess_file  # noqa: E402
+
+
+def encoded(size: tuple[int, int], fmt: str = "JPEG", mode: str = "RGB", orientation: int | None = None) -> bytes:
+    img = Image.new(mode, size, "red" if mode == "RGB" else None)
+    out = io.BytesIO()
+    if orientation is None:
+        img.save(out, fmt)
+    else:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        img.save(out, fmt, exif=exif)
+    return out.getvalue()
+
+
+def decoded(data: bytes) -> Image.Image:
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    return img
+
+
+def test_normalize_downscales_the_longer_side_only():
+    data, width, height = normalize(encoded((400, 100)), max_side=200, quality=90)
+    img = decoded(data)
+    assert (img.format, img.size, (width, height)) == ("JPEG", (200, 50), (200, 50))
+    assert normalize(encoded((40, 10)), max_side=200, quality=90)[1:] == (40, 10)
+    assert normalize(encoded((400, 100)), max_side=0, quality=90)[1:] == (400, 100)
+
+
+def test_normalize_applies_exif_rotation_and_converts_to_rgb():
+    assert normalize(encoded((400, 100), orientation=6), max_side=1000, quality=90)[1:] == (100, 400)
+    img = decoded(normalize(encoded((30, 20), "PNG", "RGBA"), max_side=1000, quality=90)[0])
+    assert (img.format, img.mode) == ("JPEG", "RGB")
+
+
+def test_preprocess_file_reuses_an_output_newer_than_its_source(tmp_path):
+    src, dst = tmp_path / "a.png", tmp_path / "out" / "a.jpg"
+    src.write_bytes(encoded((300, 300), "PNG"))
+    first = preprocess_file(str(src), str(dst), 100, 90)
+    assert (first["width"], first["height"]) == (100, 100) and first["ms"] is not None
+    again = preprocess_file(str(src), str(dst), 100, 90)
+    assert again == {"width": 100, "height": 100, "ms": None}
+    os.utime(src, (os.path.getmtime(dst) + 10,) * 2)
+    assert preprocess_file(str(src), str(dst), 100, 90)["ms"] is not None
+
+
+def test_preprocessor_collects_results_by_key(tmp_path):
+    src = tmp_path / "file.jpg"
+    src.write_bytes(encoded((50, 500)))
+    pre = Preprocessor(workers=2, max_side=100)
+    try:
+        pre.submit_bytes("bytes", encoded((1000, 10)))
+        pre.submit_file("file", str(src), str(tmp_path / "file-out.jpg"))
+        pre.submit_bytes("broken", b"not an image")
+        assert "bytes" in pre and "missing" not in pre
+
+        result = pre.result("bytes")
+        assert (result["width"], result["height"]) == (100, 1)
+        assert decoded(result["data"]).size == (100, 1)
+        assert pre.result("file")["height"] == 100
+        assert decoded((tmp_path / "file-out.jpg").read_bytes()).size == (10, 100)
+        assert isinstance(pre.result("broken"), Exception)
+        assert "bytes" not in pre
+    finally:
+        pre.close()
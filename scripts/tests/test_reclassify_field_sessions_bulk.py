@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+import reclassify_field_sessions_bulk as reclassify
+from amr_ops.s3_standin import S3Error
+from conftest import BUCKET
+
+SOURCE = "1000/f_correct/3f2a9c1e-0000-4000-8000-000000000001/"
+TARGET = "1000/s_correct/3f2a9c1e-0000-4000-8000-000000000001/"
+IMAGES = {"image.jpg": b"\xff\xd8 first", "image_2.jpg": b"\xff\xd8 second"}
+METADATA = {"user_name": "field.collector", "timestamp": "2026-04-02T10:00:00.000Z", "upload_mode": "simulator"}
+
+
+def make_copier(s3, **kwargs) -> reclassify.CopyScheduler:
+    options = {"concurrency": 4, "per_session": 2, "multipart_threshold": 1 << 30, "part_size": 1 << 20}
+    return reclassify.CopyScheduler(s3, BUCKET, **{**options, **kwargs})
+
+
+def seed_session(standin) -> tuple[list[str], dict[str, int]]:
+    for name, body in IMAGES.items():
+        standin.store.put(BUCKET, f"{SOURCE}{name}", body, content_type="image/jpeg")
+    standin.store.put(BUCKET, f"{SOURCE}metadata.json", json.dumps({**METADATA, "upload_mode": "field"}).encode())
+    keys = sorted(standin.store.bucket(BUCKET).objects)
+    return keys, {key: len(standin.store.get(BUCKET, key).body) for key in keys}
+
+
+def keys_under(standin, prefix: str) -> list[str]:
+    return sorted(k for k in standin.store.bucket(BUCKET).objects if k.startswith(prefix))
+
+
+@pytest.mark.parametrize("reached", ["planned", "copied", "metadata_written"])
+def test_resume_finishes_half_moved_session(standin, s3, tmp_path, reached):
+    keys, sizes = seed_session(standin)
+    path = tmp_path / "reclassify.jsonl"
+    journal = reclassify.SessionJournal(path, resume=False)
+    journal.record(SOURCE, "planned", target=TARGET, keys=keys, sizes=sizes, metadata=METADATA)
+    if reached in ("copied", "metadata_written"):
+        for key in keys:
+            s3.copy_object(Bucket=BUCKET, CopySource={"Bucket": BUCKET, "Key": key}, Key=key.replace(SOURCE, TARGET))
+        journal.record(SOURCE, "copied")
+    if reached == "metadata_written":
+        s3.put_object(Bucket=BUCKET, Key=f"{TARGET}metadata.json", Body=json.dumps(METADATA).encode())
+        journal.record(SOURCE, "metadata_written")
+    journal.close()
+    standin.server.reset_stats()
+
+    resumed = reclassify.SessionJournal(path, resume=True)
+    assert [e["prefix"] for e in resumed.unfinished()] == [SOURCE]
+    results = list(reclassify.resume_unfinished(s3, BUCKET, resumed, workers=2, copier=make_copier(s3)))
+    resumed.close()
+
+    assert results == [(SOURCE, "moved")]
+    assert "LIST" not in standin.server.latencies
+    assert keys_under(standin, SOURCE) == []
+    assert keys_under(standin, TARGET) == sorted(f"{TARGET}{name}" for name in [*IMAGES, "metadata.json"])
+    assert json.loads(standin.store.get(BUCKET, f"{TARGET}metadata.json").body)["upload_mode"] == "simulator"
+    assert reclassify.SessionJournal(path, resume=True).is_settled(SOURCE)
+
+
+def test_resume_replays_flat_listing_without_listing(tmp_path):
+    path = tmp_path / "reclassify.jsonl"
+    listing = reclassify._session_listing(SOURCE, {f"{SOURCE}metadata.json": 120, f"{SOURCE}image.jpg": 9}, "abc")
+    listed_folders: list[str] = []
+
+    def iter_pages(folder):
+        listed_folders.append(folder)
+        yield [listing]
+
+    journal = reclassify.SessionJournal(path, resume=False)
+    assert list(reclassify.journaled_pages(iter_pages, journal)("1000/f_correct/")) == [[listing]]
+    journal.close()
+
+    resumed = reclassify.SessionJournal(path, resume=True)
+    replayed = list(reclassify.journaled_pages(iter_pages, resumed)("1000/f_correct/"))
+    assert replayed == [[listing]]
+    assert listed_folders == ["1000/f_correct/"]
+    relisted = list(reclassify.journaled_pages(iter_pages, resumed, relist=True)("1000/f_correct/"))
+    assert relisted == [[listing]]
+    assert listed_folders == ["1000/f_correct/"] * 2
+    resumed.close()
+
+
+def test_copy_scheduler_completes_multipart_copy(standin, s3):
+    body = bytes(range(256)) * 40  # 10 KiB in 1 KiB parts
+    standin.store.put(BUCKET, f"{SOURCE}image.jpg", body, content_type="image/jpeg", metadata={"origin": "ios"})
+    copier = make_copier(s3, multipart_threshold=4096, part_size=1024)
+
+    copier.copy([(f"{SOURCE}image.jpg", f"{TARGET}image.jpg")], {f"{SOURCE}image.jpg": len(body)})
+
+    copied = standin.store.get(BUCKET, f"{TARGET}image.jpg")
+    assert copied.body == body
+    assert copied.etag.endswith('-10"')
+    assert copied.content_type == "image/jpeg"
+    assert copied.metadata == {"origin": "ios"}
+    assert standin.store.bucket(BUCKET).uploads == {}
+
+
+@pytest.mark.parametrize("failing", ["part", "complete"])
+def test_copy_scheduler_aborts_failed_multipart_copy(standin, s3, monkeypatch, failing):
+    body = b"x" * 8192
+    standin.store.put(BUCKET, f"{SOURCE}image.jpg", body)
+    copier = make_copier(s3, multipart_threshold=4096, part_size=1024)
+
+    def before_request(method, bucket, key, query):
+        if failing == "part" and method == "PUT" and query.get("partNumber") == ["3"]:
+            raise S3Error(400, "InvalidRequest", "injected part failure", key)
+        if failing == "complete" and method == "POST" and "uploadId" in query:
+            raise S3Error(400, "InvalidRequest", "injected completion failure", key)
+
+    monkeypatch.setattr(standin.server, "before_request", before_request)
+    with pytest.raises(ClientError, match="injected"):
+        copier.copy([(f"{SOURCE}image.jpg", f"{TARGET}image.jpg")], {f"{SOURCE}image.jpg": len(body)})
+
+    assert keys_under(standin, TARGET) == []
+    # Neither a failed part nor a failed completion closes the upload; only the abort does.
+    assert standin.store.bucket(BUCKET).uploads == {}
+
+
+def test_copy_scheduler_starts_threads_on_first_copy(s3):
+    copier = make_copier(s3)
+    assert copier._threads == []
+    copier.copy([])
+    assert copier._threads == []
+
+
+def run_main(monkeypatch, standin, *argv: str) -> int:
+    monkeypatch.setattr(reclassify, "load_dotenv", lambda path: None)
+    for name in ("AWS_PROFILE", "AWS_S3_BASE_PREFIX", "AWS_DYNAMODB_SESSIONS_TABLE"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("AWS_S3_BUCKET", BUCKET)
+    monkeypatch.setenv("AWS_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setenv("AWS_ENDPOINT_URL_S3", standin.url)
+    monkeypatch.setattr("sys.argv", ["reclassify_field_sessions_bulk.py", "--work-type", "1000", *argv])
+    return reclassify.main()
+
+
+@pytest.mark.parametrize("mode", [["--pipeline"], ["--pipeline", "--flat-listing"], ["--engine", "asyncio"]])
+def test_pipeline_fails_the_run_when_a_folder_cannot_be_listed(standin, monkeypatch, capsys, mode):
+    if mode[0] == "--engine":
+        pytest.importorskip("aiobotocore")
+    seed_session(standin)
+    denied = "1000/f_incorrect/"
+
+    def before_request(method, bucket, key, query):
+        if method == "GET" and not key and query.get("prefix") == [denied]:
+            raise S3Error(403, "AccessDenied", "injected", bucket)
+
+    monkeypatch.setattr(standin.server, "before_request", before_request)
+
+    assert run_main(monkeypatch, standin, *mode) == 1
+    err = capsys.readouterr()
+    assert f"   {denied}\n" in err.out + err.err
+    # The folders that could be listed were still processed.
+    assert "would move 1" in err.out + err.err
+
+
+def test_pipeline_succeeds_when_every_folder_is_listed(standin, monkeypatch):
+    seed_session(standin)
+    assert run_main(monkeypatch, standin, "--pipeline") == 0
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import json
+import threading
+
+import pytest
+
+import relabel_capture_locations as relabel
+from amr_ops.s3_standin import S3Error
+from conftest import BUCKET
+
+PREFIX = "1000/f_correct/"
+LABELLED = "Mission District · San Francisco"
+
+
+def metadata(lat: float | None, lon: float | None, label: str | None = None) -> dict:
+    loc = {} if lat is None else {"latitude": lat, "longitude": lon}
+    if label is not None:
+        loc["place_label"] = label
+    return {"session_id": "s", "capture_location": loc}
+
+
+def seed(standin, sessions: dict[str, dict]) -> None:
+    for name, meta in sessions.items():
+        standin.store.put(BUCKET, f"{PREFIX}{name}/metadata.json", json.dumps(meta).encode())
+
+
+def stored_label(standin, name: str) -> str | None:
+    meta = json.loads(standin.store.get(BUCKET, f"{PREFIX}{name}/metadata.json").body)
+    return meta["capture_location"].get("place_label")
+
+
+def run_main(monkeypatch, standin, *argv: str) -> int:
+    monkeypatch.setattr(relabel, "load_dotenv", lambda path: None)
+    for name in ("AWS_PROFILE", "AWS_DYNAMODB_SESSIONS_TABLE", "AMR_METADATA_CACHE"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("AWS_S3_BUCKET", BUCKET)
+    monkeypatch.setenv("AWS_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setenv("AWS_ENDPOINT_URL_S3", standin.url)
+    monkeypatch.setattr("sys.argv", ["relabel_capture_locations.py", "--no-geocode-cache", *argv])
+    return relabel.main()
+
+
+def rereader(items, calls: list[list[str]] | None = None):
+    """``reread`` for propagate_labels that serves ``items`` again and records each call's keys."""
+
+    def reread(keys):
+        keys = [key for key, _etag in keys]
+        if calls is not None:
+            calls.append(keys)
+        return iter([(key, dict(items)[key]) for key in keys])
+
+    return reread
+
+
+def test_propagate_labels_streams_everything_but_the_candidates():
+    pytest.importorskip("numpy")
+    items = [
+        ("a", metadata(37.7599, -122.4148, LABELLED)),
+        ("b", metadata(37.7600, -122.4150)),  # ~20 m from a
+        ("c", metadata(None, None)),
+        ("d", metadata(40.0, -100.0, "Kansas")),  # far from a; a candidate with no donor nearby
+        ("e", ValueError("read failed")),
+    ]
+    reread_keys: list[list[str]] = []
+    inherited: dict[str, tuple[str, float]] = {}
+    out = relabel.propagate_labels(iter(items), 150.0, inherited, rereader(items, reread_keys))
+    first = [next(out) for _ in range(3)]
+
+    assert [key for key, _meta in first] == ["a", "c", "e"]
+    assert reread_keys == []
+    assert [key for key, _meta in out] == ["b", "d"]
+    assert reread_keys == [["b", "d"]]
+    assert set(inherited) == {"b"}
+    label, meters = inherited["b"]
+    assert label == LABELLED and 10 < meters < 40
+
+
+def test_propagate_labels_uses_extra_donors():
+    pytest.importorskip("numpy")
+    inherited: dict[str, tuple[str, float]] = {}
+    items = [("b", metadata(37.7600, -122.4150))]
+    donors = [(37.7599, -122.4148, LABELLED)]
+    out = list(relabel.propagate_labels(iter(items), 150.0, inherited, rereader(items), donors))
+    assert out == items
+    assert inherited["b"][0] == LABELLED
+
+
+def test_main_propagates_labels_without_geocoding(standin, monkeypatch):
+    pytest.importorskip("numpy")
+    seed(
+        standin,
+        {
+            "s1": metadata(37.7599, -122.4148, LABELLED),
+            "s2": metadata(37.7600, -122.4150),
+            "s3": metadata(37.7601, -122.4149, "San Francisco, California"),
+        },
+    )
+
+    def no_geocoding(lat, lon):
+        raise AssertionError("every session should inherit a label")
+
+    monkeypatch.setattr(relabel, "reverse_geocode", no_geocoding)
+
+    assert run_main(monkeypatch, standin, "--execute", "--propagate-labels") == 0
+    assert [stored_label(standin, name) for name in ("s1", "s2", "s3")] == [LABELLED] * 3
+
+
+def done_line(capsys) -> str:
+    return next(line for line in capsys.readouterr().out.splitlines() if line.startswith("Done:"))
+
+
+@pytest.fixture
+def geocoded(monkeypatch) -> list[tuple[float, float]]:
+    calls: list[tuple[float, float]] = []
+
+    def reverse_geocode(lat, lon):
+        calls.append((lat, lon))
+        return "Mission District", "San Francisco", "California"
+
+    monkeypatch.setattr(relabel, "reverse_geocode", reverse_geocode)
+    return calls
+
+
+@pytest.mark.parametrize("engine", ["boto3", "asyncio"])
+def test_limit_caps_relabels(standin, monkeypatch, capsys, geocoded, engine):
+    seed(standin, {f"s{i}": metadata(37.7600, -122.4150) for i in range(6)})
+    seed(standin, {"a-labelled": metadata(37.7600, -122.4150, LABELLED)})  # listed first; never counts
+
+    assert run_main(monkeypatch, standin, "--execute", "--limit", "2", "--engine", engine) == 0
+    assert sum(stored_label(standin, f"s{i}") == LABELLED for i in range(6)) == 2
+    assert "updated 2," in done_line(capsys)
+
+
+@pytest.mark.parametrize("engine", ["boto3", "asyncio"])
+def test_failed_writes_are_not_counted_as_updates(standin, monkeypatch, capsys, geocoded, engine):
+    seed(standin, {f"s{i}": metadata(37.7600, -122.4150) for i in range(3)})
+
+    def before_request(method, bucket, key, query):
+        if method == "PUT" and key == f"{PREFIX}s1/metadata.json":
+            raise S3Error(403, "AccessDenied", "injected", key)
+
+    monkeypatch.setattr(standin.server, "before_request", before_request)
+
+    assert run_main(monkeypatch, standin, "--execute", "--engine", engine) == 0
+    assert [stored_label(standin, f"s{i}") for i in range(3)] == [LABELLED, None, LABELLED]
+    assert "updated 2, skipped 0, failed 1" in done_line(capsys)
+
+
+def test_batched_writes_do_not_block_the_caller():
+    release = threading.Event()
+    written: list[str] = []
+
+    class Engine:
+        def put_json_many(self, bucket, items):
+            release.wait(5)
+            return [None] * len(items)
+
+    writer = relabel.MetadataWriter(
+        None, BUCKET, engine=Engine(), batch_size=2, on_written=lambda key, _meta: written.append(key)
+    )
+    for i in range(4):
+        writer.submit(f"k{i}", {})  # two full batches: one writing, one queued
+    assert written == []
+    release.set()
+    writer.submit("k4", {})
+    writer.close()
+    assert written == [f"k{i}" for i in range(5)]
+    assert (writer.written, writer.failed) == (5, 0)
+
+
+@pytest.mark.parametrize("engine", ["boto3", "asyncio"])
+def test_metrics_count_sessions_and_requests(standin, monkeypatch, tmp_path, geocoded, engine):
+    seed(standin, {f"s{i}": metadata(37.7600, -122.4150) for i in range(3)})
+    seed(standin, {"labelled": metadata(37.7600, -122.4150, LABELLED)})
+    jsonl, textfile = tmp_path / "metrics.jsonl", tmp_path / "relabel.prom"
+    argv = ["--execute", "--engine", engine, "--metrics", str(jsonl), "--prometheus-textfile", str(textfile)]
+
+    assert run_main(monkeypatch, standin, *argv) == 0
+    snap = json.loads(jsonl.read_text().splitlines()[-1])
+    assert snap["job"] == "relabel" and snap["sessions_done"] == 4
+    assert snap["results"] == {"updated": 3, "skipped": 1}
+    assert snap["ops"]["PUT"]["requests"] == len(standin.server.latencies["PUT"]) == 3
+    assert snap["ops"]["GEOCODE"]["requests"] == len(geocoded)
+    assert 'amr_ops_sessions_total{job="relabel",result="updated"} 3' in textfile.read_text()
+
+
+def test_nearby_sessions_share_one_geocoder_call(standin, monkeypatch, capsys, geocoded):
+    seed(standin, {f"s{i}": metadata(37.7599 + i * 0.0001, -122.4148) for i in range(3)})
+    seed(standin, {"far": metadata(40.0, -100.0)})
+
+    assert run_main(monkeypatch, standin, "--execute") == 0
+    assert sorted(geocoded) == [(37.76, -122.415), (40.0, -100.0)]
+    assert "updated 4," in done_line(capsys)
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+from botocore.exceptions import ClientError
+
+pytest.importorskip("boto3")
+
+from amr_ops.session_index import FIELD_TEST_ATTRIBUTES, SessionIndexWriter  # noqa: E402
+
+PREFIX = "1000/s_correct/3f2a9c1e-0000-4000-8000-000000000001/"
+
+
+class FakeDynamo:
+    """Records UpdateItem calls; sessions in ``missing`` fail the attribute_exists guard."""
+
+    def __init__(self, missing: tuple[str, ...] = ()) -> None:
+        self.calls: list[dict] = []
+        self.missing = set(missing)
+        self._lock = threading.Lock()
+
+    def update_item(self, **kwargs) -> dict:
+        with self._lock:
+            self.calls.append(kwargs)
+        if kwargs["Key"]["session_id"]["S"] in self.missing:
+            raise ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "UpdateItem")
+        return {}
+
+
+def updated(call: dict) -> tuple[dict, set[str]]:
+    """(SET attribute → serialized value, REMOVE attributes) of one UpdateItem call."""
+    names = call["ExpressionAttributeNames"]
+    set_part, _, remove_part = call["UpdateExpression"].partition(" REMOVE ")
+    values = {}
+    for assignment in set_part.removeprefix("SET ").split(", "):
+        name, value = assignment.split(" = ")
+        values[names[name]] = call["ExpressionAttributeValues"][value]
+    removed = {names[name] for name in remove_part.split(", ")} if remove_part else set()
+    return values, removed
+
+
+def write(metadata: dict, missing: tuple[str, ...] = ()) -> tuple[FakeDynamo, SessionIndexWriter]:
+    client = FakeDynamo(missing)
+    writer = SessionIndexWriter("amr-sessions", region="us-east-1", workers=2, client=client)
+    writer.after_move(metadata, PREFIX)
+    writer.close()
+    return client, writer
+
+
+def test_after_move_repoints_session_and_clears_field_test_attributes():
+    client, writer = write(
+        {"session_id": "sid", "timestamp": "2026-04-02T10:00:00.000Z", "upload_mode": "simulator"}
+    )
+    values, removed = updated(client.calls[0])
+
+    assert client.calls[0]["Key"] == {"session_id": {"S": "sid"}}
+    assert values["s3_session_prefix"] == {"S": PREFIX}
+    assert values["gsi1pk"] == {"S": "WT#1000#ST#correct#SRC#simulator"}
+    assert values["gsi1sk"] == {"S": "2026-04-02T10:00:00.000Z#sid"}
+    assert values["upload_mode"] == {"S": "simulator"}
+    assert removed == {"metadata_etag", "primary_image_key", "image_difficulty", *FIELD_TEST_ATTRIBUTES}
+    assert writer.counts == {"updated": 1, "missing": 0, "failed": 0}
+
+
+def test_after_move_rebases_primary_image_and_keeps_metadata_difficulty():
+    metadata = {"session_id": "sid", "upload_mode": "simulator", "primary_image_file": "PXL_1.jpg"}
+    client, _ = write({**metadata, "image_difficulty": "difficult"})
+    values, removed = updated(client.calls[0])
+
+    assert values["primary_image_key"] == {"S": f"{PREFIX}PXL_1.jpg"}
+    assert values["image_difficulty"] == {"S": "difficult"}
+    assert "primary_image_key" not in removed and "image_difficulty" not in removed
+    assert "field_test_capture" in removed
+
+
+def test_after_move_counts_sessions_missing_from_the_index():
+    _, writer = write({"session_id": "sid", "upload_mode": "simulator"}, missing=("sid",))
+    assert writer.counts == {"updated": 0, "missing": 1, "failed": 0}
+    assert writer.missing == ["sid"]
+
+
+def test_set_capture_location_serializes_floats():
+    client = FakeDynamo()
+    writer = SessionIndexWriter("amr-sessions", region="us-east-1", client=client)
+    writer.set_capture_location("sid", {"latitude": 37.76, "longitude": -122.415, "place_label": "A · B"})
+    writer.close()
+    values, removed = updated(client.calls[0])
+    assert values["capture_location"]["M"]["latitude"] == {"N": "37.76"}
+    assert removed == set()
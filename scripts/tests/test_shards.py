@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import tarfile
+
+from amr_ops.shards import ShardReader, ShardWriter, shard_paths
+
+
+def sample(i: int) -> tuple[str, list[tuple[str, bytes]]]:
+    # Every fifth key is longer than a ustar name, so its header spans several blocks.
+    key = f"sess{i}/" + ("n" * 120 if i % 5 == 0 else "original")
+    return key, [("jpg", bytes([i % 256]) * (700 + 37 * i)), ("json", b'{"i": %d}' % i)]
+
+
+def test_reader_returns_every_member_at_the_writer_offsets(tmp_path):
+    spans = {}
+    with ShardWriter(tmp_path, max_bytes=16 << 10, name="t") as writer:
+        for i in range(40):
+            key, parts = sample(i)
+            spans[key] = writer.add(key, parts)
+    assert len(writer.shards) > 1
+    assert [p.name for p in shard_paths(tmp_path)] == writer.shards
+
+    for i in range(40):
+        key, parts = sample(i)
+        shard, offsets = spans[key]
+        with ShardReader(tmp_path / shard) as reader:
+            for (ext, data), (offset, size) in zip(parts, offsets):
+                assert reader.samples[key][ext] == (offset, size)
+                assert reader.read(key, ext) == data
+            assert reader.read_json(key) == {"i": i}
+
+
+def test_shards_are_plain_tars_in_sample_order(tmp_path):
+    with ShardWriter(tmp_path, max_bytes=1 << 20, name="t") as writer:
+        for i in range(6):
+            writer.add(*sample(i))
+    with tarfile.open(tmp_path / writer.shards[0]) as tar:
+        names = tar.getnames()
+        assert names == [f"{sample(i)[0]}.{ext}" for i in range(6) for ext in ("jpg", "json")]
+        assert tar.extractfile(names[2]).read() == sample(1)[1][0][1]
+
+
+def test_unclosed_shard_is_not_listed(tmp_path):
+    writer = ShardWriter(tmp_path, max_bytes=1 << 20, name="t")
+    writer.add(*sample(1))
+    assert shard_paths(tmp_path) == []
+    writer.close()
+    assert len(shard_paths(tmp_path)) == 1
+    assert len(writer.existing()) == 2  # the shard and its index
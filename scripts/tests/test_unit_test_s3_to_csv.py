@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+import unit_test_s3_to_csv
+from amr_ops.s3_standin import S3Error
+from amr_ops.shards import ShardReader
+from conftest import BUCKET
+from unit_test_s3_to_csv import LRUCache, ManifestIndex, download_with_retries, is_retryable
+
+PREFIX = "1000/unit_test_images/"
+
+
+def row(name: str, expected: str, s3_key: str = "", difficulty: str = "normal") -> dict[str, str]:
+    return {"image_file_name": name, "expected_meter_value": expected, "s3_key": s3_key, "image_difficulty": difficulty}
+
+
+@pytest.fixture
+def manifest() -> ManifestIndex:
+    return ManifestIndex(
+        [
+            row("image.jpg", "1111", s3_key=f"{PREFIX}session-a/image.jpg"),
+            row("image.jpg", "2222"),
+            row("3_1965.jpeg", "1965", difficulty="difficult"),
+            row("4_0042.jpeg", "42"),
+            row("4_0042.jpeg", "43"),
+            row("5_0007.jpeg", ""),
+        ],
+        PREFIX,
+    )
+
+
+def test_lookup_matches_full_key(manifest):
+    assert manifest.lookup(f"{PREFIX}session-a/image.jpg")["expected_meter_value"] == "1111"
+
+
+def test_lookup_matches_unique_name_of_flat_image(manifest):
+    entry = manifest.lookup(f"{PREFIX}3_1965.jpeg")
+    assert (entry["expected_meter_value"], entry["image_difficulty"]) == ("1965", "difficult")
+
+
+@pytest.mark.parametrize(
+    "image_key",
+    [
+        f"{PREFIX}session-b/image.jpg",  # session images all share a name
+        f"{PREFIX}image.jpg",  # name on two rows
+        f"{PREFIX}4_0042.jpeg",  # name on two rows
+        f"{PREFIX}nested/3_1965.jpeg",  # not in the flat layout
+        "2000/unit_test_images/3_1965.jpeg",  # another prefix
+        f"{PREFIX}5_0007.jpeg",  # row without a reading
+        f"{PREFIX}9_9999.jpeg",  # not in the manifest
+    ],
+)
+def test_lookup_rejects_ambiguous_or_foreign_names(manifest, image_key):
+    assert manifest.lookup(image_key) is None
+
+
+def test_lru_cache_drops_least_recently_used():
+    cache = LRUCache(2)
+    cache["a"], cache["b"] = 1, 2
+    assert cache.get("a") == 1
+    cache["c"] = 3
+    assert list(cache) == ["a", "c"]
+    unbounded = LRUCache()
+    for i in range(100):
+        unbounded[i] = i
+    assert len(unbounded) == 100
+
+
+def run_main(monkeypatch, standin, tmp_path, *argv: str) -> list[dict[str, str]]:
+    """Run the export against the stand-in; returns the CSV rows."""
+    for name in ("AWS_PROFILE", "UNIT_TEST_S3_BUCKET", "UNIT_TEST_S3_PREFIX"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("AWS_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setenv("AWS_ENDPOINT_URL_S3", standin.url)
+    out_csv = tmp_path / "manifest.csv"
+    monkeypatch.setattr(
+        "sys.argv",
+        [
+            "unit_test_s3_to_csv.py",
+            "--bucket",
+            BUCKET,
+            "--prefix",
+            PREFIX,
+            "--out-dir",
+            str(tmp_path / "images"),
+            "--csv",
+            str(out_csv),
+            "--no-manifest",
+            *argv,
+        ],
+    )
+    unit_test_s3_to_csv.main()
+    with open(out_csv, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def test_download_with_retries_repeats_only_retryable_failures(monkeypatch):
+    monkeypatch.setattr(unit_test_s3_to_csv.time, "sleep", lambda seconds: None)
+    missing = ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+    outcomes = {"a": [OSError("reset"), None], "b": [missing], "c": [None], "d": [TimeoutError()] * 5}
+    rounds: list[list[str]] = []
+
+    def download_many(pairs):
+        rounds.append([key for key, _path in pairs])
+        return [outcomes[key].pop(0) for key, _path in pairs]
+
+    failed = download_with_retries(download_many, [(k, f"/tmp/{k}") for k in "abcd"], retries=3)
+    assert rounds == [["a", "b", "c", "d"], ["a", "d"], ["d"], ["d"]]
+    assert set(failed) == {"b", "d"}
+    assert failed["b"] is missing
+
+
+@pytest.mark.parametrize(
+    ("err", "retryable"),
+    [
+        (ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject"), False),
+        (ClientError({"Error": {"Code": "403"}}, "HeadObject"), False),
+        (ClientError({"Error": {"Code": "SlowDown"}}, "GetObject"), True),
+        (ClientError({"Error": {"Code": "500"}}, "HeadObject"), True),
+        (FileNotFoundError("gone"), False),
+        (ConnectionResetError(), True),
+    ],
+)
+def test_is_retryable(err, retryable):
+    assert is_retryable(err) is retryable
+
+
+@pytest.mark.parametrize("engine", ["boto3", "asyncio"])
+def test_forbidden_download_drops_only_its_row(standin, monkeypatch, tmp_path, engine):
+    monkeypatch.setattr(unit_test_s3_to_csv.time, "sleep", lambda seconds: None)
+    for name in ("1_0101.jpeg", "2_0202.jpeg", "3_0303.jpeg"):
+        standin.store.put(BUCKET, f"{PREFIX}{name}", name.encode())
+    attempts: list[str] = []
+
+    def before_request(method, bucket, key, query):
+        if key == f"{PREFIX}2_0202.jpeg":
+            attempts.append(method)
+            raise S3Error(403, "AccessDenied", "injected", key)
+
+    monkeypatch.setattr(standin.server, "before_request", before_request)
+    rows = run_main(monkeypatch, standin, tmp_path, "--engine", engine, "--retries", "3")
+
+    assert [r["expected_meter_value"] for r in rows] == ["0101", "0303"]
+    assert len(attempts) == 1  # not retried: it fails the same way every time
+    assert (tmp_path / "images" / "3_0303.jpeg").read_bytes() == b"3_0303.jpeg"
+
+
+def seed_sessions(standin) -> None:
+    for i in range(3):
+        standin.store.put(BUCKET, f"{PREFIX}{i}_{1000 + i}.jpeg", b"flat %d" % i)
+        standin.store.put(BUCKET, f"{PREFIX}session-{i}/original.jpg", b"session %d" % i)
+        meta = {"user_correction": str(5000 + i)}
+        standin.store.put(BUCKET, f"{PREFIX}session-{i}/metadata.json", json.dumps(meta).encode())
+
+
+@pytest.mark.parametrize("engine", ["boto3", "asyncio"])
+def test_unchanged_sync_only_lists(standin, monkeypatch, tmp_path, engine):
+    seed_sessions(standin)
+    first = run_main(monkeypatch, standin, tmp_path, "--sync", "--engine", engine)
+    assert len(first) == 6
+    assert {r["expected_meter_value"] for r in first} >= {"5000", "5001", "5002"}
+
+    standin.server.reset_stats()
+    again = run_main(monkeypatch, standin, tmp_path, "--sync", "--engine", engine)
+    assert again == first
+    assert set(standin.server.latencies) == {"LIST"}
+
+
+def test_sync_fetches_changes_and_prunes_removed_keys(standin, monkeypatch, tmp_path):
+    seed_sessions(standin)
+    run_main(monkeypatch, standin, tmp_path, "--sync")
+    images = tmp_path / "images"
+    assert (images / "session-1" / "original.jpg").is_file()
+
+    standin.store.put(BUCKET, f"{PREFIX}session-0/metadata.json", json.dumps({"user_correction": "9999"}).encode())
+    standin.store.put(BUCKET, f"{PREFIX}2_1002.jpeg", b"replaced")
+    for name in ("original.jpg", "metadata.json"):
+        standin.store.delete(BUCKET, f"{PREFIX}session-1/{name}")
+    standin.server.reset_stats()
+    rows = run_main(monkeypatch, standin, tmp_path, "--sync", "--prune")
+
+    assert {r["s3_key"]: r["expected_meter_value"] for r in rows}[f"{PREFIX}session-0/original.jpg"] == "9999"
+    assert f"{PREFIX}session-1/original.jpg" not in {r["s3_key"] for r in rows}
+    assert (images / "2_1002.jpeg").read_bytes() == b"replaced"
+    assert not (images / "session-1").exists()
+    # One metadata GET and one image download; everything else came from the state.
+    assert len(standin.server.latencies["GET"]) == 2
+
+
+@pytest.mark.parametrize("engine", ["boto3", "asyncio"])
+def test_shard_rows_point_at_the_image_bytes(standin, monkeypatch, tmp_path, engine):
+    seed_sessions(standin)
+    standin.store.put(BUCKET, f"{PREFIX}9_1000.jpeg", b"flat 0")  # a duplicate of 0_1000.jpeg
+    rows = run_main(monkeypatch, standin, tmp_path, "--engine", engine, "--shard-dir", str(tmp_path / "shards"))
+
+    assert len(rows) == 7
+    for r in rows:
+        with open(tmp_path / "shards" / r["shard"], "rb") as f:
+            f.seek(int(r["shard_offset"]))
+            assert f.read(int(r["shard_size"])) == standin.store.get(BUCKET, r["s3_key"]).body
+    duplicate = next(r for r in rows if r["duplicate_of"])
+    assert duplicate["s3_key"] == f"{PREFIX}9_1000.jpeg"
+    assert not (tmp_path / "images").exists()
+
+
+def record_image_gets(standin, monkeypatch) -> list[str]:
+    keys: list[str] = []
+
+    def before_request(method, bucket, key, query):
+        if method == "GET" and key.endswith(".jpeg"):
+            keys.append(key)
+
+    monkeypatch.setattr(standin.server, "before_request", before_request)
+    return keys
+
+
+def test_duplicates_are_linked_and_conflicting_readings_flagged(standin, monkeypatch, tmp_path):
+    for name in ("1_0101.jpeg", "2_0101.jpeg", "3_0303.jpeg", "4_0404.jpeg"):
+        standin.store.put(BUCKET, f"{PREFIX}{name}", b"same bytes" if name != "4_0404.jpeg" else b"other")
+    fetched = record_image_gets(standin, monkeypatch)
+    rows = run_main(monkeypatch, standin, tmp_path)
+
+    by_name = {r["image_file_name"]: r for r in rows}
+    assert by_name["2_0101.jpeg"]["duplicate_of"] == f"{PREFIX}1_0101.jpeg"
+    assert by_name["2_0101.jpeg"]["conflicting_reading"] == ""
+    assert by_name["3_0303.jpeg"]["duplicate_of"] == f"{PREFIX}1_0101.jpeg"
+    assert by_name["3_0303.jpeg"]["conflicting_reading"] == "0101"
+    assert by_name["4_0404.jpeg"]["duplicate_of"] == ""
+    assert sorted(fetched) == [f"{PREFIX}1_0101.jpeg", f"{PREFIX}4_0404.jpeg"]
+    images = tmp_path / "images"
+    assert (images / "3_0303.jpeg").stat().st_ino == (images / "1_0101.jpeg").stat().st_ino
+
+
+def test_no_dedup_downloads_every_copy(standin, monkeypatch, tmp_path):
+    for name in ("1_0101.jpeg", "2_0202.jpeg"):
+        standin.store.put(BUCKET, f"{PREFIX}{name}", b"same bytes")
+    fetched = record_image_gets(standin, monkeypatch)
+    rows = run_main(monkeypatch, standin, tmp_path, "--no-dedup")
+
+    assert [(r["duplicate_of"], r["conflicting_reading"]) for r in rows] == [("", ""), ("", "")]
+    assert sorted(fetched) == [f"{PREFIX}1_0101.jpeg", f"{PREFIX}2_0202.jpeg"]
+
+
+@pytest.mark.parametrize("shards", [False, True])
+def test_preprocess_records_normalized_sizes(standin, monkeypatch, tmp_path, shards):
+    Image = pytest.importorskip("PIL.Image")
+    buf = io.BytesIO()
+    Image.new("RGB", (640, 320)).save(buf, "PNG")
+    standin.store.put(BUCKET, f"{PREFIX}1_0101.png", buf.getvalue())
+    standin.store.put(BUCKET, f"{PREFIX}2_0202.png", b"not an image")
+    out = ["--shard-dir", str(tmp_path / "shards")] if shards else ["--preprocess-dir", str(tmp_path / "pre")]
+    rows = run_main(monkeypatch, standin, tmp_path, *out, "--preprocess", "--preprocess-workers=1", "--max-side=64")
+
+    good, bad = rows
+    assert (good["processed_width"], good["processed_height"]) == ("64", "32")
+    assert float(good["preprocess_ms"]) > 0
+    assert bad["processed_width"] == bad["processed_path"] == ""
+    if shards:
+        with ShardReader(tmp_path / "shards" / good["shard"]) as reader:
+            assert Image.open(io.BytesIO(reader.read("1_0101", "jpg"))).size == (64, 32)
+            assert reader.read("2_0202", "png") == b"not an image"
+    else:
+        assert good["processed_path"] == "1_0101.jpg"
+        assert Image.open(tmp_path / "pre" / "1_0101.jpg").size == (64, 32)
@@ -2,8 +2,10 @@
 """
 Download images under an S3 prefix and write a CSV: image file name + expected meter reading.
 
-Expected value is read from session metadata.json in the same folder as the image
-(parent key dirname + "metadata.json"), using `user_correction` first, then `ml_prediction`.
+Expected values come from ``<prefix>unittestng_manifest.json`` (the portal's unit-test
+registry) when it covers an image, else from session metadata.json in the same folder as
+the image (parent key dirname + "metadata.json"), using `user_correction` first, then
+`ml_prediction`.
 
 Layouts supported:
 
@@ -13,11 +15,26 @@ Layouts supported:
 
 2) Flat folder (e.g. s3://meter-reader-training-feedback/1000/unit_test_images/3_1965.jpeg):
   Tries s3://.../1000/unit_test_images/metadata.json (shared), then sidecar
-  s3://.../1000/unit_test_images/3_1965.json, then filename heuristic ``<digits>_<digits>.jpeg``
-  → expected_meter_value = second number (e.g. ``1965``).
+  s3://.../1000/unit_test_images/3_1965.json, then the file name convention
+  ``<prefix>_d<1|2|3>_<reading>.jpeg`` or legacy ``<prefix>_<reading>.jpeg``
+  → expected_meter_value = the reading (e.g. ``1965``).
 
 Override with ``--expect-filename-regex`` or ``--no-filename-heuristic``.
 
+Options:
+  --manifest-key KEY          registry JSON to read instead (--no-manifest: metadata only)
+  --engine asyncio            list, GET and download concurrently on one event loop and pool
+  --workers N                 concurrent metadata GETs and downloads (boto3 engine)
+  --retries N                 extra attempts per failed download (images on disk are skipped)
+  --sync                      download only new/changed objects, tracked in a --state file
+  --prune                     with --sync, delete local images whose keys are gone
+  --stream                    bounded memory: resolve, download and write one listing page at a time
+  --shard-dir DIR             pack images into indexed tar shards of --shard-size MB
+  --no-dedup                  download every copy of images with the same ETag and size
+  --preprocess                EXIF-rotate, convert and downscale images in a process pool
+  --list-shards N             list the prefix as N session-id key ranges at once
+  --inventory PATH            list the prefix from a local S3 Inventory instead of LIST calls
+
 Usage:
   export AWS_PROFILE=...   # or AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY
   pip install -r scripts/requirements-unit-test-s3.txt
@@ -29,6 +46,15 @@ Usage:
 
   # List only (no download):
   python scripts/unit_test_s3_to_csv.py --bucket meter-reader-training-feedback --dry-run
+
+  # Daily incremental mirror:
+  python scripts/unit_test_s3_to_csv.py --sync --prune
+
+  # Whole-bucket export in bounded memory, 32 key ranges listed at once:
+  python scripts/unit_test_s3_to_csv.py --prefix "" --stream --dry-run --list-shards 32
+
+  # 512 MB tar shards of model-ready 640px JPEGs:
+  python scripts/unit_test_s3_to_csv.py --shard-dir ./unit_test_shards --shard-size 512 --preprocess --max-side 640
 """
 
 from __future__ import annotations
@@ -37,22 +63,41 @@ import argparse
 import csv
 import json
 import os
+import random
 import re
+import shutil
 import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import PurePosixPath
-from typing import Any
+from typing import Any, Callable, Iterable, Iterator
 
 try:
     import boto3
+    from botocore.config import Config
     from botocore.exceptions import ClientError
 except ImportError:
     print("Install boto3: pip install -r scripts/requirements-unit-test-s3.txt", file=sys.stderr)
     sys.exit(1)
 
+from amr_ops.listing import list_pages
+
 IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".heic", ".heif"}
 
-# Flat names like 3_1965.jpeg → expected "1965" (second integer group).
-_FLAT_TWO_INT_RE = re.compile(r"^(\d+)_(\d+)\.(jpe?g|png|webp|heic|heif)$", re.IGNORECASE)
+# server/unitTestManifest.js: registry object, difficulty codes and file naming.
+MANIFEST_JSON_FILE = "unittestng_manifest.json"
+DIFFICULTY_CODES = {"normal": "d1", "difficult": "d2", "very_difficult": "d3", "very difficult": "d3"}
+# 3_d2_1965.jpeg → ("d2", "1965"); legacy 3_1965.jpeg → ("d1", "1965").
+_DIFFICULTY_NAME_RE = re.compile(r"^(\d+)_d([123])_(\d+)\.", re.IGNORECASE)
+_FLAT_TWO_INT_RE = re.compile(r"^(\d+)_(\d+)\.", re.IGNORECASE)
+
+# Conflicting duplicates printed at the end (all of them are in the CSV).
+CONFLICT_EXAMPLES = 20
+
+# CSV fields stored as the ``.json`` member next to each image in --shard-dir shards.
+SHARD_SAMPLE_FIELDS = ("s3_key", "image_file_name", "expected_meter_value", "metadata_s3_key", "difficulty")
 
 
 def normalize_prefix(p: str) -> str:
@@ -95,11 +140,107 @@ def filename_expectation(basename: str, pattern: re.Pattern[str] | None) -> str:
     return m.group(0).strip()
 
 
-def flat_two_int_expected(basename: str) -> str:
+def parse_unit_test_file_name(basename: str) -> tuple[str, str] | None:
+    """``(difficulty code, reading)`` from ``{prefix}_d{n}_{reading}.ext`` or ``{prefix}_{reading}.ext``."""
+    m = _DIFFICULTY_NAME_RE.match(basename)
+    if m:
+        return f"d{m.group(2)}", m.group(3)
     m = _FLAT_TWO_INT_RE.match(basename)
-    if not m:
-        return ""
-    return m.group(2)
+    if m:
+        return "d1", m.group(2)
+    return None
+
+
+def flat_two_int_expected(basename: str) -> str:
+    parsed = parse_unit_test_file_name(basename)
+    return parsed[1] if parsed else ""
+
+
+def difficulty_code(raw: Any) -> str:
+    """``difficultyToCode``: normal → d1, difficult → d2, very_difficult → d3."""
+    return DIFFICULTY_CODES.get(str(raw or "normal").strip().lower(), "d1")
+
+
+def manifest_key_for_prefix(prefix: str) -> str:
+    """``unitTestManifestKey`` for the work type that owns ``prefix``."""
+    env = (os.environ.get("UNIT_TEST_MANIFEST_S3_KEY") or "").strip()
+    if env:
+        first = prefix.split("/", 1)[0]
+        return env.replace("{workType}", first if re.fullmatch(r"\d{4}", first) else "1000")
+    return f"{prefix}{MANIFEST_JSON_FILE}"
+
+
+def manifest_rows(doc: Any) -> list[dict[str, str]]:
+    """``rowsFromJsonDocument`` + ``normalizeRow`` (field aliases, trimmed strings)."""
+    if not isinstance(doc, dict):
+        return []
+    raw_rows = doc.get("rows") if isinstance(doc.get("rows"), list) else doc.get("images")
+    rows = []
+    for raw in raw_rows if isinstance(raw_rows, list) else []:
+        if not isinstance(raw, dict):
+            continue
+
+        def first(*names: str) -> str:
+            for name in names:
+                if raw.get(name) is not None:
+                    return str(raw[name]).strip()
+            return ""
+
+        rows.append(
+            {
+                "image_file_name": first("image_file_name", "imageFileName", "file_name", "filename"),
+                "expected_meter_value": first("expected_meter_value", "expectedMeterValue", "expected"),
+                "s3_key": first("s3_key", "s3Key"),
+                "image_difficulty": first("image_difficulty", "imageDifficulty") or "normal",
+            }
+        )
+    return rows
+
+
+class ManifestIndex:
+    """
+    Manifest rows by S3 key. A file name only stands in for the key when exactly one row
+    has that name and the image sits directly under ``prefix`` (flat layout): session
+    images are all ``image.jpg``, and a name shared by several rows is ambiguous.
+    """
+
+    def __init__(self, rows: list[dict[str, str]], prefix: str = "") -> None:
+        self.rows = rows
+        self.prefix = prefix
+        self.by_key = {r["s3_key"]: r for r in rows if r["s3_key"]}
+        names = Counter(r["image_file_name"] for r in rows if r["image_file_name"])
+        self.by_name = {r["image_file_name"]: r for r in rows if names[r["image_file_name"]] == 1}
+
+    def lookup(self, image_key: str) -> dict[str, str] | None:
+        row = self.by_key.get(image_key)
+        if row is None and image_key.startswith(self.prefix) and "/" not in image_key[len(self.prefix) :]:
+            row = self.by_name.get(PurePosixPath(image_key).name)
+        return row if row and row["expected_meter_value"] else None
+
+
+class LRUCache(OrderedDict):
+    """Thread-safe dict; past ``maxsize`` entries the least recently used is dropped."""
+
+    def __init__(self, maxsize: int | None = None) -> None:
+        super().__init__()
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self:
+                return default
+            if self.maxsize:
+                self.move_to_end(key)
+            return super().__getitem__(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        with self._lock:
+            super().__setitem__(key, value)
+            if self.maxsize:
+                self.move_to_end(key)
+                while len(self) > self.maxsize:
+                    self.popitem(last=False)
 
 
 def sidecar_metadata_key(image_key: str) -> str:
@@ -108,6 +249,656 @@ def sidecar_metadata_key(image_key: str) -> str:
     return str(p.with_suffix(".json"))
 
 
+def is_retryable(err: BaseException) -> bool:
+    """Missing or forbidden objects fail the same way on every attempt."""
+    if isinstance(err, ClientError):
+        code = str((err.response.get("Error") or {}).get("Code") or "")
+        return code not in ("NoSuchKey", "404", "403", "AccessDenied")
+    return not isinstance(err, (FileNotFoundError, PermissionError))
+
+
+def download_with_retries(
+    download_many: Callable[[list[tuple[str, str]]], list[BaseException | None]],
+    pairs: list[tuple[str, str]],
+    retries: int,
+    backoff: float = 0.5,
+) -> dict[str, BaseException]:
+    """
+    Download ``(key, path)`` pairs in rounds: each round re-runs only the keys whose last
+    attempt failed with a retryable error, after an exponential, jittered pause.
+    Returns the final error per key that never succeeded.
+    """
+    failed: dict[str, BaseException] = {}
+    todo = pairs
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * (2 ** (attempt - 1)) * (0.5 + random.random()))
+            print(f"Retrying {len(todo)} download(s) (attempt {attempt + 1}/{retries + 1})", file=sys.stderr)
+        again = []
+        for pair, err in zip(todo, download_many(todo)):
+            if err is None:
+                failed.pop(pair[0], None)
+                continue
+            failed[pair[0]] = err
+            if is_retryable(err):
+                again.append(pair)
+        if not again:
+            break
+        todo = again
+    return failed
+
+
+SYNC_STATE_VERSION = 1
+
+
+def load_sync_state(path: str, bucket: str, prefix: str) -> dict[str, Any]:
+    """State from a previous ``--sync`` run of the same bucket/prefix (empty otherwise)."""
+    empty: dict[str, Any] = {
+        "version": SYNC_STATE_VERSION,
+        "bucket": bucket,
+        "prefix": prefix,
+        "objects": {},
+        "metadata": {},
+    }
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return empty
+    if (
+        not isinstance(state, dict)
+        or state.get("version") != SYNC_STATE_VERSION
+        or state.get("bucket") != bucket
+        or state.get("prefix") != prefix
+    ):
+        return empty
+    state.setdefault("objects", {})
+    state.setdefault("metadata", {})
+    return state
+
+
+def save_sync_state(path: str, state: dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, separators=(",", ":"), sort_keys=True)
+    os.replace(tmp, path)
+
+
+def prune_local(out_dir: str, paths: list[str]) -> int:
+    """Delete ``paths`` (relative to ``out_dir``) and any directories left empty."""
+    removed = 0
+    root = os.path.abspath(out_dir)
+    for rel in paths:
+        path = os.path.abspath(os.path.join(root, rel))
+        if not path.startswith(root + os.sep):
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            continue
+        parent = os.path.dirname(path)
+        while parent != root:
+            try:
+                os.rmdir(parent)
+            except OSError:
+                break
+            parent = os.path.dirname(parent)
+    return removed
+
+
+def link_or_copy(src: str, dst: str) -> None:
+    """Hard-link ``dst`` to ``src`` (copy where the filesystem cannot link)."""
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def record_preprocessed(row: dict[str, str], result: dict[str, Any] | BaseException) -> bool:
+    """Copy a preprocess result's size and timing into ``row``; False (and a message) on failure."""
+    if isinstance(result, BaseException):
+        print(f"Preprocess failed {row['s3_key']}: {result}", file=sys.stderr)
+        return False
+    row["processed_width"], row["processed_height"] = str(result["width"]), str(result["height"])
+    row["preprocess_ms"] = "" if result["ms"] is None else f"{result['ms']:.1f}"
+    return True
+
+
+def csv_fieldnames(*, shards: bool, preprocess: bool) -> list[str]:
+    fieldnames = [
+        "image_file_name",
+        "expected_meter_value",
+        "relative_path",
+        "s3_key",
+        "metadata_s3_key",
+        "difficulty",
+        "duplicate_of",
+        "conflicting_reading",
+    ]
+    if shards:
+        fieldnames += ["shard", "shard_offset", "shard_size"]
+    if preprocess:
+        fieldnames += ["processed_path", "processed_width", "processed_height", "preprocess_ms"]
+    return fieldnames
+
+
+class UnitTestExport:
+    """
+    One export run: the S3 clients, listing, metadata/manifest resolution, dedup state
+    and the outputs (files or shards, preprocessed copies, CSV, ``--sync`` state).
+
+    With ``--stream`` the state kept across pages is bounded: the metadata LRU, the last
+    ``--dedup-cache`` distinct images (a duplicate of a dropped image is downloaded
+    again), the first CONFLICT_EXAMPLES conflicts, ``list_pages``' few read-ahead pages
+    per ``--list-shards`` range and the open shard's member index.
+    """
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.prefix = normalize_prefix(args.prefix)
+        self.pattern = re.compile(args.expect_filename_regex) if args.expect_filename_regex.strip() else None
+        self.workers = max(1, args.workers)
+        self.s3 = boto3.client(
+            "s3",
+            region_name=args.region,
+            config=Config(
+                max_pool_connections=max(10, self.workers + 4 + args.list_shards),
+                retries={"max_attempts": 5, "mode": "standard"},
+            ),
+        )
+        self.pool = None
+        if args.engine == "boto3" and self.workers > 1:
+            self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        self.engine = None
+        if args.engine == "asyncio":
+            from amr_ops.aio_s3 import S3Engine
+
+            self.engine = S3Engine(region=args.region, max_connections=args.connections)
+        self.inventory = None
+        if args.inventory:
+            from amr_ops.inventory import InventoryListing
+
+            self.inventory = InventoryListing(args.inventory, bucket=args.bucket, prefixes=[self.prefix])
+            print(f"Listing: {self.inventory.describe()}", file=sys.stderr)
+
+        self.stream = args.stream
+        self.dedup = not args.no_dedup
+        self.image_sizes: dict[str, int] = {}
+        self.image_etags: dict[str, str] = {}
+        # Every listed object (images, metadata, sidecars): key → (ETag, size, LastModified).
+        self.listed: dict[str, tuple[str, int, str]] = {}
+        # Parsed metadata/sidecar JSON by key.
+        self.meta_cache = LRUCache(max(1, args.metadata_cache) if self.stream else None)
+        self.state: dict[str, Any] | None = None
+        self.state_path = args.state or os.path.join(args.out_dir, ".unit_test_sync.json")
+        self.manifest = ManifestIndex([])
+        self.manifest_key = ""
+        self.preprocessor = None
+        self.shards = None
+        # First copy of each listed blob, by (ETag, size): one small entry per unique image,
+        # the most recently seen --dedup-cache of them with --stream.
+        self.blobs = LRUCache(max(1, args.dedup_cache) if self.stream else None)
+        self.unique = 0
+        # The first CONFLICT_EXAMPLES duplicates whose reading differs from their first copy's.
+        self.conflicts: list[tuple[str, str, str, str]] = []
+        self.conflict_count = 0
+        self.fetched: dict[str, bytes] = {}
+        self.kept_rows: list[dict[str, str]] = []  # for the --sync state
+        self.fieldnames: list[str] = []
+        self.written = self.downloaded = self.linked = self.duplicates = self.already_present = self.failed = 0
+
+    # Listing
+
+    def listed_image_pages(self) -> Iterator[list[str]]:
+        """Image keys per ListObjectsV2 page, in the listing's (lexicographic) order."""
+        args = self.args
+        try:
+            client = self.inventory or (self.engine.blocking_client() if self.engine is not None else self.s3)
+            for page in list_pages(client, args.bucket, self.prefix, shards=args.list_shards):
+                if self.stream:
+                    self.image_sizes.clear()
+                    self.image_etags.clear()
+                keys = []
+                for obj in page.get("Contents") or []:
+                    key = obj.get("Key") or ""
+                    if key.endswith("/"):
+                        continue
+                    if not self.stream:
+                        modified = obj.get("LastModified")
+                        self.listed[key] = (
+                            str(obj.get("ETag") or "").strip('"'),
+                            int(obj.get("Size") or 0),
+                            modified.isoformat() if hasattr(modified, "isoformat") else str(modified or ""),
+                        )
+                    if not is_image_key(key):
+                        continue
+                    keys.append(key)
+                    self.image_sizes[key] = int(obj.get("Size") or 0)
+                    self.image_etags[key] = str(obj.get("ETag") or "").strip('"')
+                yield keys
+        except ClientError as e:
+            print(f"S3 list failed: {e}", file=sys.stderr)
+            sys.exit(2)
+
+    def image_batches(self) -> Iterator[list[str]]:
+        """One batch per listing page with ``--stream``; otherwise the whole listing, sorted."""
+        if self.stream:
+            return self.listed_image_pages()
+        image_keys = sorted(k for keys in self.listed_image_pages() for k in keys)
+        if not image_keys:
+            print(f"No images found under s3://{self.args.bucket}/{self.prefix}", file=sys.stderr)
+            sys.exit(3)
+        return iter([image_keys])
+
+    def open(self) -> None:
+        """Load the sync state and manifest, start the preprocessor and prepare the output."""
+        args = self.args
+        if args.sync:
+            self.state = load_sync_state(self.state_path, args.bucket, self.prefix)
+            for meta_key, entry in self.state["metadata"].items():
+                if meta_key in self.listed and entry.get("etag") == self.listed[meta_key][0]:
+                    self.meta_cache[meta_key] = entry.get("data") or {}
+
+        if not args.no_manifest:
+            self.manifest_key = args.manifest_key.strip() or manifest_key_for_prefix(self.prefix)
+            self.manifest = ManifestIndex(manifest_rows(self.load_metadata(self.manifest_key)), self.prefix)
+            print(f"Manifest s3://{args.bucket}/{self.manifest_key}: {len(self.manifest.rows)} rows", file=sys.stderr)
+
+        if args.preprocess:
+            from amr_ops.preprocess import Preprocessor
+
+            self.preprocessor = Preprocessor(
+                workers=args.preprocess_workers or None, max_side=args.max_side, quality=args.jpeg_quality
+            )
+            print(self.preprocessor.describe(), file=sys.stderr)
+
+        if args.shard_dir:
+            from amr_ops.shards import ShardWriter
+
+            self.shards = ShardWriter(args.shard_dir, max_bytes=max(1, args.shard_size) << 20, name="unit-test")
+            old = self.shards.existing()
+            if old and not args.overwrite:
+                print(
+                    f"{args.shard_dir} already holds {len(old)} shard files; --overwrite replaces them",
+                    file=sys.stderr,
+                )
+                sys.exit(4)
+            for path in old:
+                path.unlink()
+        elif not args.dry_run:
+            os.makedirs(args.out_dir, exist_ok=True)
+        self.fieldnames = csv_fieldnames(shards=self.shards is not None, preprocess=self.preprocessor is not None)
+
+    # Expected readings
+
+    def load_metadata(self, meta_key: str) -> dict[str, Any]:
+        data = self.meta_cache.get(meta_key)
+        if data is not None:
+            return data
+        if self.state is not None and meta_key not in self.listed and meta_key.startswith(self.prefix):
+            # The listing covers every key under the prefix, so this object does not exist.
+            self.meta_cache[meta_key] = {}
+            return {}
+        try:
+            resp = self.s3.get_object(Bucket=self.args.bucket, Key=meta_key)
+            body = resp["Body"].read()
+            data = json.loads(body.decode("utf-8"))
+            if not isinstance(data, dict):
+                data = {}
+        except ClientError:
+            data = {}
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            data = {}
+        self.meta_cache[meta_key] = data
+        return data
+
+    def prefetch_metadata(self, meta_keys: Iterable[str]) -> None:
+        missing = [k for k in dict.fromkeys(meta_keys) if k not in self.meta_cache]
+        if self.state is not None:
+            for meta_key in missing:
+                if meta_key not in self.listed:
+                    self.meta_cache[meta_key] = {}
+            missing = [k for k in missing if k in self.listed]
+        if self.engine is None:
+            list(self.pool.map(self.load_metadata, missing))
+            return
+        for meta_key, data in zip(missing, self.engine.get_json_many(self.args.bucket, missing)):
+            self.meta_cache[meta_key] = data if isinstance(data, dict) else {}
+
+    def expected_reading(self, image_key: str) -> tuple[str, str, str]:
+        """``(expected reading, difficulty, key it came from)`` for one image."""
+        base = PurePosixPath(image_key).name
+        meta_key = metadata_key_for_image(image_key)
+        parsed = parse_unit_test_file_name(base)
+        difficulty = parsed[0] if parsed else ""
+        entry = self.manifest.lookup(image_key)
+        if entry is not None:
+            return entry["expected_meter_value"], difficulty_code(entry["image_difficulty"]), self.manifest_key
+        expected = expected_from_metadata(self.load_metadata(meta_key))
+        side_key = sidecar_metadata_key(image_key)
+        if not expected and side_key != meta_key:
+            side = self.load_metadata(side_key)
+            expected = expected_from_metadata(side)
+        if not expected and self.pattern:
+            expected = filename_expectation(base, self.pattern)
+        if not expected and not self.args.no_filename_heuristic:
+            expected = flat_two_int_expected(base)
+        return expected, difficulty, meta_key
+
+    def resolve_batch(self, image_keys: list[str]):
+        """CSV rows, pending downloads, duplicates to link and the already-present count for one batch."""
+        args = self.args
+        if self.engine is not None or self.pool is not None:
+            # Per-object GETs only for images the manifest does not cover: session metadata
+            # first, then sidecars only for images it leaves without a reading.
+            unresolved = [k for k in image_keys if self.manifest.lookup(k) is None]
+            self.prefetch_metadata(metadata_key_for_image(k) for k in unresolved)
+            self.prefetch_metadata(
+                sidecar_metadata_key(k)
+                for k in unresolved
+                if sidecar_metadata_key(k) != metadata_key_for_image(k)
+                and not expected_from_metadata(self.load_metadata(metadata_key_for_image(k)))
+            )
+
+        rows: list[dict[str, str]] = []
+        downloads: list[tuple[str, str]] = []
+        links: list[tuple[dict[str, Any], str, str]] = []  # (first copy, duplicate key, duplicate path)
+        already_present = 0
+        for image_key in image_keys:
+            expected, difficulty, meta_key = self.expected_reading(image_key)
+            rel_local = image_key[len(self.prefix) :] if image_key.startswith(self.prefix) else image_key
+            rel_local = rel_local.lstrip("/")
+            safe_path = os.path.join(args.out_dir, rel_local)
+            content_id = (self.image_etags.get(image_key) or "", self.image_sizes.get(image_key, 0))
+            first = self.blobs.get(content_id) if self.dedup and content_id[0] else None
+            duplicate_of = conflict = ""
+            if first is not None:
+                duplicate_of = first["key"]
+                if expected and first["expected"] and expected != first["expected"]:
+                    conflict = first["expected"]
+                    self.conflict_count += 1
+                    if len(self.conflicts) < CONFLICT_EXAMPLES:
+                        self.conflicts.append((image_key, expected, first["key"], first["expected"]))
+                elif expected and not first["expected"]:
+                    first["expected"] = expected
+            elif self.dedup and content_id[0]:
+                self.blobs[content_id] = {"key": image_key, "path": safe_path, "expected": expected, "shard": None}
+                self.unique += 1
+
+            if first is not None and self.shards is not None:
+                links.append((first, image_key, safe_path))
+            elif self.shards is not None:
+                downloads.append((image_key, rel_local))
+            elif not args.dry_run:
+                os.makedirs(os.path.dirname(safe_path) or args.out_dir, exist_ok=True)
+                synced = (
+                    self.state is None
+                    or (self.state["objects"].get(image_key) or {}).get("etag") == self.listed[image_key][0]
+                )
+                if (
+                    not args.overwrite
+                    and synced
+                    and os.path.isfile(safe_path)
+                    and os.path.getsize(safe_path) == self.image_sizes.get(image_key)
+                ):
+                    already_present += 1
+                elif first is not None:
+                    links.append((first, image_key, safe_path))
+                else:
+                    downloads.append((image_key, safe_path))
+
+            rows.append(
+                {
+                    "s3_key": image_key,
+                    "image_file_name": PurePosixPath(image_key).name,
+                    "relative_path": rel_local,
+                    "expected_meter_value": expected,
+                    "metadata_s3_key": meta_key,
+                    "difficulty": difficulty,
+                    "duplicate_of": duplicate_of,
+                    "conflicting_reading": conflict,
+                }
+            )
+        return rows, downloads, links, already_present
+
+    def link_duplicates(self, links, rows, batch_failed: dict[str, BaseException]) -> dict[str, BaseException]:
+        """Point each duplicate at its first copy: a hard link on disk, or the same shard span."""
+        by_key = {r["s3_key"]: r for r in rows}
+        errors: dict[str, BaseException] = {}
+        for first, image_key, path in links:
+            if first["key"] in batch_failed:
+                errors[image_key] = batch_failed[first["key"]]
+            elif self.shards is not None:
+                if first["shard"] is None:
+                    errors[image_key] = FileNotFoundError(f"first copy {first['key']} was not packed")
+                    continue
+                row = by_key[image_key]
+                row["shard"], row["shard_offset"], row["shard_size"] = first["shard"]
+            else:
+                try:
+                    link_or_copy(first["path"], path)
+                except OSError as exc:
+                    errors[image_key] = exc
+        return errors
+
+    # Downloads into --out-dir
+
+    def processed_path(self, rel_local: str) -> str:
+        return os.path.join(self.args.preprocess_dir, str(PurePosixPath(rel_local).with_suffix(".jpg")))
+
+    def submit_file(self, image_key: str, path: str) -> None:
+        """Queue a downloaded image for preprocessing while the other downloads continue."""
+        rel_local = os.path.relpath(path, self.args.out_dir).replace(os.sep, "/")
+        self.preprocessor.submit_file(image_key, path, self.processed_path(rel_local))
+
+    def download_one(self, pair: tuple[str, str]) -> BaseException | None:
+        try:
+            self.s3.download_file(self.args.bucket, pair[0], pair[1])
+        except Exception as exc:
+            return exc
+        if self.preprocessor is not None:
+            self.submit_file(*pair)
+        return None
+
+    async def download_and_submit(self, pair: tuple[str, str]) -> None:
+        await self.engine.s3.download(self.args.bucket, pair[0], pair[1])
+        self.submit_file(*pair)
+
+    def download_many(self, pairs: list[tuple[str, str]]) -> list[BaseException | None]:
+        if self.engine is not None and self.preprocessor is not None:
+            return self.engine.map(self.download_and_submit, pairs)
+        if self.engine is not None:
+            return self.engine.download_many(self.args.bucket, pairs)
+        if self.pool is not None:
+            return list(self.pool.map(self.download_one, pairs))
+        return [self.download_one(pair) for pair in pairs]
+
+    # Downloads into --shard-dir
+
+    def fetch_one(self, pair: tuple[str, str]) -> bytes | BaseException:
+        try:
+            return self.s3.get_object(Bucket=self.args.bucket, Key=pair[0])["Body"].read()
+        except Exception as exc:
+            return exc
+
+    def fetch_many(self, pairs: list[tuple[str, str]]) -> list[BaseException | None]:
+        """Image bytes into ``fetched`` (same contract as ``download_many``)."""
+        if self.engine is not None:
+            engine = self.engine
+            results = engine.map(lambda pair: engine.s3.get_bytes(self.args.bucket, pair[0]), pairs)
+        elif self.pool is not None:
+            results = list(self.pool.map(self.fetch_one, pairs))
+        else:
+            results = [self.fetch_one(pair) for pair in pairs]
+        errors: list[BaseException | None] = []
+        for pair, result in zip(pairs, results):
+            if isinstance(result, BaseException):
+                errors.append(result)
+            elif result is None:
+                errors.append(FileNotFoundError(pair[0]))
+            else:
+                self.fetched[pair[0]] = result
+                errors.append(None)
+                if self.preprocessor is not None:
+                    self.preprocessor.submit_bytes(pair[0], result)
+        return errors
+
+    def pack(self, chunk: list[tuple[str, str]], by_key: dict[str, dict[str, str]]) -> None:
+        """Append the fetched images of ``chunk`` (and their CSV fields) to the shards."""
+        for image_key, rel_local in chunk:
+            data = self.fetched.pop(image_key, None)
+            if data is None:
+                continue
+            row = by_key[image_key]
+            path = PurePosixPath(rel_local)
+            ext = path.suffix.lstrip(".").lower()
+            if self.preprocessor is not None:
+                result = self.preprocessor.result(image_key)
+                if record_preprocessed(row, result):
+                    data, ext = result["data"], "jpg"
+            sample = json.dumps({k: row[k] for k in SHARD_SAMPLE_FIELDS}).encode("utf-8")
+            shard, spans = self.shards.add(str(path.with_suffix("")), [(ext, data), ("json", sample)])
+            row["shard"] = shard
+            row["shard_offset"], row["shard_size"] = str(spans[0][0]), str(spans[0][1])
+            first = self.blobs.get((self.image_etags.get(image_key) or "", self.image_sizes.get(image_key, 0)))
+            if first is not None and first["key"] == image_key:
+                first["shard"] = (row["shard"], row["shard_offset"], row["shard_size"])
+
+    def write_shards(self, pairs: list[tuple[str, str]], rows: list[dict[str, str]]) -> dict[str, BaseException]:
+        """Fetch a window of images at a time and append them to the shards in key order."""
+        by_key = {r["s3_key"]: r for r in rows}
+        window = 2 * (self.args.connections if self.engine is not None else self.workers)
+        batch_failed: dict[str, BaseException] = {}
+        # With preprocessing, window k decodes in the process pool while window k + 1
+        # downloads, and is packed afterwards.
+        pending: list[tuple[str, str]] = []
+        for start in range(0, len(pairs), window):
+            chunk = pairs[start : start + window]
+            batch_failed.update(download_with_retries(self.fetch_many, chunk, max(0, self.args.retries)))
+            if self.preprocessor is None:
+                self.pack(chunk, by_key)
+            else:
+                self.pack(pending, by_key)
+                pending = chunk
+        self.pack(pending, by_key)
+        return batch_failed
+
+    # Batches and CSV
+
+    def process_batch(self, image_keys: list[str]) -> list[dict[str, str]]:
+        """Resolve, fetch, link and preprocess one batch; returns the rows that made it."""
+        rows, downloads, links, present = self.resolve_batch(image_keys)
+        self.already_present += present
+        batch_failed: dict[str, BaseException] = {}
+        if downloads:
+            if self.shards is not None:
+                batch_failed = self.write_shards(downloads, rows)
+            else:
+                batch_failed = download_with_retries(self.download_many, downloads, max(0, self.args.retries))
+            self.downloaded += len(downloads) - len(batch_failed)
+        if links:
+            link_failed = self.link_duplicates(links, rows, batch_failed)
+            self.linked += len(links) - len(link_failed)
+            batch_failed.update(link_failed)
+        if batch_failed:
+            for image_key, err in sorted(batch_failed.items()):
+                print(f"Download failed {image_key}: {err}", file=sys.stderr)
+            rows = [r for r in rows if r["s3_key"] not in batch_failed]
+            self.failed += len(batch_failed)
+        if self.preprocessor is not None and self.shards is None:
+            # Already-present and linked images were not queued by a download.
+            for r in rows:
+                if r["s3_key"] not in self.preprocessor:
+                    self.submit_file(r["s3_key"], os.path.join(self.args.out_dir, r["relative_path"]))
+            for r in rows:
+                if record_preprocessed(r, self.preprocessor.result(r["s3_key"])):
+                    r["processed_path"] = str(PurePosixPath(r["relative_path"]).with_suffix(".jpg"))
+        return rows
+
+    def write_csv(self, batches: Iterable[list[str]], path: str) -> None:
+        """Process ``batches`` in order, appending each batch's rows to ``path`` as it finishes."""
+        last_key = ""
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=self.fieldnames, extrasaction="ignore")
+            w.writeheader()
+            for image_keys in batches:
+                if not image_keys:
+                    continue
+                if image_keys[0] < last_key:
+                    # ListObjectsV2 returns keys in UTF-8 binary order, which str comparison matches.
+                    print(f"Listing out of order at {image_keys[0]}; CSV will not be sorted", file=sys.stderr)
+                last_key = image_keys[-1]
+                rows = self.process_batch(image_keys)
+                for r in rows:
+                    w.writerow({k: r.get(k, "") for k in self.fieldnames})
+                f.flush()
+                self.written += len(rows)
+                self.duplicates += sum(1 for r in rows if r["duplicate_of"])
+                if self.state is not None:
+                    self.kept_rows.extend(rows)
+
+    def close(self) -> None:
+        if self.engine is not None:
+            self.engine.close()
+        if self.pool is not None:
+            self.pool.shutdown()
+        if self.shards is not None:
+            self.shards.close()
+        if self.preprocessor is not None:
+            self.preprocessor.close()
+
+    def save_state(self) -> int:
+        """Record what this run mirrored in the ``--sync`` state; returns the number of files pruned."""
+        state, listed = self.state, self.listed
+        gone = [entry.get("path") or "" for key, entry in state["objects"].items() if key not in listed]
+        pruned = prune_local(self.args.out_dir, [p for p in gone if p]) if self.args.prune else 0
+        state["objects"] = {
+            row["s3_key"]: {
+                "etag": listed[row["s3_key"]][0],
+                "size": listed[row["s3_key"]][1],
+                "last_modified": listed[row["s3_key"]][2],
+                "path": row["relative_path"],
+            }
+            for row in self.kept_rows
+        }
+        state["metadata"] = {
+            key: {"etag": listed[key][0], "data": data}
+            for key, data in sorted(self.meta_cache.items())
+            if key in listed
+        }
+        save_sync_state(self.state_path, state)
+        return pruned
+
+    def report(self, pruned: int) -> None:
+        args = self.args
+        print(f"Wrote {self.written} rows to {args.csv}")
+        if self.dedup:
+            print(
+                f"{self.unique} unique images; {self.duplicates} duplicate rows, "
+                f"{self.conflict_count} with a conflicting reading (conflicting_reading column)"
+            )
+            for image_key, expected, first_key, first_expected in self.conflicts:
+                print(f"  conflict: {image_key} = {expected!r} vs {first_key} = {first_expected!r}", file=sys.stderr)
+        if args.dry_run:
+            print("(dry-run: no files downloaded)")
+        elif self.shards is not None:
+            print(
+                f"Packed {self.downloaded} images into {len(self.shards.shards)} shards under "
+                f"{os.path.abspath(args.shard_dir)} ({self.linked} duplicates referenced, {self.failed} failed)"
+            )
+        else:
+            print(
+                f"Downloaded {self.downloaded} under {os.path.abspath(args.out_dir)} "
+                f"({self.linked} duplicates linked, {self.already_present} already present, {self.failed} failed)"
+            )
+        if self.state is not None and not args.dry_run:
+            print(f"Sync state: {self.state_path}" + (f" (pruned {pruned} local files)" if args.prune else ""))
+
+
 def main() -> None:
     ap = argparse.ArgumentParser(description="S3 unit-test images → local files + CSV manifest")
     ap.add_argument(
@@ -152,100 +943,128 @@ def main() -> None:
         action="store_true",
         help="Disable <n>_<meter>.jpg → expected meter = second number when metadata is empty",
     )
+    ap.add_argument(
+        "--engine",
+        choices=("boto3", "asyncio"),
+        default="boto3",
+        help="asyncio: concurrent metadata GETs and downloads on one pool (needs aiobotocore)",
+    )
+    ap.add_argument(
+        "--connections",
+        type=int,
+        default=64,
+        help="Max in-flight S3 requests with --engine asyncio",
+    )
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=16,
+        help="Concurrent metadata GETs and downloads with the boto3 engine (1 = sequential)",
+    )
+    ap.add_argument("--retries", type=int, default=3, help="Extra attempts per failed download")
+    ap.add_argument(
+        "--inventory",
+        default="",
+        help="List the prefix from a local S3 Inventory (manifest.json, delivery dir or CSV/Parquet file)",
+    )
+    ap.add_argument(
+        "--list-shards",
+        type=int,
+        default=1,
+        help="List the prefix as N session-id key ranges concurrently (merged in key order)",
+    )
+    ap.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="Download every image even if a file of the listed size is already on disk",
+    )
+    ap.add_argument(
+        "--manifest-key",
+        default="",
+        help=f"Registry JSON with expected readings (default: <prefix>{MANIFEST_JSON_FILE}, UNIT_TEST_MANIFEST_S3_KEY)",
+    )
+    ap.add_argument("--no-manifest", action="store_true", help="Ignore the registry; resolve from metadata only")
+    ap.add_argument(
+        "--sync",
+        action="store_true",
+        help="Incremental mirror: download only new/changed objects, reuse cached metadata by ETag",
+    )
+    ap.add_argument("--state", default="", help="--sync state file (default: <out-dir>/.unit_test_sync.json)")
+    ap.add_argument("--prune", action="store_true", help="With --sync: delete local images whose keys are gone")
+    ap.add_argument(
+        "--stream",
+        action="store_true",
+        help="Constant memory: process and write one listing page at a time (no global sort)",
+    )
+    ap.add_argument(
+        "--metadata-cache",
+        type=int,
+        default=4096,
+        help="With --stream: parsed metadata/sidecar documents kept (least recently used dropped)",
+    )
+    ap.add_argument(
+        "--dedup-cache",
+        type=int,
+        default=262144,
+        help="With --stream: distinct images remembered for dedup (least recently seen dropped)",
+    )
+    ap.add_argument(
+        "--shard-dir",
+        default="",
+        help="Write images into tar shards (WebDataset layout, with offset indexes) here instead of --out-dir",
+    )
+    ap.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="Download every copy even when the listing shows the same ETag and size",
+    )
+    ap.add_argument("--shard-size", type=int, default=256, help="Target shard size in MB with --shard-dir")
+    ap.add_argument(
+        "--preprocess",
+        action="store_true",
+        help="Normalize images (EXIF rotation, HEIC→JPEG, downscale) in a process pool while downloading",
+    )
+    ap.add_argument(
+        "--preprocess-dir",
+        default="./unit_test_preprocessed",
+        help="Where --preprocess writes <relative path>.jpg (with --shard-dir the JPEG goes into the shard instead)",
+    )
+    ap.add_argument("--max-side", type=int, default=1024, help="Longest side in pixels after --preprocess (0 = keep)")
+    ap.add_argument("--jpeg-quality", type=int, default=90, help="JPEG quality for --preprocess")
+    ap.add_argument("--preprocess-workers", type=int, default=0, help="Processes for --preprocess (0 = CPU count)")
     args = ap.parse_args()
+    if args.prune and not args.sync:
+        ap.error("--prune requires --sync")
+    if args.list_shards < 1:
+        ap.error("--list-shards must be at least 1")
+    if args.stream and args.sync:
+        ap.error("--stream cannot be combined with --sync (the sync state covers the whole prefix)")
+    if args.preprocess and args.dry_run:
+        ap.error("--preprocess needs the images; it cannot be combined with --dry-run")
+    if args.shard_dir and (args.sync or args.dry_run):
+        ap.error("--shard-dir cannot be combined with --sync or --dry-run")
 
-    prefix = normalize_prefix(args.prefix)
-    pattern = re.compile(args.expect_filename_regex) if args.expect_filename_regex.strip() else None
-
-    s3 = boto3.client("s3", region_name=args.region)
-    paginator = s3.get_paginator("list_objects_v2")
-
-    image_keys: list[str] = []
-    try:
-        for page in paginator.paginate(Bucket=args.bucket, Prefix=prefix):
-            for obj in page.get("Contents") or []:
-                key = obj.get("Key") or ""
-                if key.endswith("/") or not is_image_key(key):
-                    continue
-                image_keys.append(key)
-    except ClientError as e:
-        print(f"S3 list failed: {e}", file=sys.stderr)
-        sys.exit(2)
-
-    image_keys.sort()
-    if not image_keys:
-        print(f"No images found under s3://{args.bucket}/{prefix}", file=sys.stderr)
-        sys.exit(3)
-
-    meta_cache: dict[str, dict[str, Any]] = {}
-
-    def load_metadata(meta_key: str) -> dict[str, Any]:
-        if meta_key in meta_cache:
-            return meta_cache[meta_key]
+    if args.preprocess:
         try:
-            resp = s3.get_object(Bucket=args.bucket, Key=meta_key)
-            body = resp["Body"].read()
-            data = json.loads(body.decode("utf-8"))
-            if not isinstance(data, dict):
-                data = {}
-        except ClientError:
-            data = {}
-        except (json.JSONDecodeError, UnicodeDecodeError):
-            data = {}
-        meta_cache[meta_key] = data
-        return data
-
-    if not args.dry_run:
-        os.makedirs(args.out_dir, exist_ok=True)
-
-    rows: list[dict[str, str]] = []
-    for image_key in image_keys:
-        base = PurePosixPath(image_key).name
-        meta_key = metadata_key_for_image(image_key)
-        meta = load_metadata(meta_key)
-        expected = expected_from_metadata(meta)
-        side_key = sidecar_metadata_key(image_key)
-        if not expected and side_key != meta_key:
-            side = load_metadata(side_key)
-            expected = expected_from_metadata(side)
-        if not expected and pattern:
-            expected = filename_expectation(base, pattern)
-        if not expected and not args.no_filename_heuristic:
-            expected = flat_two_int_expected(base)
-
-        rel_local = image_key[len(prefix) :] if image_key.startswith(prefix) else image_key
-        rel_local = rel_local.lstrip("/")
-        safe_path = os.path.join(args.out_dir, rel_local)
-        if not args.dry_run:
-            os.makedirs(os.path.dirname(safe_path) or args.out_dir, exist_ok=True)
-            try:
-                s3.download_file(args.bucket, image_key, safe_path)
-            except ClientError as e:
-                print(f"Download failed {image_key}: {e}", file=sys.stderr)
-                continue
+            import amr_ops.preprocess  # noqa: F401
+        except ImportError as exc:
+            sys.exit(str(exc))
 
-        rows.append(
-            {
-                "s3_key": image_key,
-                "image_file_name": base,
-                "relative_path": rel_local,
-                "expected_meter_value": expected,
-                "metadata_s3_key": meta_key,
-            }
-        )
+    export = UnitTestExport(args)
+    batches = export.image_batches()
+    export.open()
+    # Rows go to a temporary file as each batch finishes; it replaces --csv at the end.
+    csv_tmp = f"{args.csv}.partial"
+    export.write_csv(batches, csv_tmp)
+    export.close()
+    if export.stream and not export.written and not export.failed:
+        os.remove(csv_tmp)
+        print(f"No images found under s3://{args.bucket}/{export.prefix}", file=sys.stderr)
+        sys.exit(3)
+    os.replace(csv_tmp, args.csv)
 
-    fieldnames = ["image_file_name", "expected_meter_value", "relative_path", "s3_key", "metadata_s3_key"]
-    with open(args.csv, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
-        w.writeheader()
-        for r in rows:
-            w.writerow({k: r.get(k, "") for k in fieldnames})
-
-    print(f"Wrote {len(rows)} rows to {args.csv}")
-    if args.dry_run:
-        print("(dry-run: no files downloaded)")
-    else:
-        print(f"Downloaded under {os.path.abspath(args.out_dir)}")
+    pruned = export.save_state() if export.state is not None and not args.dry_run else 0
+    export.report(pruned)
 
 
 if __name__ == "__main__":